@@ -6,8 +6,14 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).parent / "src"))
 
 from src.bot.bot_manager import BotManager
-from src.database import PostgreSQLClient
+from src.core import StoryMatcher, StoryCatalogue, ExtractionWorker, TwinRegistry, ConversationHistoryStore
+from src.database import PostgreSQLClient, WriteBehindBuffer
+from src.database.migrations import MigrationRunner, check_query_plans
 from src.utils.config import Config
+from src.utils.llm_cache import LLMCache
+from src.utils.llm_client import LLMClient
+from src.utils.llm_resilience import LLMResilience
+from src.utils.llm_scheduler import LLMScheduler
 from src.utils.logger import setup_logger
 
 logger = setup_logger(__name__)
@@ -33,6 +39,13 @@ async def main():
         
         env_name = "Development (Local PostgreSQL)" if Config.is_development() else "Production (Supabase)"
         logger.info(f"Database connection successful - {env_name}")
+        logger.info(f"Connection pool stats: {PostgreSQLClient.get_pool_stats()}")
+        
+        # Bring the schema up to date before anything reads it
+        if Config.MIGRATE_ON_STARTUP:
+            await MigrationRunner().migrate()
+        if Config.QUERY_PLAN_CHECK:
+            await check_query_plans()
         
         # Show bot configuration
         bot_configs = Config.get_all_bot_configs()
@@ -40,6 +53,13 @@ async def main():
         for twin_id, config in bot_configs.items():
             logger.info(f"  🤖 {twin_id} -> @{config['username']}")
         
+        # Preload twins and story catalogues and build search indexes before taking traffic
+        await TwinRegistry.shared().start()
+        await StoryCatalogue.shared().start(list(bot_configs.keys()))
+        await StoryMatcher().build_indexes(list(bot_configs.keys()))
+        WriteBehindBuffer.shared().start()
+        await LLMCache.shared().start()
+        
         # Create and start bot manager
         bot_manager = BotManager()
         
@@ -52,9 +72,26 @@ async def main():
         logger.error(f"Fatal error: {e}")
         sys.exit(1)
     finally:
-        # Clean up database connection
-        if 'db_client' in locals():
-            await db_client.close()
+        await TwinRegistry.shared().stop()
+        await LLMCache.shared().stop()
+        await StoryCatalogue.shared().stop()
+        
+        # Finish queued profile extractions while the database is still open
+        await ExtractionWorker.shared().stop()
+        # Write out buffered turn writes before the pool closes
+        await WriteBehindBuffer.shared().stop()
+        logger.info(f"Write-behind stats at shutdown: {WriteBehindBuffer.shared().get_stats()}")
+        logger.info(f"LLM scheduler stats at shutdown: {LLMScheduler.shared().get_stats()}")
+        logger.info(f"LLM resilience stats at shutdown: {LLMResilience.shared().get_stats()}")
+        logger.info(f"LLM cache stats at shutdown: {LLMCache.shared().get_stats()}")
+        history = ConversationHistoryStore.shared()
+        logger.info(f"Conversation history stats at shutdown: {history.get_stats()}")
+        logger.info(f"Conversation history storage at shutdown: {await history.get_storage_stats()}")
+        await LLMClient.close()
+        
+        # Clean up the shared database connection pool
+        logger.info(f"Connection pool stats at shutdown: {PostgreSQLClient.get_pool_stats()}")
+        await PostgreSQLClient.close_all()
 
 if __name__ == '__main__':
     asyncio.run(main())
\ No newline at end of file
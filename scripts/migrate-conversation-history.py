@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Copy the legacy user_memory.conversation_history blobs into the conversation_turns table
+"""
+
+import sys
+import argparse
+import asyncio
+from pathlib import Path
+
+# Add src to path
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from src.database import PostgreSQLClient, ConversationTurnRepository
+
+async def migrate_conversation_history(clear_history: bool):
+    """Backfill turns for every chat/twin pair that has none yet"""
+    
+    repo = ConversationTurnRepository()
+    result = await repo.migrate_history(clear_history=clear_history)
+    if result is None:
+        print("❌ Migration failed, see logs")
+        return False
+    
+    print(f"✅ Migrated conversation history: {result}")
+    if clear_history:
+        print("🧹 Cleared legacy conversation_history blobs")
+    return True
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clear-history", action="store_true", help="Empty the legacy JSONB blobs afterwards")
+    args = parser.parse_args()
+    
+    try:
+        ok = await migrate_conversation_history(args.clear_history)
+    finally:
+        await PostgreSQLClient.close_all()
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    asyncio.run(main())
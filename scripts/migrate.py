@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Apply versioned schema migrations and check hot query plans
+"""
+
+import sys
+import argparse
+import asyncio
+from pathlib import Path
+
+# Add src to path
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from src.database import PostgreSQLClient
+from src.database.migrations import MigrationRunner, MigrationError, check_query_plans
+
+async def show_status():
+    """Print every migration and whether it has been applied"""
+    for migration in await MigrationRunner().status():
+        mark = "✅" if migration['applied'] else "⏳"
+        line = f"{mark} {migration['version']:04d}_{migration['name']}"
+        if migration['applied']:
+            line += f" (applied {migration['applied_at']})"
+        if not migration['checksum_ok']:
+            line += " ❌ file changed since it was applied"
+        print(line)
+    return True
+
+async def migrate_up(target: int = None):
+    """Apply pending migrations"""
+    try:
+        applied = await MigrationRunner().migrate(target)
+    except MigrationError as e:
+        print(f"❌ {e}")
+        return False
+    
+    if not applied:
+        print("✅ Schema is up to date")
+    for migration in applied:
+        print(f"✅ Applied {migration.version:04d}_{migration.name}")
+    return True
+
+async def check_plans():
+    """Print which hot queries fall back to sequential scans"""
+    results = await check_query_plans()
+    for name, scans in results.items():
+        if scans:
+            print(f"⚠️  {name}: sequential scan on {', '.join(scans)}")
+        else:
+            print(f"✅ {name}: index scan")
+    return bool(results) and not any(results.values())
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status", help="List migrations and whether they are applied")
+    up = commands.add_parser("up", help="Apply pending migrations")
+    up.add_argument("--target", type=int, help="Stop after this version")
+    commands.add_parser("check-plans", help="Warn about hot queries that need a sequential scan")
+    args = parser.parse_args()
+    
+    try:
+        if args.command == "status":
+            ok = await show_status()
+        elif args.command == "up":
+            ok = await migrate_up(args.target)
+        else:
+            ok = await check_plans()
+    finally:
+        await PostgreSQLClient.close_all()
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -46,11 +46,12 @@ async def test_multi_bot_setup():
         if not twins:
             print("⚠️  No digital twins found. Run database/seed.sql")
             return False
-        
-        await db_client.close()
     except Exception as e:
         print(f"❌ Database error: {e}")
         return False
+    finally:
+        # Clients share one pool; only close_all() releases it
+        await PostgreSQLClient.close_all()
     
     # Test bot configurations
     print("\n🤖 Testing Bot Configurations...")
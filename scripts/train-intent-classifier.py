@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Train the local intent classifier from logged LLM judge decisions and export it
+"""
+
+import sys
+import argparse
+import asyncio
+from collections import Counter
+from pathlib import Path
+
+# Add src to path
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from src.core.intent_classifier import IntentClassifier, ACTION_TYPES
+from src.database import PostgreSQLClient, JudgeDecisionRepository
+from src.utils.config import Config
+
+async def train_intent_classifier(output: str, min_samples: int, limit: int):
+    """Build the intent model from stored judge outcomes"""
+    
+    repo = JudgeDecisionRepository()
+    decisions = await repo.get_decisions(source='llm', limit=limit)
+    
+    messages = []
+    labels = []
+    for row in decisions:
+        if row['user_message'] and row['action_type'] in ACTION_TYPES:
+            messages.append(row['user_message'])
+            labels.append(row['action_type'])
+    
+    print(f"📊 Loaded {len(messages)} judge decisions: {dict(Counter(labels))}")
+    
+    if len(messages) < min_samples or len(set(labels)) < 2:
+        print(f"❌ Need at least {min_samples} decisions across 2+ action types to train")
+        return False
+    
+    # Hold out a stratified slice to report how often the model agrees with the judge
+    # (rows are newest first, so a positional split can leave the training slice with one action type)
+    from sklearn.model_selection import train_test_split
+    try:
+        train_messages, test_messages, train_labels, test_labels = train_test_split(
+            messages, labels, test_size=0.2, stratify=labels, random_state=0
+        )
+    except ValueError as e:
+        print(f"⚠️  Skipping held-out report, can't stratify these decisions: {e}")
+    else:
+        model = IntentClassifier.train(train_messages, train_labels)
+        accuracy = model.score(test_messages, test_labels)
+        print(f"✅ Held-out agreement with judge: {accuracy:.1%}")
+    
+    # Retrain on everything before exporting
+    model = IntentClassifier.train(messages, labels)
+    IntentClassifier.export(model, output)
+    print(f"✅ Exported intent model to {output}")
+    return True
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--output", default=Config.INTENT_MODEL_PATH, help="Where to write the model")
+    parser.add_argument("--min-samples", type=int, default=200, help="Minimum decisions required")
+    parser.add_argument("--limit", type=int, default=50000, help="Most recent decisions to use")
+    args = parser.parse_args()
+    
+    try:
+        ok = await train_intent_classifier(args.output, args.min_samples, args.limit)
+    finally:
+        await PostgreSQLClient.close_all()
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    asyncio.run(main())
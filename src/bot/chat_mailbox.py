@@ -0,0 +1,135 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Any, Tuple
+from telegram import Update
+from telegram.ext import ContextTypes
+from ..utils.config import Config
+from ..utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+@dataclass
+class ChatTurn:
+    """One or more queued messages from a chat handled as a single conversation turn"""
+    chat_id: int
+    items: List[Tuple[str, Update]]
+    context: ContextTypes.DEFAULT_TYPE
+    # Set once the user has seen any part of the reply; committed turns are never superseded
+    committed: bool = False
+    
+    @property
+    def text(self) -> str:
+        """The queued messages merged into one user message"""
+        return "\n".join(text for text, _ in self.items)
+    
+    @property
+    def update(self) -> Update:
+        """The latest update, which the reply is attached to"""
+        return self.items[-1][1]
+
+@dataclass
+class _ChatActor:
+    """Mailbox state for one chat"""
+    pending: List[Tuple[str, Update]] = field(default_factory=list)
+    context: Optional[ContextTypes.DEFAULT_TYPE] = None
+    last_arrival: float = 0.0
+    worker: Optional[asyncio.Task] = None
+    current: Optional[ChatTurn] = None
+    generation: Optional[asyncio.Task] = None
+
+class ChatMailbox:
+    """Per-chat actors: one turn at a time per chat, bursts debounced and merged, stale generations superseded"""
+    
+    def __init__(
+        self,
+        run_turn: Callable[[ChatTurn], Awaitable[None]],
+        debounce_seconds: float = None,
+        max_wait_seconds: float = None,
+        supersede: bool = None
+    ):
+        self.run_turn = run_turn
+        self.debounce_seconds = Config.CHAT_DEBOUNCE_SECONDS if debounce_seconds is None else debounce_seconds
+        self.max_wait_seconds = Config.CHAT_DEBOUNCE_MAX_SECONDS if max_wait_seconds is None else max_wait_seconds
+        self.supersede = Config.CHAT_SUPERSEDE_ENABLED if supersede is None else supersede
+        self._actors: Dict[int, _ChatActor] = {}
+        self.stats = {
+            'messages': 0,
+            'turns': 0,
+            'merged_messages': 0,
+            'superseded': 0,
+            'failed': 0
+        }
+    
+    def submit(self, chat_id: int, text: str, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Queue a message for its chat's actor, superseding a generation the user hasn't seen yet"""
+        self.stats['messages'] += 1
+        actor = self._actors.setdefault(chat_id, _ChatActor())
+        actor.pending.append((text, update))
+        actor.context = context
+        actor.last_arrival = time.monotonic()
+        
+        if (
+            self.supersede and actor.current and not actor.current.committed
+            and actor.generation and not actor.generation.done()
+        ):
+            actor.generation.cancel()
+        
+        if actor.worker is None or actor.worker.done():
+            actor.worker = asyncio.create_task(self._run(chat_id, actor))
+    
+    async def _debounce(self, actor: _ChatActor):
+        """Wait until the chat has been quiet for the debounce window, up to the max wait"""
+        deadline = time.monotonic() + self.max_wait_seconds
+        while True:
+            wait = min(actor.last_arrival + self.debounce_seconds, deadline) - time.monotonic()
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+    
+    async def _run(self, chat_id: int, actor: _ChatActor):
+        """Actor loop: run queued turns for one chat strictly one after another"""
+        try:
+            while actor.pending:
+                await self._debounce(actor)
+                turn = ChatTurn(chat_id, actor.pending, actor.context)
+                actor.pending = []
+                actor.current = turn
+                actor.generation = asyncio.create_task(self.run_turn(turn))
+                try:
+                    await asyncio.wait({actor.generation})
+                except asyncio.CancelledError:
+                    actor.generation.cancel()
+                    raise
+                
+                if actor.generation.cancelled():
+                    # Superseded by newer input - fold these messages into the next turn
+                    self.stats['superseded'] += 1
+                    actor.pending = turn.items + actor.pending
+                    logger.info(f"Superseded in-flight turn for chat {chat_id} with newer messages")
+                    continue
+                
+                self.stats['turns'] += 1
+                self.stats['merged_messages'] += len(turn.items) - 1
+                if actor.generation.exception():
+                    self.stats['failed'] += 1
+                    logger.error(f"Error handling turn for chat {chat_id}: {actor.generation.exception()}")
+        finally:
+            actor.current = None
+            actor.generation = None
+            if self._actors.get(chat_id) is actor and not actor.pending:
+                del self._actors[chat_id]
+    
+    async def stop(self):
+        """Cancel every chat actor and its in-flight turn"""
+        workers = [actor.worker for actor in self._actors.values() if actor.worker and not actor.worker.done()]
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        self._actors.clear()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get turn, merge and supersede counts"""
+        stats = dict(self.stats)
+        stats['active_chats'] = len(self._actors)
+        return stats
@@ -1,11 +1,30 @@
-from typing import Optional
-from ..core import UserMemoryManager, StoryMatcher, StoryManager, LLMJudge
-from ..database.repositories import DigitalTwinRepository, ConversationRepository
+import asyncio
+import random
+import statistics
+from collections import deque
+from typing import Awaitable, Callable, Dict, List, Optional
+from ..core import (
+    UserMemoryManager, StoryMatcher, StoryManager, LLMJudge, TurnContext, 
+    SemanticResponseCache, TwinRegistry, Stage, TurnAborted, TurnPipeline
+)
+from ..database.repositories import ConversationRepository
+from ..database.write_behind import WriteBehindBuffer
+from ..utils.config import Config
 from ..utils.llm_client import LLMClient
+from ..utils.llm_scheduler import Priority
 from ..utils.logger import setup_logger
 
 logger = setup_logger(__name__)
 
+# Template replies used while the LLM circuit breaker is open
+FALLBACK_REPLIES = [
+    "I hear you! Tell me more about that.",
+    "Oh, interesting - what happened next?",
+    "That's really something. How did you feel about it?",
+    "Ha, I love that. What got you thinking about it?",
+    "Hmm, tell me a bit more - I'm curious."
+]
+
 class ConversationManager:
     """Manages conversation flow and responses"""
     
@@ -14,59 +33,127 @@ class ConversationManager:
         self.story_matcher = StoryMatcher()
         self.story_manager = StoryManager()
         self.llm_judge = LLMJudge()
-        self.twin_repo = DigitalTwinRepository()
+        self.twin_registry = TwinRegistry.shared()
         self.conversation_repo = ConversationRepository()
+        self.write_buffer = WriteBehindBuffer.shared()
         self.llm_client = LLMClient()
+        self.background_llm_client = LLMClient(priority=Priority.EXTRACTION)
+        self.response_cache = SemanticResponseCache.shared()
+        self.latency_samples: Dict[str, deque] = {}
+        self.pipeline = self._build_pipeline()
+    
+    def _build_pipeline(self) -> TurnPipeline:
+        """Declare a turn as stages; independent loads and extraction overlap"""
+        return TurnPipeline([
+            Stage('memory', self.user_memory.load_memory),
+            # conversation_sessions.chat_id references user_memory, which the memory stage creates
+            Stage('session', self._load_session, depends_on=('memory',)),
+            Stage('twin', self._load_twin),
+            Stage('extract', self.user_memory.extract_turn_info, optional=True),
+            Stage('context', self._build_context, depends_on=('memory', 'extract')),
+            Stage(
+                'respond', self._respond_pipeline, depends_on=('context', 'session', 'twin'),
+                variants={'pipeline': self._respond_pipeline, 'combined': self._respond_combined}
+            )
+        ])
     
-    async def handle_user_message(self, chat_id: int, user_message: str) -> str:
-        """Main conversation handler"""
+    async def handle_user_message(
+        self, 
+        chat_id: int, 
+        user_message: str, 
+        twin_id: Optional[str] = None,
+        on_text: Optional[Callable[[str], Awaitable[None]]] = None,
+        on_commit: Optional[Callable[[], None]] = None
+    ) -> str:
+        """Main conversation handler; on_text receives partial replies, on_commit fires before the first write"""
+        turn = TurnContext(
+            chat_id=chat_id, twin_id=twin_id or '', user_message=user_message, on_text=on_text, on_commit=on_commit
+        )
         try:
-            # Update user memory
-            await self.user_memory.update_from_message(chat_id, user_message)
-            
-            # Get current session
-            session = await self.conversation_repo.get_or_create_session(chat_id)
+            # Reads below must see this chat's writes still sitting in the write-behind buffer
+            await self.write_buffer.barrier(chat_id)
             
-            if not session.twin_id:
-                return "Please select a digital twin first using /start"
+            if not turn.twin_id:
+                # Bots not bound to a twin talk as the one picked with /start
+                turn.session = await self.conversation_repo.get_active_session(chat_id)
+                if not turn.session or not turn.session.twin_id:
+                    return "Please select a digital twin first using /start"
+                turn.twin_id = turn.session.twin_id
             
-            # Get twin and context
-            twin = await self.twin_repo.get_twin_by_id(session.twin_id)
-            if not twin:
-                return "Sorry, I can't find the selected digital twin."
+            overrides = Config.get_stage_overrides(turn.twin_id)
+            variants = overrides['variants']
+            # Generate response with this twin's response mode unless a variant is configured
+            mode = variants.get('respond', Config.get_response_mode(turn.twin_id))
+            if mode == 'combined' and not LLMClient.is_available():
+                # The pipeline has local fallbacks for every stage; the combined call doesn't
+                mode = 'pipeline'
+            variants['respond'] = mode
             
-            user_context = await self.user_memory.get_user_context_string(chat_id)
-            conversation_context = await self.user_memory.get_recent_conversation(chat_id)
-            
-            # Generate response
-            response = await self._generate_contextual_response(
-                chat_id, user_message, twin, user_context, conversation_context, session
-            )
+            await self.pipeline.run(turn, disabled=overrides['disabled'], variants=variants)
+            self._record_latency(mode, turn.stage_timings['respond'])
+            logger.debug(f"Turn stage timings for chat {chat_id}: {turn.stage_timings}")
             
             # Store response
-            await self.user_memory.add_twin_response(chat_id, response)
-            
-            return response
+            self.user_memory.apply_twin_response(turn, turn.response)
+            return turn.response
             
+        except TurnAborted as e:
+            turn.dirty = False
+            return e.reply
+        except asyncio.CancelledError:
+            # Superseded by newer messages that will be handled together - don't record this turn
+            turn.dirty = False
+            raise
         except Exception as e:
             logger.error(f"Error handling user message: {e}")
             return "Sorry, I'm having trouble responding right now. Try again in a moment!"
+        finally:
+            # Superseded and aborted turns aren't recorded, so their deferred effects are dropped
+            if turn.dirty:
+                turn.run_deferred()
+            # Single write-back of profile and conversation history
+            if turn.memory is not None:
+                await self.user_memory.save_turn_context(turn)
     
-    async def _generate_contextual_response(
-        self, 
-        chat_id: int, 
-        user_message: str, 
-        twin, 
-        user_context: str, 
-        conversation_context: str,
-        session
-    ) -> str:
+    async def _load_session(self, turn: TurnContext):
+        """Pipeline stage: active session for this chat and twin, unless it was loaded to pick the twin"""
+        if turn.session is None:
+            turn.session = await self.conversation_repo.get_or_create_session(turn.chat_id, turn.twin_id)
+    
+    async def _load_twin(self, turn: TurnContext):
+        """Pipeline stage: the twin being talked to"""
+        turn.twin = await self.twin_registry.get_twin(turn.twin_id)
+        if not turn.twin:
+            raise TurnAborted("Sorry, I can't find the selected digital twin.")
+    
+    async def _build_context(self, turn: TurnContext):
+        """Pipeline stage: update user memory on the snapshot and derive prompt context from it"""
+        self.user_memory.record_user_message(turn)
+    
+    async def _respond_pipeline(self, turn: TurnContext):
+        """Pipeline stage: judge, then story or conversational reply"""
+        turn.response = await self._generate_contextual_response(turn)
+    
+    async def _respond_combined(self, turn: TurnContext):
+        """Pipeline stage: decide and draft the reply in one structured call"""
+        turn.response = await self._generate_combined_response(turn)
+    
+    def get_stage_stats(self) -> Dict[str, Dict[str, float]]:
+        """Get per-stage turn timings"""
+        return self.pipeline.get_stats()
+    
+    async def _generate_contextual_response(self, turn: TurnContext) -> str:
         """Generate response based on conversation context"""
+        chat_id = turn.chat_id
+        twin = turn.twin
+        session = turn.session
         
         # If there's an active story, check if user wants to continue
         if session.current_story_id:
+            # Continuing or dropping the story writes progress right away
+            turn.commit()
             story_response = await self.story_manager.continue_story_naturally(
-                chat_id, session.current_story_id, user_message
+                chat_id, session.current_story_id, turn.user_message, twin.twin_id
             )
             
             if story_response:
@@ -75,34 +162,163 @@ class ConversationManager:
         
         # Use LLM Judge to determine conversation action
         action = await self.llm_judge.determine_conversation_action(
-            twin.name, twin.__dict__, user_message, user_context, conversation_context
+            twin.name, twin.__dict__, turn.user_message, turn.user_context, turn.conversation_context,
+            chat_id=chat_id, twin_id=twin.twin_id, defer=turn.defer
         )
         
-        if action['type'] == 'share_story' and action['confidence'] > 0.6:
+        if action['type'] == 'share_story' and self._confidence(action) > 0.6:
             # Select and start sharing a relevant story
             story = await self.story_matcher.select_best_story(
-                twin.twin_id, user_context, conversation_context, chat_id
+                twin.twin_id, turn.user_context, turn.conversation_context, chat_id
             )
             
             if story:
                 return await self.story_manager.start_story_naturally(
                     chat_id, story, twin.name, twin.__dict__, 
-                    user_context, action.get('transition', '')
+                    turn.user_context, action.get('transition', ''), twin.twin_id,
+                    on_text=turn.on_text, on_commit=turn.commit
                 )
         
         # Default: Generate regular conversational response
         return await self._generate_conversational_response(
-            twin, user_message, user_context, conversation_context
+            twin, turn.user_message, turn.user_context, turn.conversation_context,
+            on_text=turn.on_text, standalone=self._is_standalone(turn)
+        )
+    
+    async def _generate_combined_response(self, turn: TurnContext) -> str:
+        """Decide the action and draft the reply in one structured LLM call"""
+        chat_id = turn.chat_id
+        twin = turn.twin
+        
+        # Active stories still continue through the story manager
+        if turn.session.current_story_id:
+            turn.commit()
+            story_response = await self.story_manager.continue_story_naturally(
+                chat_id, turn.session.current_story_id, turn.user_message, twin.twin_id
+            )
+            
+            if story_response:
+                return story_response
+        
+        style_instructions = twin.get_style_instructions()
+        
+        prompt = f"""
+        You are {twin.name}, a digital twin with a rich personal history.
+        
+        Personality: {twin.personality_traits}
+        Background: {twin.background}
+        
+        Style guidelines:
+        {style_instructions}
+        
+        User context: {turn.user_context}
+        Recent conversation: {turn.conversation_context}
+        
+        User just said: "{turn.user_message}"
+        
+        First decide whether this is a natural moment to share a personal story
+        (the user is asking about experiences or events, or an anecdote would enhance the conversation).
+        Then write your conversational reply as {twin.name}: natural, engaging, authentic to your
+        personality, typically 1-3 sentences, optionally with a follow-up question.
+        
+        Respond with JSON:
+        {{
+            "type": "regular_chat|share_story",
+            "confidence": 0.0-1.0,
+            "transition": "natural transition phrase if sharing story",
+            "reply": "your conversational reply"
+        }}
+        """
+        
+        result = await self.llm_client.simple_prompt(prompt, temperature=0.7, json_response=True)
+        if not isinstance(result, dict):
+            result = {}
+        
+        if result.get('type') == 'share_story' and self._confidence(result) > 0.6:
+            story = await self.story_matcher.select_best_story(
+                twin.twin_id, turn.user_context, turn.conversation_context, chat_id
+            )
+            
+            if story:
+                return await self.story_manager.start_story_naturally(
+                    chat_id, story, twin.name, twin.__dict__, 
+                    turn.user_context, result.get('transition', ''), twin.twin_id,
+                    on_text=turn.on_text, on_commit=turn.commit
+                )
+        
+        reply = result.get('reply')
+        if reply:
+            return reply
+        
+        # Structured output failed - the story decision above stands, so only the reply is regenerated
+        logger.warning(f"Combined response for twin {twin.twin_id} had no reply, generating a conversational one")
+        return await self._generate_conversational_response(
+            twin, turn.user_message, turn.user_context, turn.conversation_context,
+            on_text=turn.on_text, standalone=self._is_standalone(turn)
         )
     
+    @staticmethod
+    def _confidence(decision: Dict) -> float:
+        """A decision's confidence as a float; models sometimes return it as a string"""
+        try:
+            return float(decision.get('confidence', 0))
+        except (TypeError, ValueError):
+            return 0.0
+    
+    def _is_standalone(self, turn: TurnContext) -> bool:
+        """Whether the turn opens a conversation: no story going and no earlier turns with this twin"""
+        if turn.session and turn.session.current_story_id:
+            return False
+        # The history snapshot already includes this turn's message
+        return len(self.user_memory.filter_twin_history(turn.memory, turn.twin_id)) <= 1
+    
+    def _record_latency(self, mode: str, elapsed: float):
+        """Keep recent turn latencies per response mode"""
+        self.latency_samples.setdefault(mode, deque(maxlen=1000)).append(elapsed)
+    
+    def get_latency_comparison(self) -> Dict[str, Dict[str, float]]:
+        """Compare turn latency between response modes"""
+        comparison = {}
+        for mode, samples in self.latency_samples.items():
+            if not samples:
+                continue
+            ordered = sorted(samples)
+            comparison[mode] = {
+                'turns': len(ordered),
+                'median_seconds': statistics.median(ordered),
+                'p95_seconds': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+                'mean_seconds': statistics.fmean(ordered)
+            }
+        return comparison
+    
     async def _generate_conversational_response(
         self, 
         twin, 
         user_message: str, 
         user_context: str, 
-        conversation_context: str
+        conversation_context: str,
+        on_text: Optional[Callable[[str], Awaitable[None]]] = None,
+        standalone: bool = False
     ) -> str:
-        """Generate regular conversational response"""
+        """Generate regular conversational response; standalone turns may be served from the response cache"""
+        use_cache = (
+            self.response_cache.enabled_for(twin.twin_id) 
+            and self.response_cache.is_cacheable(user_message, standalone)
+        )
+        if use_cache:
+            cached = await self.response_cache.lookup(twin, user_message)
+            if cached:
+                return cached
+        
+        if not LLMClient.is_available():
+            return random.choice(FALLBACK_REPLIES)
+        
+        if use_cache:
+            # The reply below is personalised, so fill the shared pool with context-free variants
+            self.response_cache.schedule_fill(
+                twin, user_message, lambda: self._generate_reply_variants(twin, user_message)
+            )
+        
         try:
             style_instructions = twin.get_style_instructions()
             
@@ -130,16 +346,46 @@ class ConversationManager:
             Keep responses natural and flowing - typically 1-3 sentences unless elaborating on something specific.
             """
             
+            if on_text:
+                return await self.llm_client.stream_simple_prompt(prompt, on_text, temperature=0.7)
             return await self.llm_client.simple_prompt(prompt, temperature=0.7)
             
         except Exception as e:
             logger.error(f"Error generating conversational response: {e}")
-            return "I hear you! Tell me more about that."
+            return random.choice(FALLBACK_REPLIES)
+    
+    async def _generate_reply_variants(self, twin, user_message: str) -> List[str]:
+        """Generate several user-independent replies to a generic question for the response cache"""
+        style_instructions = twin.get_style_instructions()
+        
+        prompt = f"""
+        You are {twin.name}, a digital twin with a rich personal history.
+        
+        Personality: {twin.personality_traits}
+        Background: {twin.background}
+        
+        Style guidelines:
+        {style_instructions}
+        
+        Someone you just met asks: "{user_message}"
+        
+        Write {self.response_cache.pool_size} different replies as {twin.name}, each natural, engaging and
+        authentic to your personality, typically 1-3 sentences. Don't assume anything about who is asking.
+        
+        Respond with JSON:
+        {{
+            "replies": ["reply 1", "reply 2"]
+        }}
+        """
+        
+        result = await self.background_llm_client.simple_prompt(prompt, temperature=0.9, json_response=True)
+        replies = result.get('replies', []) if isinstance(result, dict) else []
+        return [reply for reply in replies if isinstance(reply, str)]
     
     async def generate_twin_greeting(self, twin, chat_id: int) -> str:
         """Generate personalized greeting from twin"""
         try:
-            user_context = await self.user_memory.get_user_context_string(chat_id)
+            user_context = await self.user_memory.get_user_context_string(chat_id, twin.twin_id)
             style_instructions = twin.get_style_instructions()
             
             prompt = f"""
@@ -0,0 +1,104 @@
+import asyncio
+import time
+from typing import Optional
+from telegram import Message
+from telegram.constants import ChatAction
+from telegram.error import BadRequest, RetryAfter
+from ..utils.config import Config
+from ..utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+TELEGRAM_MESSAGE_LIMIT = 4096
+# Sent when a reply ends up empty, since Telegram rejects empty messages
+EMPTY_REPLY_FALLBACK = "Hmm, I lost my train of thought there - could you say that again?"
+
+class ProgressiveReply:
+    """Shows a streaming reply as one Telegram message that is edited at a throttled cadence"""
+    
+    def __init__(self, bot, chat_id: int, reply_to: Message, edit_interval: float = None):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.reply_to = reply_to
+        self.edit_interval = Config.STREAM_EDIT_INTERVAL if edit_interval is None else edit_interval
+        self.message: Optional[Message] = None
+        self.shown_text = ""
+        self.last_edit = 0.0
+        self.started = time.monotonic()
+        self.first_text_latency: Optional[float] = None
+        self._typing_task: Optional[asyncio.Task] = None
+    
+    def start_typing(self):
+        """Keep the typing indicator alive until the first text is shown"""
+        self._typing_task = asyncio.create_task(self._keep_typing())
+    
+    async def _keep_typing(self):
+        """Telegram clears chat actions after ~5s, so resend until cancelled"""
+        try:
+            while True:
+                await self.bot.send_chat_action(chat_id=self.chat_id, action=ChatAction.TYPING)
+                await asyncio.sleep(4)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.debug(f"Typing indicator stopped for chat {self.chat_id}: {e}")
+    
+    def _stop_typing(self):
+        """Stop the typing indicator"""
+        if self._typing_task:
+            self._typing_task.cancel()
+            self._typing_task = None
+    
+    def cancel(self):
+        """Abandon the reply before anything was shown"""
+        self._stop_typing()
+    
+    async def update(self, text: str):
+        """Show partial text, editing no more often than the edit interval"""
+        if not text.strip():
+            return
+        
+        if self.message is None:
+            self._stop_typing()
+            self.message = await self.reply_to.reply_text(text[:TELEGRAM_MESSAGE_LIMIT])
+            self.shown_text = text
+            self.last_edit = time.monotonic()
+            self.first_text_latency = self.last_edit - self.started
+            return
+        
+        if time.monotonic() - self.last_edit >= self.edit_interval:
+            await self._edit(text)
+    
+    async def finish(self, text: str):
+        """Show the final text, sending overflow beyond Telegram's limit as extra messages"""
+        self._stop_typing()
+        if not text or not text.strip():
+            text = EMPTY_REPLY_FALLBACK
+        
+        if self.message is None:
+            await self.update(text)
+        elif text != self.shown_text:
+            await self._edit(text, final=True)
+        
+        for start in range(TELEGRAM_MESSAGE_LIMIT, len(text), TELEGRAM_MESSAGE_LIMIT):
+            await self.reply_to.reply_text(text[start:start + TELEGRAM_MESSAGE_LIMIT])
+    
+    async def _edit(self, text: str, final: bool = False):
+        """Edit the streamed message, respecting Telegram flood limits"""
+        visible = text[:TELEGRAM_MESSAGE_LIMIT]
+        if visible == self.shown_text[:TELEGRAM_MESSAGE_LIMIT]:
+            return
+        try:
+            await self.message.edit_text(visible)
+            self.shown_text = text
+        except RetryAfter as e:
+            # Back off on flood control; the final edit waits so the full reply lands
+            self.last_edit = time.monotonic() + e.retry_after
+            if final:
+                await asyncio.sleep(e.retry_after)
+                await self._edit(text, final=True)
+            return
+        except BadRequest as e:
+            if "not modified" not in str(e).lower():
+                logger.warning(f"Failed to edit streamed reply for chat {self.chat_id}: {e}")
+        self.last_edit = time.monotonic()
@@ -1,12 +1,18 @@
-from typing import List
+import asyncio
+import statistics
+from collections import deque
+from typing import Dict, List, Optional, Any
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import (
     Application, CommandHandler, MessageHandler, 
     CallbackQueryHandler, filters, ContextTypes
 )
 
+from .chat_mailbox import ChatMailbox, ChatTurn
 from .conversation_manager import ConversationManager
-from ..database.repositories import DigitalTwinRepository, ConversationRepository
+from .streaming import ProgressiveReply, EMPTY_REPLY_FALLBACK
+from ..core import TwinRegistry
+from ..database.repositories import ConversationRepository
 from ..utils.config import Config
 from ..utils.logger import setup_logger
 
@@ -15,14 +21,25 @@ logger = setup_logger(__name__)
 class TelegramBot:
     """Main Telegram bot class"""
     
-    def __init__(self):
+    def __init__(self, twin_id: Optional[str] = None):
+        # Bound bots always talk as this twin; unbound ones use the twin picked with /start
+        self.twin_id = twin_id or Config.DEFAULT_TWIN_ID or None
         self.conversation_manager = ConversationManager()
-        self.twin_repo = DigitalTwinRepository()
+        self.twin_registry = TwinRegistry.shared()
+        self._twin_keyboard: Optional[InlineKeyboardMarkup] = None
+        self._twin_keyboard_version = -1
         self.conversation_repo = ConversationRepository()
+        self.first_text_latencies = deque(maxlen=1000)
+        self.mailbox = ChatMailbox(self._run_turn)
     
     def create_application(self) -> Application:
         """Create and configure Telegram application"""
-        application = Application.builder().token(Config.TELEGRAM_BOT_TOKEN).build()
+        application = (
+            Application.builder()
+            .token(Config.TELEGRAM_BOT_TOKEN)
+            .post_shutdown(self._on_shutdown)
+            .build()
+        )
         
         # Add handlers
         application.add_handler(CommandHandler("start", self.start_command))
@@ -38,26 +55,33 @@ class TelegramBot:
         
         return application
     
+    async def _on_shutdown(self, application: Application):
+        """Cancel queued and in-flight turns when the application stops"""
+        await self.mailbox.stop()
+    
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /start command"""
         chat_id = update.effective_chat.id
         
-        # Get available twins
-        twins = await self.twin_repo.get_all_twins()
-        
-        if not twins:
-            await update.message.reply_text("Sorry, no digital twins are available right now.")
+        if self.twin_id:
+            # Bound bots don't offer the picker
+            twin = await self.twin_registry.get_twin(self.twin_id)
+            if not twin:
+                await update.message.reply_text("Sorry, I can't find the selected digital twin.")
+                return
+            greeting_message = await self.conversation_manager.generate_twin_greeting(twin, chat_id)
+            await update.message.reply_text(
+                f"🎭 You're chatting with {twin.name}\n\n{greeting_message}\n\n"
+                f"Just chat naturally, or use /help for more commands"
+            )
             return
         
-        # Create inline keyboard with available twins
-        keyboard = []
-        for twin in twins:
-            keyboard.append([InlineKeyboardButton(
-                twin.name, 
-                callback_data=f"select_twin:{twin.twin_id}"
-            )])
+        # Inline keyboard with available twins
+        reply_markup = await self._get_twin_keyboard()
         
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        if not reply_markup:
+            await update.message.reply_text("Sorry, no digital twins are available right now.")
+            return
         
         welcome_message = (
             "🤖 Welcome to the Digital Twins Story Bot!\n\n"
@@ -68,6 +92,20 @@ class TelegramBot:
         
         await update.message.reply_text(welcome_message, reply_markup=reply_markup)
     
+    async def _get_twin_keyboard(self) -> Optional[InlineKeyboardMarkup]:
+        """Twin picker keyboard, rebuilt only when the twin registry changes"""
+        twins = await self.twin_registry.get_all_twins()
+        if self._twin_keyboard_version != self.twin_registry.version:
+            keyboard = []
+            for twin in twins:
+                keyboard.append([InlineKeyboardButton(
+                    twin.name, 
+                    callback_data=f"select_twin:{twin.twin_id}"
+                )])
+            self._twin_keyboard = InlineKeyboardMarkup(keyboard) if keyboard else None
+            self._twin_keyboard_version = self.twin_registry.version
+        return self._twin_keyboard
+    
     async def twin_selection_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle twin selection from inline keyboard"""
         query = update.callback_query
@@ -80,7 +118,7 @@ class TelegramBot:
         await self.conversation_repo.set_active_twin(chat_id, twin_id)
         
         # Get twin info
-        twin = await self.twin_repo.get_twin_by_id(twin_id)
+        twin = await self.twin_registry.get_twin(twin_id)
         
         if twin:
             greeting_message = await self.conversation_manager.generate_twin_greeting(twin, chat_id)
@@ -97,15 +135,64 @@ class TelegramBot:
             await query.edit_message_text("Sorry, I couldn't find that digital twin.")
     
     async def handle_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Handle regular messages"""
-        chat_id = update.effective_chat.id
-        user_message = update.message.text
+        """Handle regular messages - queued on the chat's mailbox so bursts become one turn"""
+        self.mailbox.submit(update.effective_chat.id, update.message.text, update, context)
+    
+    async def _run_turn(self, turn: ChatTurn):
+        """Generate and send the reply for one (possibly merged) turn"""
+        chat_id = turn.chat_id
+        message = turn.update.message
         
-        response = await self.conversation_manager.handle_user_message(chat_id, user_message)
-        await update.message.reply_text(response)
+        def on_commit():
+            turn.committed = True
+        
+        if not Config.STREAMING_ENABLED:
+            response = await self.conversation_manager.handle_user_message(
+                chat_id, turn.text, self.twin_id, on_commit=on_commit
+            )
+            turn.committed = True
+            await message.reply_text(response or EMPTY_REPLY_FALLBACK)
+            return
+        
+        # Stream the reply into one message that is edited as tokens arrive
+        reply = ProgressiveReply(turn.context.bot, chat_id, message)
+        reply.start_typing()
+        
+        async def on_text(text: str):
+            turn.committed = True
+            await reply.update(text)
+        
+        try:
+            response = await self.conversation_manager.handle_user_message(
+                chat_id, turn.text, self.twin_id, on_text=on_text, on_commit=on_commit
+            )
+        except asyncio.CancelledError:
+            reply.cancel()
+            raise
+        turn.committed = True
+        await reply.finish(response)
+        
+        if reply.first_text_latency is not None:
+            self.first_text_latencies.append(reply.first_text_latency)
+            logger.info(f"Time to first visible text for chat {chat_id}: {reply.first_text_latency:.2f}s")
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get time-to-first-visible-text statistics for streamed replies and mailbox counters"""
+        samples = sorted(self.first_text_latencies)
+        if not samples:
+            return {'replies': 0, 'mailbox': self.mailbox.get_stats()}
+        return {
+            'replies': len(samples),
+            'ttfvt_median_seconds': statistics.median(samples),
+            'ttfvt_p95_seconds': samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+            'mailbox': self.mailbox.get_stats()
+        }
     
     async def twins_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /twins command to switch twins"""
+        if self.twin_id:
+            await update.message.reply_text("This bot is dedicated to one digital twin - just keep chatting! 😊")
+            return
         await self.start_command(update, context)
     
     async def story_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
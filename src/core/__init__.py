@@ -2,5 +2,27 @@ from .user_memory import UserMemoryManager
 from .story_matcher import StoryMatcher
 from .story_manager import StoryManager
 from .llm_judge import LLMJudge
+from .turn_context import TurnContext
+from .extraction_worker import ExtractionWorker
+from .response_cache import SemanticResponseCache
+from .twin_registry import TwinRegistry
+from .story_catalogue import StoryCatalogue, TwinCatalogue
+from .conversation_history import ConversationHistoryStore
+from .turn_pipeline import Stage, TurnAborted, TurnPipeline
 
-__all__ = ['UserMemoryManager', 'StoryMatcher', 'StoryManager', 'LLMJudge']
\ No newline at end of file
+__all__ = [
+    'UserMemoryManager',
+    'StoryMatcher',
+    'StoryManager',
+    'LLMJudge',
+    'TurnContext',
+    'ExtractionWorker',
+    'SemanticResponseCache',
+    'TwinRegistry',
+    'StoryCatalogue',
+    'TwinCatalogue',
+    'ConversationHistoryStore',
+    'Stage',
+    'TurnAborted',
+    'TurnPipeline'
+]
@@ -0,0 +1,135 @@
+import sys
+from datetime import datetime
+from collections import OrderedDict, deque
+from itertools import islice
+from typing import Deque, Dict, List, Optional, Any, Tuple
+from ..database.repositories import ConversationTurnRepository
+from ..utils.config import Config
+from ..utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+class ConversationHistoryStore:
+    """Bounded per-(chat, twin) history rings in front of the conversation_turns table"""
+    
+    _shared: Optional['ConversationHistoryStore'] = None
+    
+    def __init__(self, max_rings: int = None):
+        self.repository = ConversationTurnRepository()
+        self.max_rings = max_rings or Config.CONVERSATION_HISTORY_CACHE_SIZE
+        self._rings: 'OrderedDict[Tuple[int, str], Deque[Dict[str, Any]]]' = OrderedDict()
+        self.stats = {
+            'reads': 0,
+            'ring_hits': 0,
+            'loads': 0,
+            'appends': 0,
+            'evictions': 0
+        }
+    
+    @classmethod
+    def shared(cls) -> 'ConversationHistoryStore':
+        """Process-wide store shared by every conversation manager"""
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
+    
+    @staticmethod
+    def capacity(twin_id: str) -> int:
+        """How many turns are kept for a chat with this twin"""
+        return Config.get_history_limit(twin_id)
+    
+    async def _ring(self, chat_id: int, twin_id: str) -> Deque[Dict[str, Any]]:
+        """The ring for a chat/twin pair, loaded from the database on first use"""
+        key = (chat_id, twin_id)
+        ring = self._rings.get(key)
+        if ring is not None:
+            self._rings.move_to_end(key)
+            self.stats['ring_hits'] += 1
+            return ring
+        
+        capacity = self.capacity(twin_id)
+        turns = await self.repository.get_recent_turns(chat_id, twin_id, capacity)
+        ring = deque(turns, maxlen=capacity)
+        self._rings[key] = ring
+        self.stats['loads'] += 1
+        while len(self._rings) > self.max_rings:
+            self._rings.popitem(last=False)
+            self.stats['evictions'] += 1
+        return ring
+    
+    async def recent(self, chat_id: int, twin_id: str, limit: int) -> List[Dict[str, Any]]:
+        """Last `limit` turns with this twin, oldest first"""
+        self.stats['reads'] += 1
+        ring = await self._ring(chat_id, twin_id)
+        turns = list(islice(reversed(ring), limit))
+        turns.reverse()
+        return turns
+    
+    async def append(
+        self,
+        chat_id: int,
+        twin_id: str,
+        user_message: str,
+        extracted_info: Dict[str, Any] = None,
+        twin_response: Optional[str] = None
+    ) -> Optional[int]:
+        """Persist a turn (trimming the twin's oldest turns past its cap) and push it onto the ring"""
+        ring = self._rings.get((chat_id, twin_id))
+        if ring is not None and self.repository.writes.active:
+            # The ring holds the newest turns, so the next turn_seq is known without a round trip
+            turn_seq = (ring[-1].get('turn_seq') or 0) + 1 if ring else 1
+            queued = await self.repository.queue_turn(
+                chat_id, twin_id, turn_seq, user_message, extracted_info, twin_response, keep=self.capacity(twin_id)
+            )
+            if not queued:
+                return None
+        else:
+            turn_seq = await self.repository.append_turn(
+                chat_id, twin_id, user_message, extracted_info, twin_response, keep=self.capacity(twin_id)
+            )
+            if turn_seq is None:
+                return None
+        
+        self.stats['appends'] += 1
+        if ring is not None:
+            ring.append({
+                'turn_seq': turn_seq,
+                'timestamp': datetime.now().isoformat(),
+                'user_message': user_message,
+                'twin_response': twin_response,
+                'twin_id': twin_id
+            })
+        return turn_seq
+    
+    async def set_twin_response(self, chat_id: int, twin_id: str, twin_response: str, turn_seq: int) -> bool:
+        """Record a reply on a stored turn"""
+        saved = await self.repository.set_twin_response(chat_id, twin_id, twin_response, turn_seq)
+        ring = self._rings.get((chat_id, twin_id))
+        if saved and ring is not None:
+            # The turn is almost always the newest one
+            for turn in reversed(ring):
+                if turn.get('turn_seq') == turn_seq:
+                    turn['twin_response'] = twin_response
+                    break
+        return saved
+    
+    def forget(self, chat_id: int, twin_id: str):
+        """Drop the cached ring, e.g. after the twin's history was cleared"""
+        self._rings.pop((chat_id, twin_id), None)
+    
+    @staticmethod
+    def _turn_bytes(turn: Dict[str, Any]) -> int:
+        """Approximate memory held by one cached turn"""
+        return sys.getsizeof(turn) + sum(sys.getsizeof(value) for value in turn.values())
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get ring counts, cached turns and approximate memory use"""
+        stats = dict(self.stats)
+        stats['rings'] = len(self._rings)
+        stats['cached_turns'] = sum(len(ring) for ring in self._rings.values())
+        stats['approx_bytes'] = sum(self._turn_bytes(turn) for ring in self._rings.values() for turn in ring)
+        return stats
+    
+    async def get_storage_stats(self) -> Dict[str, Any]:
+        """Get per-twin row counts and row sizes of the conversation_turns table"""
+        return await self.repository.get_history_stats()
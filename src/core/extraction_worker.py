@@ -0,0 +1,159 @@
+import asyncio
+import time
+from typing import Dict, List, Optional, Any, Set
+from ..database.repositories import UserMemoryRepository
+from ..utils.config import Config
+from ..utils.llm_client import LLMClient
+from ..utils.llm_scheduler import Priority
+from ..utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+class ExtractionWorker:
+    """Background worker pool that extracts user info off the reply path"""
+    
+    _shared: Optional['ExtractionWorker'] = None
+    
+    def __init__(
+        self,
+        workers: int = None,
+        max_pending: int = None,
+        batch_window: float = None,
+        max_batch: int = None
+    ):
+        self.repository = UserMemoryRepository()
+        self.llm_client = LLMClient(priority=Priority.EXTRACTION)
+        self.worker_count = workers or Config.EXTRACTION_WORKERS
+        self.max_pending = max_pending or Config.EXTRACTION_MAX_PENDING
+        self.batch_window = Config.EXTRACTION_BATCH_WINDOW if batch_window is None else batch_window
+        self.max_batch = max_batch or Config.EXTRACTION_MAX_BATCH
+        
+        # Each queued chat id has its pending messages collected here until a worker takes them
+        self.queue: Optional[asyncio.Queue] = None
+        self.pending: Dict[int, List[str]] = {}
+        self.queued_at: Dict[int, float] = {}
+        # Chats whose batch is being extracted; new messages for them wait until it finishes
+        self.in_flight: Set[int] = set()
+        self.pending_count = 0
+        self.tasks: List[asyncio.Task] = []
+        self.stats = {
+            'submitted': 0,
+            'dropped': 0,
+            'batches': 0,
+            'messages_extracted': 0,
+            'llm_calls_saved': 0,
+            'failures': 0,
+            'extraction_seconds': 0.0
+        }
+    
+    @classmethod
+    def shared(cls) -> 'ExtractionWorker':
+        """Process-wide worker shared by every UserMemoryManager"""
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
+    
+    def start(self):
+        """Start worker tasks on the running event loop"""
+        if self.tasks:
+            return
+        self.queue = asyncio.Queue()
+        self.tasks = [
+            asyncio.create_task(self._run(), name=f"extraction-worker-{i}")
+            for i in range(self.worker_count)
+        ]
+        logger.info(f"Started {self.worker_count} background extraction worker(s)")
+    
+    def submit(self, chat_id: int, user_message: str) -> bool:
+        """Queue a message for extraction; returns False when the queue is full"""
+        if not self.tasks:
+            self.start()
+        
+        if self.pending_count >= self.max_pending:
+            self.stats['dropped'] += 1
+            logger.warning(f"Extraction queue full ({self.pending_count} pending), dropping message for chat {chat_id}")
+            return False
+        
+        self.stats['submitted'] += 1
+        self.pending_count += 1
+        if chat_id in self.pending:
+            # Chat is already queued - the worker will pick this up in the same batch
+            self.pending[chat_id].append(user_message)
+        else:
+            self.pending[chat_id] = [user_message]
+            self.queued_at[chat_id] = time.monotonic()
+            if chat_id not in self.in_flight:
+                # Otherwise the running batch re-queues the chat when it finishes
+                self.queue.put_nowait(chat_id)
+        return True
+    
+    async def _run(self):
+        """Worker loop: take a chat, wait out the batch window, extract its pending messages"""
+        while True:
+            chat_id = await self.queue.get()
+            try:
+                # Give bursts a moment to accumulate before extracting
+                remaining = self.queued_at.get(chat_id, 0) + self.batch_window - time.monotonic()
+                if remaining > 0:
+                    await asyncio.sleep(remaining)
+                
+                messages = self.pending.pop(chat_id, [])
+                self.queued_at.pop(chat_id, None)
+                self.pending_count -= len(messages)
+                # One batch per chat at a time, so profile updates can't overwrite each other
+                self.in_flight.add(chat_id)
+                
+                for start in range(0, len(messages), self.max_batch):
+                    await self._extract_batch(chat_id, messages[start:start + self.max_batch])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Extraction worker error for chat {chat_id}: {e}")
+            finally:
+                if chat_id in self.in_flight:
+                    self.in_flight.discard(chat_id)
+                    if chat_id in self.pending:
+                        # Messages that arrived during the batch
+                        self.queue.put_nowait(chat_id)
+                self.queue.task_done()
+    
+    async def _extract_batch(self, chat_id: int, messages: List[str]):
+        """Extract info from a batch of messages and merge it into the profile"""
+        started = time.perf_counter()
+        try:
+            extracted_info = await self.llm_client.extract_user_info_batch(messages)
+            if extracted_info:
+                await self.repository.update_user_profile(chat_id, extracted_info)
+            
+            self.stats['batches'] += 1
+            self.stats['messages_extracted'] += len(messages)
+            self.stats['llm_calls_saved'] += len(messages) - 1
+        except Exception as e:
+            self.stats['failures'] += 1
+            logger.error(f"Error extracting user info for chat {chat_id}: {e}")
+        finally:
+            self.stats['extraction_seconds'] += time.perf_counter() - started
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get extraction worker statistics"""
+        stats = dict(self.stats)
+        stats['queue_depth'] = self.pending_count
+        stats['queued_chats'] = len(self.pending)
+        return stats
+    
+    async def stop(self, timeout: float = None):
+        """Drain pending extractions, then stop the workers"""
+        if not self.tasks:
+            return
+        
+        timeout = Config.EXTRACTION_DRAIN_TIMEOUT if timeout is None else timeout
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Extraction drain timed out with {self.pending_count} message(s) pending")
+        
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        logger.info(f"Extraction workers stopped: {self.get_stats()}")
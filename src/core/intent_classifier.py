@@ -0,0 +1,131 @@
+import re
+from pathlib import Path
+from typing import Dict, List, Optional, Any, Tuple
+from ..utils.config import Config
+from ..utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+ACTION_TYPES = ['regular_chat', 'share_story', 'continue_story']
+
+# Short replies that never warrant a story decision
+ACKNOWLEDGEMENTS = {
+    'ok', 'okay', 'k', 'kk', 'lol', 'lmao', 'haha', 'hahaha', 'hehe', 'thanks', 'thank you',
+    'thx', 'ty', 'cool', 'nice', 'yes', 'yeah', 'yep', 'no', 'nope', 'sure', 'hi', 'hello',
+    'hey', 'bye', 'good night', 'gn', 'morning', 'good morning', 'sounds good', 'got it', 'np'
+}
+
+STORY_REQUEST_PATTERNS = [
+    re.compile(r"\btell me (a|another|about a) (story|time)\b"),
+    re.compile(r"\bhave you ever\b"),
+    re.compile(r"\bwhat was (it|the) (like|hardest|best|worst)\b"),
+    re.compile(r"\b(any|got a) (story|stories)\b"),
+    re.compile(r"\bwhat happened when\b"),
+    re.compile(r"\bshare (a|an|some) (story|experience|memory)\b")
+]
+
+CONTINUATION_PATTERNS = [
+    re.compile(r"^(and )?then what\??$"),
+    re.compile(r"\bwhat happened next\b"),
+    re.compile(r"^(go on|keep going|continue|and then)\b")
+]
+
+NON_WORD_PATTERN = re.compile(r"^[\W_]+$")
+
+class IntentClassifier:
+    """Local rules + scikit-learn model that answers easy judge decisions without an LLM call"""
+    
+    def __init__(self, model_path: str = None, threshold: float = None):
+        self.model_path = model_path or Config.INTENT_MODEL_PATH
+        self.threshold = Config.INTENT_CONFIDENCE_THRESHOLD if threshold is None else threshold
+        self.model = self._load_model()
+    
+    def _load_model(self):
+        """Load the trained pipeline if one has been exported"""
+        path = Path(self.model_path)
+        if not path.exists():
+            logger.info(f"No intent model at {path}, using rules only")
+            return None
+        try:
+            import joblib
+            model = joblib.load(path)
+            logger.info(f"Loaded intent model from {path}")
+            return model
+        except Exception as e:
+            logger.error(f"Failed to load intent model from {path}: {e}")
+            return None
+    
+    def classify(self, user_message: str) -> Tuple[Dict[str, Any], bool]:
+        """Classify a message; returns (action, confident) where confident means skip the judge"""
+        action = self._apply_rules(user_message)
+        if action:
+            return action, True
+        
+        action = self._predict(user_message)
+        if action:
+            return action, action['confidence'] >= self.threshold
+        
+        return {'type': 'regular_chat', 'confidence': 0.0, 'reasoning': 'No local signal', 'transition': ''}, False
+    
+    def _apply_rules(self, user_message: str) -> Optional[Dict[str, Any]]:
+        """High-precision rules for trivially classifiable messages"""
+        text = user_message.strip().lower().rstrip('!.?')
+        
+        if not text or NON_WORD_PATTERN.match(text) or text in ACKNOWLEDGEMENTS:
+            return self._action('regular_chat', 0.95, 'Rule: acknowledgement or emoji')
+        
+        if any(pattern.search(text) for pattern in CONTINUATION_PATTERNS):
+            return self._action('continue_story', 0.9, 'Rule: continuation phrase')
+        
+        if any(pattern.search(text) for pattern in STORY_REQUEST_PATTERNS):
+            return self._action('share_story', 0.9, 'Rule: explicit story request')
+        
+        return None
+    
+    def _predict(self, user_message: str) -> Optional[Dict[str, Any]]:
+        """Predict with the trained model, if any"""
+        if self.model is None:
+            return None
+        try:
+            probabilities = self.model.predict_proba([user_message])[0]
+            best = probabilities.argmax()
+            return self._action(
+                str(self.model.classes_[best]), float(probabilities[best]), 'Local intent model'
+            )
+        except Exception as e:
+            logger.error(f"Intent model prediction failed: {e}")
+            return None
+    
+    @staticmethod
+    def _action(action_type: str, confidence: float, reasoning: str) -> Dict[str, Any]:
+        """Build an action dict in the judge's format"""
+        return {
+            'type': action_type,
+            'confidence': confidence,
+            'reasoning': reasoning,
+            'transition': ''
+        }
+    
+    @staticmethod
+    def train(messages: List[str], labels: List[str]):
+        """Train a TF-IDF + logistic regression pipeline on judge decisions"""
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.linear_model import LogisticRegression
+        from sklearn.pipeline import Pipeline
+        
+        pipeline = Pipeline([
+            ('tfidf', TfidfVectorizer(ngram_range=(1, 2), min_df=2, sublinear_tf=True)),
+            ('clf', LogisticRegression(max_iter=1000, class_weight='balanced'))
+        ])
+        pipeline.fit(messages, labels)
+        return pipeline
+    
+    @staticmethod
+    def export(model, model_path: str = None):
+        """Save a trained pipeline for IntentClassifier to load"""
+        import joblib
+        
+        path = Path(model_path or Config.INTENT_MODEL_PATH)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        joblib.dump(model, path)
+        logger.info(f"Exported intent model to {path}")
@@ -1,6 +1,13 @@
-from typing import Dict, Any
+import asyncio
+import functools
+import random
+from typing import Callable, Dict, Any, Optional, Tuple
+from ..database.repositories import JudgeDecisionRepository
+from ..utils.config import Config
 from ..utils.llm_client import LLMClient
+from ..utils.llm_scheduler import Priority
 from ..utils.logger import setup_logger
+from .intent_classifier import IntentClassifier
 
 logger = setup_logger(__name__)
 
@@ -8,7 +15,18 @@ class LLMJudge:
     """LLM-powered conversation decision making"""
     
     def __init__(self):
-        self.llm_client = LLMClient()
+        self.llm_client = LLMClient(priority=Priority.JUDGE)
+        self.intent_classifier = IntentClassifier() if Config.INTENT_CLASSIFIER_ENABLED else None
+        self.decision_repo = JudgeDecisionRepository()
+        self._log_tasks = set()
+        self.stats = {
+            'decisions': 0,
+            'local_decisions': 0,
+            'llm_decisions': 0,
+            'shadow_checks': 0,
+            'compared': 0,
+            'disagreements': 0
+        }
     
     async def determine_conversation_action(
         self, 
@@ -16,9 +34,79 @@ class LLMJudge:
         twin_personality: Dict[str, Any],
         user_message: str, 
         user_context: str, 
-        conversation_context: str
+        conversation_context: str,
+        chat_id: Optional[int] = None,
+        twin_id: Optional[str] = None,
+        defer: Optional[Callable[[Callable[[], None]], None]] = None
     ) -> Dict[str, Any]:
-        """Determine what action to take in conversation"""
+        """Determine what action to take in conversation; defer postpones decision logging until the turn is recorded"""
+        self.stats['decisions'] += 1
+        
+        # Local fast path - escalate to the LLM judge only when uncertain
+        local_action = None
+        if self.intent_classifier:
+            local_action, confident = self.intent_classifier.classify(user_message)
+            if confident:
+                if random.random() >= Config.INTENT_SHADOW_RATE:
+                    self.stats['local_decisions'] += 1
+                    return local_action
+                self.stats['shadow_checks'] += 1
+        
+        # Provider degraded - settle for the local guess rather than wait on a failing judge
+        if not LLMClient.is_available():
+            self.stats['local_decisions'] += 1
+            if local_action and local_action['confidence'] > 0:
+                return local_action
+            return self._default_action()
+        
+        action, fresh = await self._judge_with_llm(
+            twin_name, twin_personality, user_message, user_context, conversation_context
+        )
+        self.stats['llm_decisions'] += 1
+        
+        if local_action and local_action['confidence'] > 0:
+            self.stats['compared'] += 1
+            if local_action['type'] != action['type']:
+                self.stats['disagreements'] += 1
+                logger.debug(
+                    f"Intent classifier said {local_action['type']} ({local_action['confidence']:.2f}), "
+                    f"judge said {action['type']} for: {user_message[:80]}"
+                )
+        
+        # Log the outcome as training data without delaying the reply; cache hits would be duplicate rows
+        if fresh and action['reasoning'] != self._default_action()['reasoning']:
+            log = functools.partial(self._log_decision, chat_id, twin_id, user_message, action)
+            if defer:
+                defer(log)
+            else:
+                log()
+        
+        return action
+    
+    def _log_decision(self, chat_id: Optional[int], twin_id: Optional[str], user_message: str, action: Dict[str, Any]):
+        """Write a judge decision in the background"""
+        task = asyncio.create_task(
+            self.decision_repo.log_decision(chat_id, twin_id, user_message, action, source='llm')
+        )
+        self._log_tasks.add(task)
+        task.add_done_callback(self._log_tasks.discard)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get judge statistics including classifier skip and disagreement rates"""
+        stats = dict(self.stats)
+        stats['skip_rate'] = stats['local_decisions'] / stats['decisions'] if stats['decisions'] else 0.0
+        stats['disagreement_rate'] = stats['disagreements'] / stats['compared'] if stats['compared'] else 0.0
+        return stats
+    
+    async def _judge_with_llm(
+        self, 
+        twin_name: str,
+        twin_personality: Dict[str, Any],
+        user_message: str, 
+        user_context: str, 
+        conversation_context: str
+    ) -> Tuple[Dict[str, Any], bool]:
+        """Ask the LLM judge what action to take; also whether the answer is fresh from the provider"""
         try:
             judge_prompt = f"""
             You are an AI judge helping {twin_name} decide how to respond naturally in conversation.
@@ -49,15 +137,16 @@ class LLMJudge:
             }}
             """
             
-            result = await self.llm_client.simple_prompt(
+            result, cache_hit = await self.llm_client.simple_prompt_with_cache_hit(
                 judge_prompt, 
                 temperature=0.3, 
-                json_response=True
+                json_response=True,
+                cache_as='judge'
             )
             
             # Validate and provide defaults
             if not isinstance(result, dict):
-                return self._default_action()
+                return self._default_action(), False
             
             action_type = result.get('type', 'regular_chat')
             if action_type not in ['regular_chat', 'share_story', 'continue_story']:
@@ -68,11 +157,11 @@ class LLMJudge:
                 'confidence': result.get('confidence', 0.5),
                 'reasoning': result.get('reasoning', 'Default action'),
                 'transition': result.get('transition', '')
-            }
+            }, not cache_hit
             
         except Exception as e:
             logger.error(f"Error in conversation judge: {e}")
-            return self._default_action()
+            return self._default_action(), False
     
     def _default_action(self) -> Dict[str, Any]:
         """Default action when LLM judge fails"""
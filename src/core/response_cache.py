@@ -0,0 +1,222 @@
+import asyncio
+import hashlib
+import json
+import re
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional, Any, Set, Tuple
+import numpy as np
+from ..models import DigitalTwin
+from ..utils.config import Config
+from ..utils.logger import setup_logger
+from .story_index import Embedder, HashingEmbedder, create_embedder
+
+logger = setup_logger(__name__)
+
+QUESTION_WORDS = {
+    'what', "what's", 'who', "who's", 'where', "where's", 'when', 'why', 'how', "how's",
+    'which', 'do', 'does', 'did', 'are', 'is', 'can', 'could', 'would', 'have', 'will'
+}
+CONTINUATION_PHRASES = (
+    'ok', 'okay', 'yes', 'yeah', 'yep', 'no', 'nope', 'sure', 'thanks', 'thank you', 'cool', 'nice',
+    'and then', 'then what', 'what happened', 'what next', 'tell me more', 'go on', 'really', 'wow'
+)
+# Words that point back at something said earlier in the conversation
+CONTEXT_WORDS = {'that', 'this', 'it', "it's", 'he', 'she', 'they', 'them', 'him', 'her', 'then', 'there', 'those', 'again'}
+
+@dataclass
+class CachedQuestion:
+    """A recurring question and the pool of twin replies served for it"""
+    question: str
+    vector: np.ndarray
+    variants: List[str]
+    next_variant: int = 0
+    hits: int = 0
+    
+    def next_reply(self) -> str:
+        """Rotate through the variant pool so repeat askers get varied replies"""
+        reply = self.variants[self.next_variant % len(self.variants)]
+        self.next_variant += 1
+        self.hits += 1
+        return reply
+
+class SemanticResponseCache:
+    """Per-twin cache of replies to near-duplicate generic questions"""
+    
+    _shared: Optional['SemanticResponseCache'] = None
+    
+    def __init__(self, embedder: Optional[Embedder] = None, twin_ids: List[str] = None):
+        self.embedder = embedder or self._create_embedder()
+        self.twin_ids = set(Config.RESPONSE_CACHE_TWINS if twin_ids is None else twin_ids)
+        self.threshold = Config.RESPONSE_CACHE_THRESHOLD
+        self.max_entries = Config.RESPONSE_CACHE_MAX_ENTRIES
+        self.pool_size = Config.RESPONSE_CACHE_VARIANTS
+        self.min_words = Config.RESPONSE_CACHE_MIN_WORDS
+        self.max_words = Config.RESPONSE_CACHE_MAX_WORDS
+        self._entries: Dict[str, 'OrderedDict[str, CachedQuestion]'] = {}
+        self._fingerprints: Dict[str, str] = {}
+        self._pending: Set[Tuple[str, str]] = set()
+        self._fill_tasks: Set[asyncio.Task] = set()
+        self.stats = {
+            'lookups': 0,
+            'hits': 0,
+            'misses': 0,
+            'fills': 0,
+            'evictions': 0,
+            'invalidations': 0
+        }
+    
+    @classmethod
+    def shared(cls) -> 'SemanticResponseCache':
+        """Process-wide cache shared by every conversation manager"""
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
+    
+    @staticmethod
+    def _create_embedder() -> Optional[Embedder]:
+        """Configured embedder; the hashing one keeps stop words since short questions are mostly stop words"""
+        if Config.RESPONSE_CACHE_EMBEDDER == 'hashing':
+            try:
+                return HashingEmbedder(stop_words=None)
+            except Exception as e:
+                logger.error(f"Failed to create hashing embedder, response cache disabled: {e}")
+                return None
+        return create_embedder(Config.RESPONSE_CACHE_EMBEDDER)
+    
+    def enabled_for(self, twin_id: str) -> bool:
+        """Whether this twin opted in to the response cache"""
+        return self.embedder is not None and ('*' in self.twin_ids or twin_id in self.twin_ids)
+    
+    def is_cacheable(self, user_message: str, standalone: bool = True) -> bool:
+        """Only short standalone questions, asked with no conversation or story going, are worth sharing"""
+        if not standalone:
+            return False
+        text = user_message.strip().lower()
+        words = re.findall(r"[a-z']+", text)
+        if not self.min_words <= len(words) <= self.max_words:
+            return False
+        if not (text.endswith('?') or words[0] in QUESTION_WORDS):
+            return False
+        # Follow-ups and replies to something said earlier only make sense in their own conversation
+        if any(re.match(rf"{re.escape(phrase)}\b", text) for phrase in CONTINUATION_PHRASES):
+            return False
+        return not any(word in CONTEXT_WORDS for word in words)
+    
+    @staticmethod
+    def fingerprint(twin: DigitalTwin) -> str:
+        """Hash of the twin fields that shape its replies"""
+        payload = json.dumps(
+            [twin.name, twin.background, twin.personality_traits, twin.conversational_style],
+            sort_keys=True, default=str
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def _twin_entries(self, twin: DigitalTwin) -> 'OrderedDict[str, CachedQuestion]':
+        """Entries for a twin, dropped first if its background or personality changed"""
+        fingerprint = self.fingerprint(twin)
+        if self._fingerprints.get(twin.twin_id) != fingerprint:
+            if twin.twin_id in self._entries:
+                self.invalidate(twin.twin_id)
+            self._fingerprints[twin.twin_id] = fingerprint
+        return self._entries.setdefault(twin.twin_id, OrderedDict())
+    
+    def invalidate(self, twin_id: str):
+        """Forget every cached reply for a twin"""
+        if self._entries.pop(twin_id, None):
+            self.stats['invalidations'] += 1
+            logger.info(f"Response cache invalidated for twin {twin_id}")
+        self._fingerprints.pop(twin_id, None)
+    
+    async def _embed(self, text: str) -> Optional[np.ndarray]:
+        """Unit-length embedding of a message, or None if it has no usable features"""
+        vector = (await self.embedder.embed([text.strip().lower()]))[0]
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else None
+    
+    def _best_match(
+        self,
+        entries: 'OrderedDict[str, CachedQuestion]',
+        vector: np.ndarray
+    ) -> Tuple[Optional[CachedQuestion], float]:
+        """Most similar cached question and its cosine similarity"""
+        best, best_similarity = None, 0.0
+        for entry in entries.values():
+            similarity = float(entry.vector @ vector)
+            if similarity > best_similarity:
+                best, best_similarity = entry, similarity
+        return best, best_similarity
+    
+    async def lookup(self, twin: DigitalTwin, user_message: str) -> Optional[str]:
+        """Serve a stored variant when the message is a near-duplicate of a cached question"""
+        self.stats['lookups'] += 1
+        try:
+            entries = self._twin_entries(twin)
+            vector = await self._embed(user_message) if entries else None
+            if vector is not None:
+                entry, similarity = self._best_match(entries, vector)
+                if entry and similarity >= self.threshold:
+                    entries.move_to_end(entry.question)
+                    self.stats['hits'] += 1
+                    logger.debug(f"Response cache hit for twin {twin.twin_id} ({similarity:.2f}): {entry.question}")
+                    return entry.next_reply()
+        except Exception as e:
+            logger.error(f"Error looking up response cache: {e}")
+        
+        self.stats['misses'] += 1
+        return None
+    
+    def schedule_fill(
+        self,
+        twin: DigitalTwin,
+        user_message: str,
+        generate: Callable[[], Awaitable[List[str]]]
+    ):
+        """Generate a variant pool for this question in the background"""
+        pending_key = (twin.twin_id, user_message.strip().lower())
+        if pending_key in self._pending:
+            return
+        self._pending.add(pending_key)
+        task = asyncio.create_task(self._fill(twin, user_message, generate, pending_key))
+        self._fill_tasks.add(task)
+        task.add_done_callback(self._fill_tasks.discard)
+    
+    async def _fill(
+        self,
+        twin: DigitalTwin,
+        user_message: str,
+        generate: Callable[[], Awaitable[List[str]]],
+        pending_key: Tuple[str, str]
+    ):
+        """Store generated variants, evicting the least recently hit question past the size limit"""
+        try:
+            vector = await self._embed(user_message)
+            if vector is None:
+                return
+            
+            variants = [variant.strip() for variant in await generate() if variant and variant.strip()]
+            if not variants:
+                return
+            
+            entries = self._twin_entries(twin)
+            entry, similarity = self._best_match(entries, vector)
+            if entry and similarity >= self.threshold:
+                return
+            
+            question = pending_key[1]
+            entries[question] = CachedQuestion(question, vector, variants[:self.pool_size])
+            self.stats['fills'] += 1
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+                self.stats['evictions'] += 1
+        except Exception as e:
+            logger.error(f"Error filling response cache for twin {twin.twin_id}: {e}")
+        finally:
+            self._pending.discard(pending_key)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit rate and cache size"""
+        stats = dict(self.stats)
+        stats['hit_rate'] = stats['hits'] / stats['lookups'] if stats['lookups'] else 0.0
+        stats['entries'] = {twin_id: len(entries) for twin_id, entries in self._entries.items()}
+        return stats
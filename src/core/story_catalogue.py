@@ -0,0 +1,267 @@
+import asyncio
+import json
+import time
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Any, Set, Tuple
+from ..database.postgres_client import PostgreSQLClient
+from ..database.repositories import StoryRepository
+from ..models import Story, StorySegment
+from .story_index import StoryEmbeddingIndex
+from ..utils.config import Config
+from ..utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+STORY_CHANGES_CHANNEL = 'stories_changed'
+
+@dataclass(frozen=True)
+class TwinCatalogue:
+    """Immutable snapshot of one twin's stories and their ordered segments"""
+    twin_id: str
+    version: int
+    stories: Tuple[Story, ...]
+    segments: Mapping[str, Tuple[StorySegment, ...]]
+    story_positions: Mapping[str, int]
+    
+    @classmethod
+    def build(
+        cls,
+        twin_id: str,
+        version: int,
+        entries: List[Tuple[Story, List[StorySegment]]]
+    ) -> 'TwinCatalogue':
+        """Freeze stories and segments (sorted by segment_order) into a new snapshot"""
+        return cls(
+            twin_id=twin_id,
+            version=version,
+            stories=tuple(story for story, _ in entries),
+            segments=MappingProxyType({
+                story.story_id: tuple(sorted(segments, key=lambda seg: seg.segment_order))
+                for story, segments in entries
+            }),
+            story_positions=MappingProxyType({story.story_id: i for i, (story, _) in enumerate(entries)})
+        )
+    
+    def entries(self) -> List[Tuple[Story, List[StorySegment]]]:
+        """Stories paired with their segments, in catalogue order"""
+        return [(story, list(self.segments[story.story_id])) for story in self.stories]
+    
+    def get_story(self, story_id: str) -> Optional[Story]:
+        """Get a story by id"""
+        position = self.story_positions.get(story_id)
+        return self.stories[position] if position is not None else None
+    
+    def get_segment(self, story_id: str, segment_order: int) -> Optional[StorySegment]:
+        """Get a segment by its 1-based order - an array index for contiguous segments"""
+        segments = self.segments.get(story_id, ())
+        index = segment_order - 1
+        if 0 <= index < len(segments) and segments[index].segment_order == segment_order:
+            return segments[index]
+        # Gaps in segment_order - fall back to a scan
+        return next((seg for seg in segments if seg.segment_order == segment_order), None)
+
+class StoryCatalogue:
+    """Per-twin story catalogues built in one bulk query and refreshed incrementally via LISTEN/NOTIFY"""
+    
+    _shared: Optional['StoryCatalogue'] = None
+    
+    def __init__(self, ttl_seconds: float = None, debounce_seconds: float = None):
+        self.repository = StoryRepository()
+        self.db = PostgreSQLClient()
+        self.ttl_seconds = Config.STORY_CATALOGUE_TTL if ttl_seconds is None else ttl_seconds
+        self._catalogues: Dict[str, TwinCatalogue] = {}
+        self._story_twins: Dict[str, str] = {}
+        self._loaded_at: Dict[str, float] = {}
+        self._listener = None
+        self._tasks: Set[asyncio.Task] = set()
+        self.debounce_seconds = Config.STORY_REFRESH_DEBOUNCE if debounce_seconds is None else debounce_seconds
+        self._pending: Set[str] = set()
+        self._flush_task: Optional[asyncio.Task] = None
+        self.stats = {
+            'bulk_loads': 0,
+            'story_refreshes': 0,
+            'notifications': 0,
+            'segment_lookups': 0,
+            'repository_fallbacks': 0
+        }
+    
+    @classmethod
+    def shared(cls) -> 'StoryCatalogue':
+        """Process-wide catalogue"""
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
+    
+    async def start(self, twin_ids: Optional[List[str]] = None):
+        """Bulk-load catalogues and subscribe to story changes (call at startup)"""
+        await self.load(twin_ids)
+        try:
+            self._listener = await self.db.listen(STORY_CHANGES_CHANNEL, self._on_notify)
+            self._listener.add_termination_listener(self._on_listener_lost)
+            logger.info(f"Story catalogue loaded {len(self._story_twins)} stories, listening for changes")
+        except Exception as e:
+            logger.warning(f"Story catalogue falling back to {self.ttl_seconds}s TTL refresh: {e}")
+    
+    async def stop(self):
+        """Stop listening for changes"""
+        if self._listener is not None:
+            listener, self._listener = self._listener, None
+            await self.db.unlisten(listener, STORY_CHANGES_CHANNEL, self._on_notify)
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+            self._pending.clear()
+    
+    async def load(self, twin_ids: Optional[List[str]] = None):
+        """Rebuild catalogues for these twins (all twins when None) with one query"""
+        rows = await self.repository.get_story_catalogue(twin_ids=twin_ids)
+        if rows is None:
+            return
+        self.stats['bulk_loads'] += 1
+        
+        grouped: Dict[str, List[Tuple[Story, List[StorySegment]]]] = {twin_id: [] for twin_id in twin_ids or []}
+        for story, segments in rows:
+            grouped.setdefault(story.twin_id, []).append((story, segments))
+        
+        now = time.monotonic()
+        for twin_id, entries in grouped.items():
+            self._install(twin_id, entries)
+            self._loaded_at[twin_id] = now
+    
+    def _install(self, twin_id: str, entries: List[Tuple[Story, List[StorySegment]]]):
+        """Swap in a new immutable snapshot for a twin"""
+        previous = self._catalogues.get(twin_id)
+        if previous:
+            for story in previous.stories:
+                self._story_twins.pop(story.story_id, None)
+        catalogue = TwinCatalogue.build(twin_id, previous.version + 1 if previous else 1, entries)
+        self._catalogues[twin_id] = catalogue
+        for story in catalogue.stories:
+            self._story_twins[story.story_id] = twin_id
+    
+    async def get_catalogue(self, twin_id: str) -> TwinCatalogue:
+        """Current snapshot for a twin, loading it on first use or when the TTL fallback is due"""
+        loaded_at = self._loaded_at.get(twin_id)
+        if loaded_at is None or time.monotonic() - loaded_at >= self.ttl_seconds:
+            await self.load([twin_id])
+        return self._catalogues.get(twin_id) or TwinCatalogue.build(twin_id, 0, [])
+    
+    async def get_stories(self, twin_id: str) -> List[Story]:
+        """All stories for a twin"""
+        return list((await self.get_catalogue(twin_id)).stories)
+    
+    async def get_segments(self, story_id: str, twin_id: Optional[str] = None) -> List[StorySegment]:
+        """Ordered segments for a story"""
+        twin_id = twin_id or self._story_twins.get(story_id)
+        if twin_id:
+            catalogue = await self.get_catalogue(twin_id)
+            if story_id in catalogue.segments:
+                return list(catalogue.segments[story_id])
+        self.stats['repository_fallbacks'] += 1
+        return await self.repository.get_story_segments(story_id)
+    
+    async def get_segment(
+        self,
+        story_id: str,
+        segment_order: int,
+        twin_id: Optional[str] = None
+    ) -> Optional[StorySegment]:
+        """One segment by order, served from memory"""
+        self.stats['segment_lookups'] += 1
+        twin_id = twin_id or self._story_twins.get(story_id)
+        if twin_id:
+            catalogue = await self.get_catalogue(twin_id)
+            if story_id in catalogue.segments:
+                return catalogue.get_segment(story_id, segment_order)
+        self.stats['repository_fallbacks'] += 1
+        return await self.repository.get_story_segment(story_id, segment_order)
+    
+    async def refresh_stories(self, story_ids: List[str]):
+        """Reload just these stories and publish new snapshots for the twins they belong to"""
+        rows = await self.repository.get_story_catalogue(story_ids=story_ids)
+        if rows is None:
+            return
+        self.stats['story_refreshes'] += 1
+        
+        # Edited stories need re-embedding; the lexical index notices changes by itself on next sync
+        embedding_index = StoryEmbeddingIndex.shared()
+        if embedding_index is not None:
+            for story_id in story_ids:
+                embedding_index.invalidate_story(story_id)
+        
+        fresh = {story.story_id: (story, segments) for story, segments in rows}
+        affected = {self._story_twins[sid] for sid in story_ids if sid in self._story_twins}
+        affected.update(story.twin_id for story, _ in rows)
+        
+        for twin_id in affected:
+            if twin_id not in self._catalogues:
+                continue
+            # Keep catalogue order: replace changed stories in place, drop deleted ones, append new ones
+            current = self._catalogues[twin_id]
+            entries = []
+            for story, segments in current.entries():
+                if story.story_id in fresh:
+                    if fresh[story.story_id][0].twin_id == twin_id:
+                        entries.append(fresh[story.story_id])
+                elif story.story_id not in story_ids:
+                    entries.append((story, segments))
+            entries.extend(
+                entry for story_id, entry in fresh.items() 
+                if entry[0].twin_id == twin_id and story_id not in current.story_positions
+            )
+            self._install(twin_id, entries)
+            logger.info(f"Story catalogue for twin {twin_id} refreshed to v{self._catalogues[twin_id].version}")
+    
+    def _on_notify(self, connection, pid: int, channel: str, payload: str):
+        """asyncpg notification callback - collect the changed story and schedule one debounced refresh"""
+        self.stats['notifications'] += 1
+        try:
+            self._pending.add(json.loads(payload)['story_id'])
+        except Exception as e:
+            logger.error(f"Bad story change payload '{payload}', forcing reload: {e}")
+            self._loaded_at.clear()
+            return
+        
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._apply_changes())
+            self._tasks.add(self._flush_task)
+            self._flush_task.add_done_callback(self._tasks.discard)
+    
+    async def _apply_changes(self):
+        """Wait out a burst of notifications, then refresh every changed story in one query"""
+        await asyncio.sleep(self.debounce_seconds)
+        story_ids, self._pending = list(self._pending), set()
+        # Notifications arriving during the refresh start the next batch
+        self._flush_task = None
+        try:
+            await self.refresh_stories(story_ids)
+        except Exception as e:
+            logger.error(f"Error applying changes to {len(story_ids)} stories, forcing reload: {e}")
+            self._loaded_at.clear()
+    
+    def _on_listener_lost(self, connection):
+        """The listening connection dropped - force TTL reloads and try to resubscribe"""
+        if self._listener is None:
+            return
+        listener, self._listener = self._listener, None
+        self._loaded_at.clear()
+        logger.warning("Story catalogue lost its LISTEN connection, resubscribing")
+        task = asyncio.create_task(self._resubscribe(listener))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def _resubscribe(self, listener):
+        """Return the dead connection to the pool and listen on a fresh one"""
+        await self.db.unlisten(listener, STORY_CHANGES_CHANNEL, self._on_notify)
+        await self.start(list(self._catalogues.keys()))
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get catalogue sizes, versions and lookup counters"""
+        stats = dict(self.stats)
+        stats['twins'] = {
+            twin_id: {'version': catalogue.version, 'stories': len(catalogue.stories)}
+            for twin_id, catalogue in self._catalogues.items()
+        }
+        stats['listening'] = self._listener is not None
+        return stats
@@ -0,0 +1,151 @@
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from ..models import Story
+from ..utils.config import Config
+from ..utils.llm_client import LLMClient
+from ..utils.llm_scheduler import Priority
+from ..utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+class Embedder(ABC):
+    """Base class for text embedding backends"""
+    
+    name = "base"
+    
+    @abstractmethod
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        """Embed texts into a (len(texts), dim) float32 matrix"""
+
+class HashingEmbedder(Embedder):
+    """Offline embedder using scikit-learn's stateless HashingVectorizer"""
+    
+    name = "hashing"
+    
+    def __init__(self, n_features: int = 2 ** 14, stop_words: Optional[str] = 'english'):
+        from sklearn.feature_extraction.text import HashingVectorizer
+        
+        # Word unigrams + bigrams, L2-normalised so a dot product is cosine similarity
+        self.vectorizer = HashingVectorizer(
+            n_features=n_features,
+            ngram_range=(1, 2),
+            stop_words=stop_words,
+            alternate_sign=False,
+            norm='l2'
+        )
+    
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        """Embed texts locally without any network call"""
+        return self.vectorizer.transform(texts).toarray().astype(np.float32)
+
+class OpenAIEmbedder(Embedder):
+    """Embedder backed by the OpenAI embeddings API"""
+    
+    name = "openai"
+    
+    def __init__(self, model: Optional[str] = None):
+        self.llm_client = LLMClient(priority=Priority.SCORING)
+        self.model = model or Config.OPENAI_EMBEDDING_MODEL
+    
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        """Embed texts with one embeddings API request"""
+        vectors = await self.llm_client.embed_texts(texts, model=self.model)
+        return np.asarray(vectors, dtype=np.float32)
+
+def create_embedder(backend: Optional[str] = None) -> Optional[Embedder]:
+    """Create the configured embedder, or None when retrieval is disabled"""
+    backend = (backend or Config.STORY_EMBEDDER).lower()
+    try:
+        if backend == 'hashing':
+            return HashingEmbedder()
+        if backend == 'openai':
+            return OpenAIEmbedder()
+    except Exception as e:
+        logger.error(f"Failed to create {backend} embedder, story retrieval disabled: {e}")
+        return None
+    if backend not in ('', 'none'):
+        logger.warning(f"Unknown story embedder '{backend}', story retrieval disabled")
+    return None
+
+class StoryEmbeddingIndex:
+    """Per-twin matrix of story embeddings ranked by cosine similarity"""
+    
+    _shared: Optional['StoryEmbeddingIndex'] = None
+    _shared_created = False
+    
+    def __init__(self, embedder: Embedder):
+        self.embedder = embedder
+        self._vectors: Dict[str, np.ndarray] = {}
+        self._twin_ids: Dict[str, List[str]] = {}
+        self._twin_matrices: Dict[str, np.ndarray] = {}
+    
+    @classmethod
+    def shared(cls) -> Optional['StoryEmbeddingIndex']:
+        """Process-wide index shared by every StoryMatcher, None when story retrieval is disabled"""
+        if not cls._shared_created:
+            embedder = create_embedder()
+            cls._shared = cls(embedder) if embedder else None
+            cls._shared_created = True
+        return cls._shared
+    
+    @staticmethod
+    def story_text(story: Story) -> str:
+        """Text used to embed a story"""
+        return "\n".join([
+            story.title or "",
+            " ".join(story.themes or []),
+            " ".join(story.conversation_triggers or []),
+            story.full_content or ""
+        ])
+    
+    async def ensure_stories(self, twin_id: str, stories: List[Story]):
+        """Embed any unseen stories and rebuild the twin matrix if its story set changed"""
+        missing = [story for story in stories if story.story_id not in self._vectors]
+        if missing:
+            vectors = await self.embedder.embed([self.story_text(story) for story in missing])
+            for story, vector in zip(missing, vectors):
+                self._vectors[story.story_id] = self._normalize(vector)
+            logger.info(f"Embedded {len(missing)} stories for twin {twin_id} with {self.embedder.name} embedder")
+        
+        story_ids = sorted(story.story_id for story in stories)
+        if missing or self._twin_ids.get(twin_id) != story_ids:
+            self._twin_ids[twin_id] = story_ids
+            self._twin_matrices[twin_id] = np.vstack([self._vectors[sid] for sid in story_ids])
+    
+    def invalidate_story(self, story_id: str):
+        """Drop a story's embedding so it is re-embedded on next use"""
+        self._vectors.pop(story_id, None)
+        for twin_id, story_ids in list(self._twin_ids.items()):
+            if story_id in story_ids:
+                self._twin_ids.pop(twin_id, None)
+                self._twin_matrices.pop(twin_id, None)
+    
+    async def rank(
+        self,
+        twin_id: str,
+        stories: List[Story],
+        query_text: str
+    ) -> List[Tuple[Story, float]]:
+        """Rank candidate stories by cosine similarity to the query, best first"""
+        if not stories:
+            return []
+        
+        known = set(self._twin_ids.get(twin_id, []))
+        if any(story.story_id not in known for story in stories):
+            await self.ensure_stories(twin_id, stories)
+        query = self._normalize((await self.embedder.embed([query_text]))[0])
+        
+        # One matrix-vector product scores every story for the twin
+        similarities = self._twin_matrices[twin_id] @ query
+        position = {sid: i for i, sid in enumerate(self._twin_ids[twin_id])}
+        
+        ranked = [(story, float(similarities[position[story.story_id]])) for story in stories]
+        ranked.sort(key=lambda x: x[1], reverse=True)
+        return ranked
+    
+    @staticmethod
+    def _normalize(vector: np.ndarray) -> np.ndarray:
+        """L2-normalise a vector so dot products are cosine similarities"""
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
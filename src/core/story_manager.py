@@ -1,7 +1,8 @@
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Awaitable, Callable
 from ..database.repositories import StoryRepository, ConversationRepository
 from ..models import Story, StorySegment
 from ..utils.llm_client import LLMClient
+from .story_catalogue import StoryCatalogue
 from ..utils.logger import setup_logger
 
 logger = setup_logger(__name__)
@@ -12,6 +13,7 @@ class StoryManager:
     def __init__(self):
         self.story_repo = StoryRepository()
         self.conversation_repo = ConversationRepository()
+        self.catalogue = StoryCatalogue.shared()
         self.llm_client = LLMClient()
     
     async def start_story_naturally(
@@ -22,12 +24,14 @@ class StoryManager:
         twin_personality: Dict[str, Any],
         user_context: str,
         transition: str = "",
-        twin_id: str = None
+        twin_id: str = None,
+        on_text: Optional[Callable[[str], Awaitable[None]]] = None,
+        on_commit: Optional[Callable[[], None]] = None
     ) -> str:
-        """Start sharing a story naturally in conversation"""
+        """Start sharing a story naturally in conversation; on_commit runs before progress is written"""
         try:
             # Get first segment or use full story
-            segments = await self.story_repo.get_story_segments(story.story_id)
+            segments = await self.catalogue.get_segments(story.story_id, twin_id or story.twin_id)
             
             if segments:
                 first_segment = segments[0]
@@ -55,11 +59,22 @@ class StoryManager:
             Keep it conversational and personal, as if talking to a friend.
             """
             
-            response = await self.llm_client.simple_prompt(intro_prompt, temperature=0.7)
+            # Provider degraded - tell the segment as written
+            response = " ".join(part for part in [transition, story_content, story_hook] if part)
+            if LLMClient.is_available():
+                try:
+                    if on_text:
+                        response = await self.llm_client.stream_simple_prompt(intro_prompt, on_text, temperature=0.7)
+                    else:
+                        response = await self.llm_client.simple_prompt(intro_prompt, temperature=0.7)
+                except Exception as e:
+                    logger.warning(f"Story introduction failed, telling the segment as written: {e}")
             
-            # Track story start for this specific twin
-            await self.story_repo.create_story_progress(chat_id, story.story_id, twin_id)
-            await self.conversation_repo.update_session_story(chat_id, story.story_id, twin_id)
+            # Track story start for this specific twin - progress and session in one transaction
+            if on_commit:
+                on_commit()
+            async with self.story_repo.unit_of_work(chat_id, twin_id) as uow:
+                await uow.start_story(story.story_id)
             
             return response
             
@@ -110,32 +125,24 @@ class StoryManager:
     async def _get_next_story_segment(self, chat_id: int, story_id: str, twin_id: str) -> str:
         """Get next story segment for this twin"""
         try:
-            # Get current progress for this twin
-            progress = await self.story_repo.get_story_progress(chat_id, story_id, twin_id)
-            if not progress:
-                return "I think we lost track of that story!"
+            # Advance progress and fetch the segment (or complete the story) in one statement
+            status, next_segment = await self.story_repo.advance_story(chat_id, story_id, twin_id)
             
-            current_segment = progress.get('current_segment', 1)
-            next_segment_order = current_segment + 1
+            if status == 'completed':
+                return "And that's how it all ended! What a journey that was."
+            if status == 'error':
+                return "Sorry, I'm having trouble remembering what happened next!"
+            if status == 'conflict':
+                # Another turn advanced the story first and already told that segment
+                return "Ha, I'm getting to it - give me a second!"
+            if not next_segment:
+                return "I think we lost track of that story!"
             
-            # Get next segment
-            next_segment = await self.story_repo.get_story_segment(story_id, next_segment_order)
+            response = next_segment.content
+            if next_segment.transition_hook:
+                response += f" {next_segment.transition_hook}"
             
-            if next_segment:
-                # Update progress for this twin
-                await self.story_repo.update_story_progress(chat_id, story_id, next_segment_order, twin_id)
-                
-                response = next_segment.content
-                if next_segment.transition_hook:
-                    response += f" {next_segment.transition_hook}"
-                
-                return response
-            else:
-                # Story complete
-                await self.story_repo.complete_story(chat_id, story_id, twin_id)
-                await self.conversation_repo.clear_session_story(chat_id, twin_id)
-                return "And that's how it all ended! What a journey that was."
-                
+            return response
         except Exception as e:
             logger.error(f"Error getting next story segment: {e}")
             return "Sorry, I'm having trouble remembering what happened next!"
\ No newline at end of file
@@ -1,7 +1,13 @@
-from typing import List, Optional, Dict, Any
+import time
+from typing import List, Optional, Dict, Any, Tuple
 from ..database.repositories import StoryRepository
 from ..models import Story
+from ..utils.config import Config
+from .story_catalogue import StoryCatalogue
+from .story_index import StoryEmbeddingIndex
+from .story_search import StoryLexicalIndex, LexicalMatch
 from ..utils.llm_client import LLMClient
+from ..utils.llm_scheduler import Priority
 from ..utils.logger import setup_logger
 
 logger = setup_logger(__name__)
@@ -11,7 +17,22 @@ class StoryMatcher:
     
     def __init__(self):
         self.repository = StoryRepository()
-        self.llm_client = LLMClient()
+        self.catalogue = StoryCatalogue.shared()
+        self.llm_client = LLMClient(priority=Priority.SCORING)
+        self.embedding_index = StoryEmbeddingIndex.shared()
+        self.lexical_index = StoryLexicalIndex.shared()
+        self.stats = {
+            'single_calls': 0,
+            'single_latency_total': 0.0,
+            'batch_calls': 0,
+            'stories_scored': 0,
+            'stories_skipped': 0,
+            'llm_calls_saved': 0,
+            'latency_saved_seconds': 0.0,
+            'retrieval_shortlists': 0,
+            'retrieval_clear_wins': 0,
+            'lexical_selections': 0
+        }
     
     async def select_best_story(
         self, 
@@ -22,26 +43,45 @@ class StoryMatcher:
     ) -> Optional[Story]:
         """Select most relevant story for current context"""
         try:
-            # Get available stories for twin
-            stories = await self.repository.get_stories_by_twin(twin_id)
+            # Get available stories for twin from the in-memory catalogue
+            stories = await self.catalogue.get_stories(twin_id)
             if not stories:
                 return None
             
-            # Get user's story history to avoid repetition
-            story_history = await self.repository.get_user_story_history(chat_id)
-            
-            # Filter out recently told stories
-            available_stories = [s for s in stories if s.story_id not in story_history]
+            # Only stories not told recently - an anti-join in the database, story ids only
+            untold_ids = await self.repository.get_untold_story_ids(chat_id, twin_id)
+            if untold_ids is None:
+                # History unavailable - don't hold back every story because of it
+                available_stories = stories
+            else:
+                # Keep the catalogue's full story objects (and order) for the eligible ids
+                untold_ids = set(untold_ids)
+                available_stories = [s for s in stories if s.story_id in untold_ids]
             if not available_stories:
                 return None
             
-            # Score each story
-            story_scores = []
-            for story in available_stories:
-                score = await self.calculate_story_relevance(
-                    story, user_context, conversation_context
+            # Zero-LLM selection for degraded operation or while the LLM circuit is open
+            if Config.STORY_SELECTION_MODE == 'lexical' or not LLMClient.is_available():
+                return self.select_story_lexically(
+                    twin_id, stories, available_stories, user_context, conversation_context
                 )
-                story_scores.append((story, score))
+            
+            # BM25 shortlist over themes, triggers, key facts and content
+            candidates = self.lexical_shortlist(
+                twin_id, stories, available_stories, user_context, conversation_context
+            )
+            
+            # Narrow to an embedding shortlist, or pick outright on a clear margin
+            candidates = await self.retrieve_candidates(
+                twin_id, stories, candidates, user_context, conversation_context
+            )
+            if len(candidates) == 1:
+                return candidates[0]
+            
+            # Score each story
+            story_scores = await self.score_stories(
+                candidates, user_context, conversation_context
+            )
             
             # Return highest scoring story
             if story_scores:
@@ -53,6 +93,235 @@ class StoryMatcher:
             logger.error(f"Error selecting story: {e}")
             return None
     
+    async def build_indexes(self, twin_ids: List[str]):
+        """Build story search indexes for these twins (call at startup)"""
+        for twin_id in twin_ids:
+            stories = await self.catalogue.get_stories(twin_id)
+            self.lexical_index.build(twin_id, stories)
+            if self.embedding_index and stories:
+                try:
+                    await self.embedding_index.ensure_stories(twin_id, stories)
+                except Exception as e:
+                    logger.error(f"Error embedding stories for twin {twin_id}: {e}")
+    
+    def lexical_search(
+        self, 
+        twin_id: str, 
+        stories: List[Story], 
+        available_stories: List[Story], 
+        user_context: str, 
+        conversation_context: str,
+        top_k: Optional[int] = None
+    ) -> List[LexicalMatch]:
+        """BM25-rank available stories against the current context"""
+        self.lexical_index.sync(twin_id, stories)
+        matches = self.lexical_index.search(
+            twin_id, 
+            f"{user_context}\n{conversation_context}", 
+            candidate_ids=[story.story_id for story in available_stories], 
+            top_k=top_k
+        )
+        for match in matches:
+            logger.debug(f"Lexical match {match.explain()}")
+        return matches
+    
+    def lexical_shortlist(
+        self, 
+        twin_id: str, 
+        stories: List[Story], 
+        available_stories: List[Story], 
+        user_context: str, 
+        conversation_context: str
+    ) -> List[Story]:
+        """First-stage BM25 shortlist; keeps every story when nothing matches"""
+        if len(available_stories) <= Config.STORY_LEXICAL_TOP_K:
+            return available_stories
+        
+        matches = self.lexical_search(
+            twin_id, stories, available_stories, user_context, conversation_context, 
+            top_k=Config.STORY_LEXICAL_TOP_K
+        )
+        if not matches:
+            return available_stories
+        return [match.story for match in matches]
+    
+    def select_story_lexically(
+        self, 
+        twin_id: str, 
+        stories: List[Story], 
+        available_stories: List[Story], 
+        user_context: str, 
+        conversation_context: str
+    ) -> Optional[Story]:
+        """Pick the best BM25 match without any LLM call"""
+        matches = self.lexical_search(
+            twin_id, stories, available_stories, user_context, conversation_context, top_k=1
+        )
+        if not matches:
+            return None
+        
+        self.stats['lexical_selections'] += 1
+        logger.info(f"Story selected lexically: {matches[0].explain()}")
+        return matches[0].story
+    
+    async def retrieve_candidates(
+        self, 
+        twin_id: str, 
+        stories: List[Story], 
+        available_stories: List[Story], 
+        user_context: str, 
+        conversation_context: str
+    ) -> List[Story]:
+        """Shortlist stories by embedding similarity before LLM scoring"""
+        if not self.embedding_index or len(available_stories) <= 1:
+            return available_stories
+        
+        try:
+            await self.embedding_index.ensure_stories(twin_id, stories)
+            ranked = await self.embedding_index.rank(
+                twin_id, available_stories, f"{user_context}\n{conversation_context}"
+            )
+        except Exception as e:
+            logger.error(f"Error ranking stories by embedding for twin {twin_id}: {e}")
+            return available_stories
+        
+        best_story, best_score = ranked[0]
+        runner_up_score = ranked[1][1]
+        if (best_score >= Config.STORY_RETRIEVAL_MIN_SIMILARITY 
+                and best_score - runner_up_score >= Config.STORY_RETRIEVAL_MARGIN):
+            self.stats['retrieval_clear_wins'] += 1
+            self.stats['llm_calls_saved'] += 1 if Config.STORY_SCORING_MODE == 'batch' else len(available_stories)
+            logger.info(
+                f"Story '{best_story.story_id}' picked by embedding margin "
+                f"({best_score:.2f} vs {runner_up_score:.2f}), skipping LLM scoring"
+            )
+            return [best_story]
+        
+        shortlist = [story for story, _ in ranked[:Config.STORY_RETRIEVAL_TOP_K]]
+        self.stats['retrieval_shortlists'] += 1
+        return shortlist
+    
+    async def score_stories(
+        self, 
+        stories: List[Story], 
+        user_context: str, 
+        conversation_context: str
+    ) -> List[Tuple[Story, float]]:
+        """Score candidate stories using the configured scoring mode"""
+        if Config.STORY_SCORING_MODE == 'batch' and len(stories) > 1:
+            scores = await self.calculate_batch_relevance(stories, user_context, conversation_context)
+            return [(story, scores[story.story_id]) for story in stories]
+        
+        story_scores = []
+        for story in stories:
+            started = time.perf_counter()
+            score = await self.calculate_story_relevance(
+                story, user_context, conversation_context
+            )
+            self._record_single_call(time.perf_counter() - started)
+            story_scores.append((story, score))
+        return story_scores
+    
+    async def calculate_batch_relevance(
+        self, 
+        stories: List[Story], 
+        user_context: str, 
+        conversation_context: str
+    ) -> Dict[str, float]:
+        """Score all candidate stories in a single LLM call"""
+        candidates = "\n".join(
+            f"""
+            - story_id: {story.story_id}
+              title: {story.title}
+              themes: {story.themes}
+              triggers: {story.conversation_triggers}
+              summary: {story.full_content[:200]}..."""
+            for story in stories
+        )
+        
+        scoring_prompt = f"""
+            Rate how relevant each of these stories is to the current conversation context (0.0 to 1.0).
+            
+            Stories:
+            {candidates}
+            
+            User context: {user_context}
+            Recent conversation: {conversation_context}
+            
+            Consider:
+            1. Semantic relevance to conversation topics (0.4 weight)
+            2. Relevance to user's interests and background (0.3 weight)
+            3. Emotional appropriateness for conversation tone (0.2 weight)
+            4. Natural storytelling opportunity (0.1 weight)
+            
+            Respond with JSON mapping every story_id to a decimal score, where:
+            - 0.0 = completely irrelevant
+            - 0.5 = somewhat relevant
+            - 1.0 = highly relevant and perfect timing
+            {{
+                "scores": {{"story_id": 0.0}}
+            }}
+            """
+        
+        started = time.perf_counter()
+        result = await self.llm_client.simple_prompt(
+            scoring_prompt, 
+            temperature=0.1, 
+            max_tokens=20 * len(stories) + 20, 
+            json_response=True,
+            cache_as='story_scoring'
+        )
+        elapsed = time.perf_counter() - started
+        
+        raw_scores = result.get('scores', {}) if isinstance(result, dict) else {}
+        if not isinstance(raw_scores, dict):
+            raw_scores = {}
+        
+        scores = {}
+        skipped = 0
+        for story in stories:
+            try:
+                scores[story.story_id] = max(0.0, min(1.0, float(raw_scores[story.story_id])))
+            except (KeyError, TypeError, ValueError):
+                # Model skipped or garbled this story - fall back to keyword matching
+                skipped += 1
+                scores[story.story_id] = self._simple_keyword_relevance(
+                    story, user_context, conversation_context
+                )
+        
+        self._record_batch_call(len(stories), skipped, elapsed)
+        return scores
+    
+    def _record_single_call(self, elapsed: float):
+        """Track latency of per-story scoring calls"""
+        self.stats['single_calls'] += 1
+        self.stats['single_latency_total'] += elapsed
+    
+    def _record_batch_call(self, story_count: int, skipped: int, elapsed: float):
+        """Track calls and latency saved by batch scoring"""
+        # Per-story calls cost about one round trip each; use the measured
+        # average when we have one, otherwise the batch call itself
+        if self.stats['single_calls']:
+            per_call = self.stats['single_latency_total'] / self.stats['single_calls']
+        else:
+            per_call = elapsed
+        saved_latency = max(0.0, per_call * story_count - elapsed)
+        
+        self.stats['batch_calls'] += 1
+        self.stats['stories_scored'] += story_count
+        self.stats['stories_skipped'] += skipped
+        self.stats['llm_calls_saved'] += story_count - 1
+        self.stats['latency_saved_seconds'] += saved_latency
+        
+        logger.info(
+            f"Batch scored {story_count} stories in {elapsed:.2f}s "
+            f"({skipped} fell back to keywords, saved {story_count - 1} LLM calls, ~{saved_latency:.2f}s)"
+        )
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get story scoring statistics"""
+        return dict(self.stats)
+    
     async def calculate_story_relevance(
         self, 
         story: Story, 
@@ -84,7 +353,9 @@ class StoryMatcher:
             - 1.0 = highly relevant and perfect timing
             """
             
-            score_str = await self.llm_client.simple_prompt(scoring_prompt, temperature=0.1, max_tokens=10)
+            score_str = await self.llm_client.simple_prompt(
+                scoring_prompt, temperature=0.1, max_tokens=10, cache_as='story_relevance'
+            )
             
             try:
                 score = float(score_str.strip())
@@ -0,0 +1,226 @@
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Iterable, Tuple
+from ..models import Story
+from ..utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9']+")
+
+STOP_WORDS = frozenset({
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'but', 'by', 'for', 'from', 'had', 'has',
+    'have', 'he', 'her', 'his', 'i', 'if', 'in', 'into', 'is', 'it', 'its', 'me', 'my',
+    'no', 'not', 'of', 'on', 'or', 'our', 'she', 'so', 'that', 'the', 'their', 'them',
+    'then', 'there', 'they', 'this', 'to', 'was', 'we', 'were', 'what', 'when', 'with',
+    'you', 'your', 'user', 'said', 'twin'
+})
+
+# How many times each field's tokens count towards term frequency
+FIELD_WEIGHTS = {
+    'title': 2,
+    'themes': 3,
+    'conversation_triggers': 3,
+    'key_facts': 1,
+    'full_content': 1
+}
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens without stop words"""
+    return [
+        token for token in TOKEN_PATTERN.findall(text.lower())
+        if token not in STOP_WORDS and len(token) > 1
+    ]
+
+@dataclass
+class LexicalMatch:
+    """A BM25 hit with the per-term contributions that produced its score"""
+    story: Story
+    score: float
+    term_scores: Dict[str, float] = field(default_factory=dict)
+    
+    def explain(self) -> str:
+        """Human-readable score breakdown for logs"""
+        terms = ", ".join(
+            f"{term}={score:.2f}"
+            for term, score in sorted(self.term_scores.items(), key=lambda x: x[1], reverse=True)
+        )
+        return f"{self.story.story_id} ({self.score:.2f}): {terms}"
+
+class BM25Index:
+    """Incrementally updatable BM25 inverted index over one twin's stories"""
+    
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.stories: Dict[str, Story] = {}
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.doc_terms: Dict[str, Counter] = {}
+        self.doc_lengths: Dict[str, int] = {}
+        self.signatures: Dict[str, Tuple] = {}
+        self.total_length = 0
+    
+    @staticmethod
+    def signature(story: Story) -> Tuple:
+        """Fields that affect indexing, used to detect changed stories"""
+        return (
+            story.title,
+            tuple(story.themes or []),
+            tuple(story.conversation_triggers or []),
+            tuple(str(fact) for fact in story.key_facts or []),
+            story.full_content
+        )
+    
+    @staticmethod
+    def story_terms(story: Story) -> Counter:
+        """Weighted term frequencies across a story's indexed fields"""
+        fields = {
+            'title': story.title or "",
+            'themes': " ".join(story.themes or []),
+            'conversation_triggers': " ".join(story.conversation_triggers or []),
+            'key_facts': " ".join(str(fact) for fact in story.key_facts or []),
+            'full_content': story.full_content or ""
+        }
+        terms = Counter()
+        for name, text in fields.items():
+            for token in tokenize(text):
+                terms[token] += FIELD_WEIGHTS[name]
+        return terms
+    
+    def upsert(self, story: Story) -> bool:
+        """Add or re-index a story; returns False when it was already current"""
+        signature = self.signature(story)
+        if self.signatures.get(story.story_id) == signature:
+            self.stories[story.story_id] = story
+            return False
+        
+        self.remove(story.story_id)
+        terms = self.story_terms(story)
+        for term, count in terms.items():
+            self.postings.setdefault(term, {})[story.story_id] = count
+        
+        length = sum(terms.values())
+        self.stories[story.story_id] = story
+        self.doc_terms[story.story_id] = terms
+        self.doc_lengths[story.story_id] = length
+        self.signatures[story.story_id] = signature
+        self.total_length += length
+        return True
+    
+    def remove(self, story_id: str):
+        """Remove a story from the index"""
+        terms = self.doc_terms.pop(story_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(story_id, None)
+                if not postings:
+                    del self.postings[term]
+        self.total_length -= self.doc_lengths.pop(story_id, 0)
+        self.stories.pop(story_id, None)
+        self.signatures.pop(story_id, None)
+    
+    def search(
+        self,
+        query: str,
+        candidate_ids: Optional[Iterable[str]] = None,
+        top_k: Optional[int] = None
+    ) -> List[LexicalMatch]:
+        """BM25-rank stories matching the query, best first"""
+        doc_count = len(self.doc_lengths)
+        if not doc_count:
+            return []
+        
+        allowed = set(candidate_ids) if candidate_ids is not None else None
+        avg_length = self.total_length / doc_count
+        matches: Dict[str, LexicalMatch] = {}
+        
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            
+            idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for story_id, tf in postings.items():
+                if allowed is not None and story_id not in allowed:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[story_id] / avg_length)
+                term_score = idf * tf * (self.k1 + 1) / (tf + norm)
+                
+                match = matches.get(story_id)
+                if match is None:
+                    match = matches[story_id] = LexicalMatch(story=self.stories[story_id], score=0.0)
+                match.score += term_score
+                match.term_scores[term] = term_score
+        
+        ranked = sorted(matches.values(), key=lambda m: m.score, reverse=True)
+        return ranked[:top_k] if top_k else ranked
+
+class StoryLexicalIndex:
+    """Per-twin BM25 indexes over story titles, themes, triggers, key facts and content"""
+    
+    _shared: Optional['StoryLexicalIndex'] = None
+    
+    def __init__(self):
+        self.indexes: Dict[str, BM25Index] = {}
+    
+    @classmethod
+    def shared(cls) -> 'StoryLexicalIndex':
+        """Process-wide index shared by every StoryMatcher"""
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
+    
+    def build(self, twin_id: str, stories: List[Story]):
+        """Build a twin's index from scratch"""
+        index = BM25Index()
+        for story in stories:
+            index.upsert(story)
+        self.indexes[twin_id] = index
+        logger.info(f"Built lexical story index for twin {twin_id} ({len(stories)} stories)")
+    
+    def sync(self, twin_id: str, stories: List[Story]):
+        """Incrementally bring a twin's index in line with its current stories"""
+        index = self.indexes.get(twin_id)
+        if index is None:
+            self.build(twin_id, stories)
+            return
+        
+        current_ids = {story.story_id for story in stories}
+        for story_id in list(index.stories.keys()):
+            if story_id not in current_ids:
+                index.remove(story_id)
+        updated = sum(1 for story in stories if index.upsert(story))
+        if updated:
+            logger.info(f"Re-indexed {updated} changed stories for twin {twin_id}")
+    
+    def upsert_story(self, story: Story):
+        """Add or update a single story"""
+        self.indexes.setdefault(story.twin_id, BM25Index()).upsert(story)
+    
+    def remove_story(self, twin_id: str, story_id: str):
+        """Remove a single story"""
+        index = self.indexes.get(twin_id)
+        if index:
+            index.remove(story_id)
+    
+    def has_twin(self, twin_id: str) -> bool:
+        """Whether a twin's index has been built"""
+        return twin_id in self.indexes
+    
+    def search(
+        self,
+        twin_id: str,
+        query: str,
+        candidate_ids: Optional[Iterable[str]] = None,
+        top_k: Optional[int] = None
+    ) -> List[LexicalMatch]:
+        """BM25-rank a twin's stories for a query"""
+        index = self.indexes.get(twin_id)
+        if index is None:
+            return []
+        return index.search(query, candidate_ids, top_k)
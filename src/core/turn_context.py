@@ -0,0 +1,46 @@
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Any
+from ..models import DigitalTwin, UserMemory, ConversationSession
+
+@dataclass
+class TurnContext:
+    """Request-scoped snapshot of everything a single conversation turn needs"""
+    chat_id: int
+    twin_id: str
+    user_message: str
+    # Filled by the memory stage
+    memory: Optional[UserMemory] = None
+    session: Optional[ConversationSession] = None
+    twin: Optional[DigitalTwin] = None
+    extracted_info: Dict[str, Any] = field(default_factory=dict)
+    user_context: str = ""
+    conversation_context: str = ""
+    response: Optional[str] = None
+    # Set once the turn row has been appended to conversation_turns
+    turn_seq: Optional[int] = None
+    dirty: bool = False
+    profile_dirty: bool = False
+    # Seconds spent in each pipeline stage
+    stage_timings: Dict[str, float] = field(default_factory=dict)
+    # Receives the accumulated reply text while it streams
+    on_text: Optional[Callable[[str], Awaitable[None]]] = None
+    # Called before the first persistent side effect; after that the turn must not be superseded
+    on_commit: Optional[Callable[[], None]] = None
+    # Side effects that only make sense once the turn is recorded (not superseded or aborted)
+    deferred: List[Callable[[], None]] = field(default_factory=list)
+    
+    def commit(self):
+        """Mark the turn as no longer safe to cancel"""
+        if self.on_commit:
+            self.on_commit()
+    
+    def defer(self, effect: Callable[[], None]):
+        """Run an effect once the turn is recorded"""
+        self.deferred.append(effect)
+    
+    def run_deferred(self):
+        """Run the deferred effects (once)"""
+        effects, self.deferred = self.deferred, []
+        for effect in effects:
+            effect()
+
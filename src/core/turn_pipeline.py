@@ -0,0 +1,146 @@
+import asyncio
+import statistics
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Any, Set, Tuple
+from ..utils.logger import setup_logger
+from .turn_context import TurnContext
+
+logger = setup_logger(__name__)
+
+StageFn = Callable[[TurnContext], Awaitable[None]]
+
+class TurnAborted(Exception):
+    """Raised by a stage to end the turn early with a reply and nothing recorded"""
+    
+    def __init__(self, reply: str):
+        super().__init__(reply)
+        self.reply = reply
+
+@dataclass
+class Stage:
+    """A named step of a turn, its dependencies and its swappable implementations"""
+    name: str
+    run: StageFn
+    depends_on: Tuple[str, ...] = ()
+    # Optional stages may be disabled per twin, and their failures don't fail the turn
+    optional: bool = False
+    variants: Dict[str, StageFn] = field(default_factory=dict)
+    
+    def implementation(self, variant: Optional[str]) -> StageFn:
+        """The implementation for a variant name, the default one if unknown"""
+        if variant and variant not in self.variants:
+            logger.warning(f"Unknown variant '{variant}' for stage '{self.name}', using default")
+        return self.variants.get(variant, self.run) if variant else self.run
+
+class TurnPipeline:
+    """Runs a turn's stages as a dependency graph, starting each stage as soon as its inputs are ready"""
+    
+    def __init__(self, stages: Iterable[Stage]):
+        self.stages: Dict[str, Stage] = {}
+        for stage in stages:
+            if stage.name in self.stages:
+                raise ValueError(f"Duplicate stage '{stage.name}'")
+            self.stages[stage.name] = stage
+        self._check_graph()
+        self.timings: Dict[str, deque] = {name: deque(maxlen=1000) for name in self.stages}
+        self.stats = {name: {'runs': 0, 'skipped': 0, 'failed': 0} for name in self.stages}
+    
+    def _check_graph(self):
+        """Reject unknown dependencies and cycles"""
+        for stage in self.stages.values():
+            for dependency in stage.depends_on:
+                if dependency not in self.stages:
+                    raise ValueError(f"Stage '{stage.name}' depends on unknown stage '{dependency}'")
+        
+        visiting: Set[str] = set()
+        done: Set[str] = set()
+        
+        def visit(name: str):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Stage dependency cycle through '{name}'")
+            visiting.add(name)
+            for dependency in self.stages[name].depends_on:
+                visit(dependency)
+            visiting.discard(name)
+            done.add(name)
+        
+        for name in self.stages:
+            visit(name)
+    
+    async def run(
+        self,
+        turn: TurnContext,
+        disabled: Iterable[str] = (),
+        variants: Dict[str, str] = None
+    ) -> TurnContext:
+        """Run every stage once, concurrently where the graph allows; timings go to turn.stage_timings"""
+        variants = variants or {}
+        skipped = set()
+        for name in disabled:
+            stage = self.stages.get(name)
+            if stage and stage.optional:
+                skipped.add(name)
+            elif stage:
+                logger.warning(f"Stage '{name}' is required and can't be disabled")
+        
+        finished: Set[str] = set(skipped)
+        for name in skipped:
+            self.stats[name]['skipped'] += 1
+        running: Dict[asyncio.Task, str] = {}
+        
+        try:
+            while len(finished) < len(self.stages):
+                for name, stage in self.stages.items():
+                    if name in finished or name in running.values():
+                        continue
+                    if all(dependency in finished for dependency in stage.depends_on):
+                        task = asyncio.create_task(self._run_stage(stage, variants.get(name), turn))
+                        running[task] = name
+                
+                if not running:
+                    raise RuntimeError("Turn pipeline stalled")
+                
+                done, _ = await asyncio.wait(running.keys(), return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    name = running.pop(task)
+                    error = task.exception()
+                    if error is not None:
+                        self.stats[name]['failed'] += 1
+                        if not self.stages[name].optional or isinstance(error, TurnAborted):
+                            raise error
+                        logger.error(f"Optional stage '{name}' failed for chat {turn.chat_id}: {error}")
+                    finished.add(name)
+        finally:
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+        
+        return turn
+    
+    async def _run_stage(self, stage: Stage, variant: Optional[str], turn: TurnContext):
+        """Run one stage and record how long it took"""
+        started = time.perf_counter()
+        try:
+            await stage.implementation(variant)(turn)
+        finally:
+            elapsed = time.perf_counter() - started
+            turn.stage_timings[stage.name] = elapsed
+            self.timings[stage.name].append(elapsed)
+            self.stats[stage.name]['runs'] += 1
+    
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Get run counts and median/p95 time per stage"""
+        stats = {}
+        for name, samples in self.timings.items():
+            stage_stats = dict(self.stats[name])
+            if samples:
+                ordered = sorted(samples)
+                stage_stats['median_seconds'] = statistics.median(ordered)
+                stage_stats['p95_seconds'] = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+            stats[name] = stage_stats
+        return stats
@@ -0,0 +1,142 @@
+import asyncio
+import json
+import time
+from typing import Dict, List, Optional, Any, Set
+from ..database.postgres_client import PostgreSQLClient
+from ..database.repositories import DigitalTwinRepository
+from ..models import DigitalTwin
+from ..utils.config import Config
+from ..utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+TWIN_CHANGES_CHANNEL = 'digital_twins_changed'
+
+class TwinRegistry:
+    """Process-wide in-memory twin cache kept fresh by LISTEN/NOTIFY with a TTL fallback"""
+    
+    _shared: Optional['TwinRegistry'] = None
+    
+    def __init__(self, ttl_seconds: float = None):
+        self.repository = DigitalTwinRepository()
+        self.db = PostgreSQLClient()
+        self.ttl_seconds = Config.TWIN_REGISTRY_TTL if ttl_seconds is None else ttl_seconds
+        self._twins: Dict[str, DigitalTwin] = {}
+        self._loaded_at: Optional[float] = None
+        self._reload_lock = asyncio.Lock()
+        self._listener = None
+        self._tasks: Set[asyncio.Task] = set()
+        # Bumped on every change so callers can rebuild derived data (e.g. keyboards)
+        self.version = 0
+        self.stats = {
+            'lookups': 0,
+            'misses': 0,
+            'reloads': 0,
+            'notifications': 0
+        }
+    
+    @classmethod
+    def shared(cls) -> 'TwinRegistry':
+        """Process-wide registry"""
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
+    
+    async def start(self):
+        """Preload all twins and subscribe to change notifications (call at startup)"""
+        await self.reload()
+        try:
+            self._listener = await self.db.listen(TWIN_CHANGES_CHANNEL, self._on_notify)
+            self._listener.add_termination_listener(self._on_listener_lost)
+            logger.info(f"Twin registry loaded {len(self._twins)} twins, listening for changes")
+        except Exception as e:
+            logger.warning(f"Twin registry falling back to {self.ttl_seconds}s TTL refresh: {e}")
+    
+    async def stop(self):
+        """Stop listening for changes"""
+        if self._listener is not None:
+            listener, self._listener = self._listener, None
+            await self.db.unlisten(listener, TWIN_CHANGES_CHANNEL, self._on_notify)
+    
+    async def reload(self):
+        """Replace the cache with every twin from the database"""
+        async with self._reload_lock:
+            twins = await self.repository.get_all_twins()
+            if twins or self._loaded_at is None:
+                self._twins = {twin.twin_id: twin for twin in twins}
+                self.version += 1
+            self._loaded_at = time.monotonic()
+            self.stats['reloads'] += 1
+    
+    def _is_stale(self) -> bool:
+        """Whether the TTL fallback is due"""
+        return self._loaded_at is None or time.monotonic() - self._loaded_at >= self.ttl_seconds
+    
+    async def get_twin(self, twin_id: str) -> Optional[DigitalTwin]:
+        """Get a twin from memory, falling back to the database for unknown ids"""
+        self.stats['lookups'] += 1
+        if self._is_stale():
+            await self.reload()
+        
+        twin = self._twins.get(twin_id)
+        if twin is None:
+            self.stats['misses'] += 1
+            twin = await self.repository.get_twin_by_id(twin_id)
+            if twin:
+                self._twins[twin_id] = twin
+                self.version += 1
+        return twin
+    
+    async def get_all_twins(self) -> List[DigitalTwin]:
+        """Get every twin ordered by name"""
+        if self._is_stale():
+            await self.reload()
+        return sorted(self._twins.values(), key=lambda twin: twin.name)
+    
+    def _on_notify(self, connection, pid: int, channel: str, payload: str):
+        """asyncpg notification callback - refresh the changed twin in the background"""
+        self.stats['notifications'] += 1
+        task = asyncio.create_task(self._apply_change(payload))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def _apply_change(self, payload: str):
+        """Apply one digital_twins change notification"""
+        try:
+            change = json.loads(payload)
+            twin_id = change['twin_id']
+            if change.get('op') == 'DELETE':
+                self._twins.pop(twin_id, None)
+            else:
+                twin = await self.repository.get_twin_by_id(twin_id)
+                if twin:
+                    self._twins[twin_id] = twin
+            self.version += 1
+            logger.info(f"Twin registry applied {change.get('op')} for twin {twin_id}")
+        except Exception as e:
+            logger.error(f"Error applying twin change '{payload}', forcing reload: {e}")
+            self._loaded_at = None
+    
+    def _on_listener_lost(self, connection):
+        """The listening connection dropped - rely on TTL refresh and try to resubscribe"""
+        if self._listener is None:
+            return
+        listener, self._listener = self._listener, None
+        self._loaded_at = None
+        logger.warning("Twin registry lost its LISTEN connection, resubscribing")
+        task = asyncio.create_task(self._resubscribe(listener))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def _resubscribe(self, listener):
+        """Return the dead connection to the pool and listen on a fresh one"""
+        await self.db.unlisten(listener, TWIN_CHANGES_CHANNEL, self._on_notify)
+        await self.start()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get registry size, hit counts and listener state"""
+        stats = dict(self.stats)
+        stats['twins'] = len(self._twins)
+        stats['listening'] = self._listener is not None
+        stats['version'] = self.version
+        return stats
@@ -1,8 +1,13 @@
 from typing import Dict, Any, Optional
 from ..database.repositories import UserMemoryRepository
+from ..utils.config import Config
 from ..utils.llm_client import LLMClient
+from ..utils.llm_scheduler import Priority
 from ..utils.logger import setup_logger
 from ..models import UserMemory
+from .turn_context import TurnContext
+from .extraction_worker import ExtractionWorker
+from .conversation_history import ConversationHistoryStore
 
 logger = setup_logger(__name__)
 
@@ -11,7 +16,10 @@ class UserMemoryManager:
     
     def __init__(self):
         self.repository = UserMemoryRepository()
-        self.llm_client = LLMClient()
+        self.history = ConversationHistoryStore.shared()
+        self.llm_client = LLMClient(priority=Priority.EXTRACTION)
+        self.background_extraction = Config.EXTRACTION_MODE == 'background'
+        self.extraction_worker = ExtractionWorker.shared()
     
     async def get_user_memory(self, chat_id: int, twin_id: str = None) -> UserMemory:
         """Get user memory (optionally twin-specific)"""
@@ -20,12 +28,17 @@ class UserMemoryManager:
     async def update_from_message(self, chat_id: int, user_message: str, twin_id: str) -> bool:
         """Update user memory from new message with twin context"""
         try:
-            # Extract information from message
-            extracted_info = await self.llm_client.extract_user_info(user_message)
-            
-            # Update global profile (shared across all twins)
-            if extracted_info:
-                await self.repository.update_user_profile(chat_id, extracted_info)
+            if self.background_extraction:
+                # Profile is updated by the extraction worker off the reply path
+                extracted_info = {}
+                self.extraction_worker.submit(chat_id, user_message)
+            else:
+                # Extract information from message
+                extracted_info = await self.llm_client.extract_user_info(user_message)
+                
+                # Update global profile (shared across all twins)
+                if extracted_info:
+                    await self.repository.update_user_profile(chat_id, extracted_info)
             
             # Add conversation entry with twin-specific context
             await self.repository.add_conversation_entry(chat_id, user_message, extracted_info, twin_id)
@@ -39,11 +52,114 @@ class UserMemoryManager:
         """Add twin response to conversation history"""
         return await self.repository.add_twin_response(chat_id, response, twin_id)
     
+    async def _load_twin_memory(self, chat_id: int, twin_id: str) -> UserMemory:
+        """User memory with the recent turns for this twin as its conversation history"""
+        memory = await self.get_user_memory(chat_id)
+        memory.conversation_history = await self.history.recent(chat_id, twin_id, Config.CONVERSATION_CONTEXT_TURNS)
+        return memory
+    
     async def get_user_context_string(self, chat_id: int, twin_id: str) -> str:
         """Get formatted user context for prompts (twin-specific)"""
-        memory = await self.get_user_memory(chat_id)
+        memory = await self._load_twin_memory(chat_id, twin_id)
+        return self.build_user_context_string(memory, twin_id)
+    
+    async def get_recent_conversation(self, chat_id: int, twin_id: str, exchanges: int = 3) -> str:
+        """Get recent conversation history for this specific twin"""
+        try:
+            memory = await self._load_twin_memory(chat_id, twin_id)
+            return self.build_recent_conversation(memory, twin_id, exchanges)
+        except Exception as e:
+            logger.error(f"Error getting recent conversation for twin {twin_id}: {e}")
+            return ""
+    
+    async def get_twin_specific_history(self, chat_id: int, twin_id: str) -> list:
+        """Get conversation history specific to this twin"""
+        try:
+            memory = await self._load_twin_memory(chat_id, twin_id)
+            return self.filter_twin_history(memory, twin_id)
+        except Exception as e:
+            logger.error(f"Error getting twin-specific history: {e}")
+            return []
+    
+    async def load_turn_context(self, chat_id: int, twin_id: str, user_message: str) -> TurnContext:
+        """Load the user memory snapshot that a whole turn works from"""
+        turn = TurnContext(chat_id=chat_id, twin_id=twin_id, user_message=user_message)
+        return await self.load_memory(turn)
+    
+    async def load_memory(self, turn: TurnContext) -> TurnContext:
+        """Load the turn's memory snapshot"""
+        # Only the last few turns with this twin are read, never the whole history
+        turn.memory = await self._load_twin_memory(turn.chat_id, turn.twin_id)
+        return turn
+    
+    async def extract_turn_info(self, turn: TurnContext) -> TurnContext:
+        """Extract user info from the turn's message (or queue it for the background worker)"""
+        if self.background_extraction:
+            # Profile is updated by the extraction worker off the reply path, once the turn is recorded
+            # (a superseded message is extracted as part of the merged turn instead)
+            turn.defer(lambda: self.extraction_worker.submit(turn.chat_id, turn.user_message))
+        else:
+            try:
+                turn.extracted_info = await self.llm_client.extract_user_info(turn.user_message) or {}
+            except Exception as e:
+                logger.error(f"Error extracting user info for twin {turn.twin_id}: {e}")
+                turn.extracted_info = {}
+        return turn
+    
+    async def apply_user_message(self, turn: TurnContext) -> TurnContext:
+        """Extract user info and record the user message on the turn snapshot"""
+        await self.extract_turn_info(turn)
+        return self.record_user_message(turn)
+    
+    def record_user_message(self, turn: TurnContext) -> TurnContext:
+        """Record the user message and extracted info on the snapshot and derive prompt context"""
+        memory = turn.memory
+        if turn.extracted_info:
+            memory.profile = self.repository.merge_profile(memory.profile, turn.extracted_info)
+            turn.profile_dirty = True
+        memory.conversation_history = self.repository.append_conversation_entry(
+            memory.conversation_history, turn.user_message, turn.extracted_info, turn.twin_id
+        )
+        turn.dirty = True
         
-        # Build context including twin-specific conversation history
+        # Derive prompt context from the updated snapshot
+        turn.user_context = self.build_user_context_string(memory, turn.twin_id)
+        turn.conversation_context = self.build_recent_conversation(memory, turn.twin_id)
+        return turn
+    
+    def apply_twin_response(self, turn: TurnContext, response: str) -> TurnContext:
+        """Record the twin response on the turn snapshot"""
+        turn.response = response
+        turn.memory.conversation_history = self.repository.attach_twin_response(
+            turn.memory.conversation_history, response, turn.twin_id
+        )
+        turn.dirty = True
+        return turn
+    
+    async def save_turn_context(self, turn: TurnContext) -> bool:
+        """Write the turn back once: profile/last interaction plus one appended turn row"""
+        if not turn.dirty:
+            return True
+        saved = await self.repository.save_user_memory(turn.memory, include_profile=turn.profile_dirty)
+        if saved:
+            turn.profile_dirty = False
+        
+        if turn.turn_seq is None:
+            turn.turn_seq = await self.history.append(
+                turn.chat_id, turn.twin_id, turn.user_message, turn.extracted_info, turn.response
+            )
+            saved = saved and turn.turn_seq is not None
+        elif turn.response is not None:
+            saved = saved and await self.history.set_twin_response(
+                turn.chat_id, turn.twin_id, turn.response, turn.turn_seq
+            )
+        
+        if saved:
+            turn.dirty = False
+        return saved
+    
+    def build_user_context_string(self, memory: UserMemory, twin_id: str) -> str:
+        """Build formatted user context for prompts from a memory snapshot"""
         context_parts = []
         
         # Global user profile (shared across twins)
@@ -58,7 +174,7 @@ class UserMemoryManager:
             context_parts.append(f"Location: {profile['location']}")
         
         # Twin-specific conversation history
-        twin_history = await self.get_twin_specific_history(chat_id, twin_id)
+        twin_history = self.filter_twin_history(memory, twin_id)
         if twin_history:
             context_parts.append(f"Our conversation history:")
             for interaction in twin_history[-3:]:  # Last 3 interactions
@@ -72,46 +188,33 @@ class UserMemoryManager:
         
         return "\n".join(context_parts) if context_parts else "This is our first conversation."
     
-    async def get_recent_conversation(self, chat_id: int, twin_id: str, exchanges: int = 3) -> str:
-        """Get recent conversation history for this specific twin"""
-        try:
-            twin_history = await self.get_twin_specific_history(chat_id, twin_id)
-            
-            if not twin_history:
-                return "No recent conversation history."
-            
-            recent = twin_history[-(exchanges * 2):] if len(twin_history) >= exchanges * 2 else twin_history
-            
-            conversation_text = []
-            for interaction in recent:
-                user_msg = interaction.get('user_message')
-                twin_response = interaction.get('twin_response')
-                
-                if user_msg:
-                    conversation_text.append(f"User: {user_msg}")
-                if twin_response:
-                    conversation_text.append(f"{interaction.get('twin_name', 'Twin')}: {twin_response}")
+    def build_recent_conversation(self, memory: UserMemory, twin_id: str, exchanges: int = 3) -> str:
+        """Build recent conversation text for this twin from a memory snapshot"""
+        twin_history = self.filter_twin_history(memory, twin_id)
+        
+        if not twin_history:
+            return "No recent conversation history."
+        
+        recent = twin_history[-(exchanges * 2):] if len(twin_history) >= exchanges * 2 else twin_history
+        
+        conversation_text = []
+        for interaction in recent:
+            user_msg = interaction.get('user_message')
+            twin_response = interaction.get('twin_response')
             
-            return "\n".join(conversation_text)
-        except Exception as e:
-            logger.error(f"Error getting recent conversation for twin {twin_id}: {e}")
-            return ""
+            if user_msg:
+                conversation_text.append(f"User: {user_msg}")
+            if twin_response:
+                conversation_text.append(f"{interaction.get('twin_name', 'Twin')}: {twin_response}")
+        
+        return "\n".join(conversation_text)
     
-    async def get_twin_specific_history(self, chat_id: int, twin_id: str) -> list:
-        """Get conversation history specific to this twin"""
-        try:
-            memory = await self.get_user_memory(chat_id)
-            
-            # Filter conversation history for this specific twin
-            twin_history = []
-            for interaction in memory.conversation_history:
-                if interaction.get('twin_id') == twin_id:
-                    twin_history.append(interaction)
-            
-            return twin_history
-        except Exception as e:
-            logger.error(f"Error getting twin-specific history: {e}")
-            return []
+    def filter_twin_history(self, memory: UserMemory, twin_id: str) -> list:
+        """Filter a memory snapshot's conversation history to this twin"""
+        return [
+            interaction for interaction in memory.conversation_history
+            if interaction.get('twin_id') == twin_id
+        ]
     
     async def get_current_story(self, chat_id: int, twin_id: str) -> Optional[str]:
         """Get current active story for this twin"""
@@ -124,7 +227,9 @@ class UserMemoryManager:
     async def clear_twin_specific_memory(self, chat_id: int, twin_id: str) -> bool:
         """Clear conversation history for this specific twin only"""
         try:
-            return await self.repository.clear_twin_conversation_history(chat_id, twin_id)
+            cleared = await self.repository.clear_twin_conversation_history(chat_id, twin_id)
+            self.history.forget(chat_id, twin_id)
+            return cleared
         except Exception as e:
             logger.error(f"Error clearing twin-specific memory: {e}")
             return False
\ No newline at end of file
@@ -1,18 +1,30 @@
 from .postgres_client import PostgreSQLClient
+from .pool_registry import PoolRegistry
+from .write_behind import WriteBehindBuffer
 from .repositories import (
     DigitalTwinRepository, 
     StoryRepository, 
+    StoryUnitOfWork,
     UserMemoryRepository, 
-    ConversationRepository
+    ConversationRepository,
+    ConversationTurnRepository,
+    JudgeDecisionRepository,
+    LLMCacheRepository
 )
 
 # Export all database components
 __all__ = [
     'PostgreSQLClient',
+    'PoolRegistry',
+    'WriteBehindBuffer',
     'DigitalTwinRepository',
     'StoryRepository', 
+    'StoryUnitOfWork',
     'UserMemoryRepository',
-    'ConversationRepository'
+    'ConversationRepository',
+    'ConversationTurnRepository',
+    'JudgeDecisionRepository',
+    'LLMCacheRepository'
 ]
 
 # Convenience function to get database client
@@ -76,13 +76,55 @@ CREATE TABLE conversation_sessions (
     last_activity TIMESTAMP DEFAULT NOW()
 );
 
+-- Conversation Turns Table (append-only, one row per user message and twin reply)
+CREATE TABLE conversation_turns (
+    chat_id BIGINT REFERENCES user_memory(chat_id) ON DELETE CASCADE,
+    twin_id VARCHAR(255) REFERENCES digital_twins(twin_id) ON DELETE CASCADE,
+    turn_seq INTEGER NOT NULL,
+    user_message TEXT,
+    twin_response TEXT,
+    extracted_info JSONB DEFAULT '{}',
+    created_at TIMESTAMP DEFAULT NOW(),
+    responded_at TIMESTAMP,
+    PRIMARY KEY (chat_id, twin_id, turn_seq)
+);
+
+-- Judge Decisions Table (training data for the local intent classifier)
+CREATE TABLE judge_decisions (
+    id UUID DEFAULT uuid_generate_v4() PRIMARY KEY,
+    chat_id BIGINT,
+    twin_id VARCHAR(255),
+    user_message TEXT,
+    action_type VARCHAR(50),
+    confidence FLOAT,
+    source VARCHAR(50) DEFAULT 'llm',
+    created_at TIMESTAMP DEFAULT NOW()
+);
+
+-- LLM Response Cache (shared across worker processes; UNLOGGED since it is disposable)
+CREATE UNLOGGED TABLE llm_cache (
+    cache_key CHAR(64) PRIMARY KEY,
+    call_type VARCHAR(50) NOT NULL,
+    content TEXT NOT NULL,
+    latency FLOAT DEFAULT 0,
+    expires_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    created_at TIMESTAMP DEFAULT NOW()
+);
+
 -- Indexes for better performance
 CREATE INDEX idx_user_memory_chat_id ON user_memory(chat_id);
-CREATE INDEX idx_story_segments_story_id ON story_segments(story_id, segment_order);
-CREATE INDEX idx_user_story_progress_chat_twin ON user_story_progress(chat_id, twin_id);
-CREATE INDEX idx_conversation_sessions_chat_twin ON conversation_sessions(chat_id, twin_id);
-CREATE INDEX idx_stories_twin_id ON stories(twin_id);
+-- Mirrors src/database/migrations/versions; change the schema there and copy it here
+-- Only active sessions are ever looked up, newest first
+CREATE INDEX idx_conversation_sessions_active ON conversation_sessions(chat_id, twin_id, started_at DESC) 
+    WHERE session_state = 'active';
+-- Covers the recently-told-stories reads so they are index-only scans
+CREATE INDEX idx_user_story_progress_recent ON user_story_progress(chat_id, twin_id, created_at) 
+    INCLUDE (story_id);
+CREATE INDEX idx_stories_twin_created ON stories(twin_id, created_at);
 CREATE INDEX idx_story_segments_story_order ON story_segments(story_id, segment_order);
+CREATE INDEX idx_judge_decisions_source_created ON judge_decisions(source, created_at);
+CREATE INDEX idx_llm_cache_expires_at ON llm_cache(expires_at);
+-- "Last N turns for this twin" is a backward scan of the conversation_turns primary key
 
 -- Function to update timestamp
 CREATE OR REPLACE FUNCTION update_updated_at_column()
@@ -96,4 +138,91 @@ $$ language 'plpgsql';
 -- Trigger for digital_twins
 CREATE TRIGGER update_digital_twins_updated_at 
     BEFORE UPDATE ON digital_twins 
-    FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
\ No newline at end of file
+    FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
+-- Notify running bots when a twin changes so their in-memory registries refresh
+CREATE OR REPLACE FUNCTION notify_digital_twins_changed()
+RETURNS TRIGGER AS $$
+DECLARE
+    changed_twin_id VARCHAR(255);
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        changed_twin_id := OLD.twin_id;
+    ELSE
+        changed_twin_id := NEW.twin_id;
+    END IF;
+    PERFORM pg_notify(
+        'digital_twins_changed',
+        json_build_object('op', TG_OP, 'twin_id', changed_twin_id)::text
+    );
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER notify_digital_twins_changed 
+    AFTER INSERT OR UPDATE OR DELETE ON digital_twins 
+    FOR EACH ROW EXECUTE FUNCTION notify_digital_twins_changed();
+
+-- Notify running bots when a story or its segments change so their story catalogues refresh
+CREATE OR REPLACE FUNCTION notify_stories_changed()
+RETURNS TRIGGER AS $$
+DECLARE
+    changed_story_id VARCHAR(255);
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        changed_story_id := OLD.story_id;
+    ELSE
+        changed_story_id := NEW.story_id;
+    END IF;
+    PERFORM pg_notify(
+        'stories_changed',
+        json_build_object('op', TG_OP, 'table', TG_TABLE_NAME, 'story_id', changed_story_id)::text
+    );
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER notify_stories_changed 
+    AFTER INSERT OR UPDATE OR DELETE ON stories 
+    FOR EACH ROW EXECUTE FUNCTION notify_stories_changed();
+
+-- Segment changes notify once per changed story per statement, so a bulk import doesn't send one NOTIFY per row
+CREATE OR REPLACE FUNCTION notify_story_segments_changed()
+RETURNS TRIGGER AS $$
+DECLARE
+    changed_story_ids VARCHAR(255)[];
+    changed_story_id VARCHAR(255);
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        SELECT array_agg(DISTINCT story_id) INTO changed_story_ids FROM new_segments;
+    ELSIF TG_OP = 'UPDATE' THEN
+        SELECT array_agg(DISTINCT story_id) INTO changed_story_ids
+        FROM (SELECT story_id FROM new_segments UNION SELECT story_id FROM old_segments) changed;
+    ELSE
+        SELECT array_agg(DISTINCT story_id) INTO changed_story_ids FROM old_segments;
+    END IF;
+    FOREACH changed_story_id IN ARRAY COALESCE(changed_story_ids, '{}') LOOP
+        PERFORM pg_notify(
+            'stories_changed',
+            json_build_object('op', TG_OP, 'table', TG_TABLE_NAME, 'story_id', changed_story_id)::text
+        );
+    END LOOP;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+-- Transition tables allow only one event per trigger
+CREATE TRIGGER notify_story_segments_inserted 
+    AFTER INSERT ON story_segments 
+    REFERENCING NEW TABLE AS new_segments 
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_story_segments_changed();
+
+CREATE TRIGGER notify_story_segments_updated 
+    AFTER UPDATE ON story_segments 
+    REFERENCING OLD TABLE AS old_segments NEW TABLE AS new_segments 
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_story_segments_changed();
+
+CREATE TRIGGER notify_story_segments_deleted 
+    AFTER DELETE ON story_segments 
+    REFERENCING OLD TABLE AS old_segments 
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_story_segments_changed();
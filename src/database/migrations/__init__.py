@@ -0,0 +1,10 @@
+from .runner import Migration, MigrationRunner, MigrationError
+from .plan_check import HOT_QUERIES, check_query_plans
+
+__all__ = [
+    'Migration',
+    'MigrationRunner',
+    'MigrationError',
+    'HOT_QUERIES',
+    'check_query_plans'
+]
@@ -0,0 +1,94 @@
+import json
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Any, Tuple
+from ..postgres_client import PostgreSQLClient
+from ...utils.config import Config
+from ...utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+def _history_cutoff() -> datetime:
+    """Story history cutoff, computed the way the repositories do"""
+    return datetime.now() - timedelta(days=Config.STORY_HISTORY_DAYS)
+
+# name -> (query, sample arguments); callable arguments are evaluated per check.
+# Keep in step with the repositories' hottest reads.
+HOT_QUERIES: Dict[str, Tuple[str, Tuple[Any, ...]]] = {
+    'active_session': (
+        """
+        SELECT * FROM conversation_sessions
+        WHERE chat_id = $1 AND twin_id = $2 AND session_state = 'active'
+        ORDER BY started_at DESC LIMIT 1
+        """,
+        (0, '')
+    ),
+    'recent_turns': (
+        """
+        SELECT turn_seq, created_at, user_message, twin_response FROM conversation_turns
+        WHERE chat_id = $1 AND twin_id = $2
+        ORDER BY turn_seq DESC LIMIT $3
+        """,
+        (0, '', 6)
+    ),
+    'told_stories': (
+        """
+        SELECT story_id FROM user_story_progress
+        WHERE chat_id = $1 AND twin_id = $2 AND created_at >= $3
+        """,
+        (0, '', _history_cutoff)
+    ),
+    'untold_stories': (
+        """
+        SELECT s.story_id FROM stories s
+        WHERE s.twin_id = $1
+          AND NOT EXISTS (
+              SELECT 1 FROM user_story_progress p
+              WHERE p.chat_id = $2 AND p.twin_id = $1 AND p.story_id = s.story_id
+                AND p.created_at >= $3
+          )
+        """,
+        ('', 0, _history_cutoff)
+    ),
+    'twin_stories': (
+        "SELECT * FROM stories WHERE twin_id = $1 ORDER BY created_at",
+        ('',)
+    ),
+    'story_segment': (
+        "SELECT * FROM story_segments WHERE story_id = $1 AND segment_order = $2",
+        ('', 1)
+    )
+}
+
+def _seq_scans(plan: Dict[str, Any]) -> List[str]:
+    """Relations read by sequential scan anywhere in a plan tree"""
+    scans = []
+    if plan.get('Node Type') == 'Seq Scan':
+        scans.append(plan.get('Relation Name', '?'))
+    for child in plan.get('Plans', []):
+        scans.extend(_seq_scans(child))
+    return scans
+
+async def check_query_plans(names: Iterable[str] = None) -> Dict[str, List[str]]:
+    """EXPLAIN the hot queries and warn about any that can only be served by a sequential scan"""
+    db = PostgreSQLClient()
+    results: Dict[str, List[str]] = {}
+    for name in names or HOT_QUERIES:
+        query, args = HOT_QUERIES[name]
+        args = [arg() if callable(arg) else arg for arg in args]
+        try:
+            async with db.transaction() as connection:
+                # Small tables are cheaper to scan; with seq scans discouraged, only a missing index leaves one
+                await connection.execute("SET LOCAL enable_seqscan = off")
+                explained = await connection.fetchval(f"EXPLAIN (FORMAT JSON) {query}", *args)
+            plan = (json.loads(explained) if isinstance(explained, str) else explained)[0]['Plan']
+            results[name] = _seq_scans(plan)
+        except Exception as e:
+            logger.error(f"Couldn't check plan for hot query '{name}': {e}")
+            continue
+        
+        if results[name]:
+            logger.warning(f"Hot query '{name}' falls back to a sequential scan on {', '.join(results[name])}")
+    
+    if results and not any(results.values()):
+        logger.info(f"All {len(results)} hot query plans use indexes")
+    return results
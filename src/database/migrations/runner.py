@@ -0,0 +1,175 @@
+import hashlib
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Any
+from ..postgres_client import PostgreSQLClient
+from ...utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+VERSIONS_DIR = Path(__file__).parent / "versions"
+FILENAME_PATTERN = re.compile(r"^(\d{4})_(\w+)\.sql$")
+# Header for migrations that can't run in a transaction (CREATE INDEX CONCURRENTLY)
+NO_TRANSACTION_PATTERN = re.compile(r"^--\s*migrate:no-transaction\s*$", re.MULTILINE)
+STATEMENT_END = re.compile(r";\s*$", re.MULTILINE)
+# Arbitrary key shared by every process, so only one of them migrates at a time
+ADVISORY_LOCK_KEY = 7351902
+
+SCHEMA_MIGRATIONS_TABLE = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INTEGER PRIMARY KEY,
+        name VARCHAR(255) NOT NULL,
+        checksum CHAR(64) NOT NULL,
+        applied_at TIMESTAMP DEFAULT NOW()
+    )
+"""
+
+class MigrationError(Exception):
+    """Raised when the migration history doesn't match the migration files"""
+
+@dataclass(frozen=True)
+class Migration:
+    """One versioned SQL file"""
+    version: int
+    name: str
+    sql: str
+    
+    @property
+    def checksum(self) -> str:
+        """SHA-256 of the file contents, recorded when applied"""
+        return hashlib.sha256(self.sql.encode('utf-8')).hexdigest()
+    
+    @property
+    def transactional(self) -> bool:
+        """False for migrations marked `-- migrate:no-transaction`"""
+        return not NO_TRANSACTION_PATTERN.search(self.sql)
+    
+    def statements(self) -> List[str]:
+        """Split into statements, one per `;` at a line end (no-transaction migrations run them one by one)"""
+        if '$$' in self.sql:
+            raise MigrationError(
+                f"Migration {self.version:04d}_{self.name} can't be split into statements; "
+                f"keep function bodies in transactional migrations"
+            )
+        statements = []
+        for chunk in STATEMENT_END.split(self.sql):
+            code = [line for line in chunk.splitlines() if line.strip() and not line.strip().startswith('--')]
+            if code:
+                statements.append(chunk.strip())
+        return statements
+    
+    @classmethod
+    def from_file(cls, path: Path) -> 'Migration':
+        """Load a migration from a NNNN_name.sql file"""
+        match = FILENAME_PATTERN.match(path.name)
+        if not match:
+            raise MigrationError(f"Migration file '{path.name}' isn't named NNNN_name.sql")
+        return cls(version=int(match.group(1)), name=match.group(2), sql=path.read_text(encoding='utf-8'))
+
+class MigrationRunner:
+    """Applies pending migrations in version order, each in its own transaction"""
+    
+    def __init__(self, directory: Path = None):
+        self.db = PostgreSQLClient()
+        self.directory = Path(directory) if directory else VERSIONS_DIR
+    
+    def discover(self) -> List[Migration]:
+        """All migration files, ordered by version"""
+        migrations: Dict[int, Migration] = {}
+        for path in sorted(self.directory.glob("*.sql")):
+            migration = Migration.from_file(path)
+            if migration.version in migrations:
+                raise MigrationError(
+                    f"Duplicate migration version {migration.version}: "
+                    f"{migrations[migration.version].name} and {migration.name}"
+                )
+            migrations[migration.version] = migration
+        return [migrations[version] for version in sorted(migrations)]
+    
+    @staticmethod
+    async def _applied(connection) -> Dict[int, Dict[str, Any]]:
+        """Applied migrations by version"""
+        rows = await connection.fetch("SELECT version, name, checksum, applied_at FROM schema_migrations")
+        return {row['version']: dict(row) for row in rows}
+    
+    @staticmethod
+    def _verify(migrations: List[Migration], applied: Dict[int, Dict[str, Any]]):
+        """Refuse to continue if an applied migration file was edited afterwards"""
+        for migration in migrations:
+            record = applied.get(migration.version)
+            if record and record['checksum'] != migration.checksum:
+                raise MigrationError(
+                    f"Migration {migration.version:04d}_{migration.name} changed after it was applied; "
+                    f"add a new migration instead"
+                )
+    
+    @staticmethod
+    async def _record(connection, migration: Migration):
+        """Mark a migration as applied"""
+        await connection.execute(
+            "INSERT INTO schema_migrations (version, name, checksum) VALUES ($1, $2, $3)",
+            migration.version, migration.name, migration.checksum
+        )
+    
+    async def status(self) -> List[Dict[str, Any]]:
+        """Every migration with whether it is applied and whether its checksum still matches"""
+        if not self.db.pool:
+            await self.db.initialize()
+        
+        async with self.db.pool.acquire() as connection:
+            await connection.execute(SCHEMA_MIGRATIONS_TABLE)
+            applied = await self._applied(connection)
+        
+        status = []
+        for migration in self.discover():
+            record = applied.get(migration.version)
+            status.append({
+                'version': migration.version,
+                'name': migration.name,
+                'applied': record is not None,
+                'applied_at': record['applied_at'] if record else None,
+                'checksum_ok': record is None or record['checksum'] == migration.checksum
+            })
+        return status
+    
+    async def migrate(self, target: Optional[int] = None) -> List[Migration]:
+        """Apply pending migrations up to `target` (all by default) and return the ones applied"""
+        migrations = self.discover()
+        if target is not None:
+            migrations = [migration for migration in migrations if migration.version <= target]
+        
+        if not self.db.pool:
+            await self.db.initialize()
+        
+        applied_now = []
+        async with self.db.pool.acquire() as connection:
+            await connection.execute("SELECT pg_advisory_lock($1)", ADVISORY_LOCK_KEY)
+            try:
+                await connection.execute(SCHEMA_MIGRATIONS_TABLE)
+                applied = await self._applied(connection)
+                self._verify(migrations, applied)
+                
+                for migration in migrations:
+                    if migration.version in applied:
+                        continue
+                    logger.info(f"Applying migration {migration.version:04d}_{migration.name}")
+                    if migration.transactional:
+                        async with connection.transaction():
+                            await connection.execute(migration.sql)
+                            await self._record(connection, migration)
+                    else:
+                        # Each statement runs on its own (a multi-statement query is one implicit transaction);
+                        # statements must be idempotent since a failure part-way leaves the earlier ones applied
+                        for statement in migration.statements():
+                            await connection.execute(statement)
+                        await self._record(connection, migration)
+                    applied_now.append(migration)
+            finally:
+                await connection.execute("SELECT pg_advisory_unlock($1)", ADVISORY_LOCK_KEY)
+        
+        if applied_now:
+            logger.info(f"Applied {len(applied_now)} migration(s), schema at version {applied_now[-1].version}")
+        else:
+            logger.info("Schema is up to date")
+        return applied_now
@@ -0,0 +1,98 @@
+-- Tables, indexes and triggers added to init.sql after the first deployments, for databases created before them.
+-- Idempotent so it is also safe on databases created from the current init.sql.
+
+-- Conversation Turns Table (append-only, one row per user message and twin reply)
+CREATE TABLE IF NOT EXISTS conversation_turns (
+    chat_id BIGINT REFERENCES user_memory(chat_id) ON DELETE CASCADE,
+    twin_id VARCHAR(255) REFERENCES digital_twins(twin_id) ON DELETE CASCADE,
+    turn_seq INTEGER NOT NULL,
+    user_message TEXT,
+    twin_response TEXT,
+    extracted_info JSONB DEFAULT '{}',
+    created_at TIMESTAMP DEFAULT NOW(),
+    responded_at TIMESTAMP,
+    PRIMARY KEY (chat_id, twin_id, turn_seq)
+);
+
+-- The primary key serves "last N turns"; a covering index over the message text would reject
+-- long turns with "index row size exceeds btree maximum"
+DROP INDEX IF EXISTS idx_conversation_turns_recent;
+
+-- Judge Decisions Table (training data for the local intent classifier)
+CREATE TABLE IF NOT EXISTS judge_decisions (
+    id UUID DEFAULT uuid_generate_v4() PRIMARY KEY,
+    chat_id BIGINT,
+    twin_id VARCHAR(255),
+    user_message TEXT,
+    action_type VARCHAR(50),
+    confidence FLOAT,
+    source VARCHAR(50) DEFAULT 'llm',
+    created_at TIMESTAMP DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_judge_decisions_source_created ON judge_decisions(source, created_at);
+
+-- LLM Response Cache (shared across worker processes; UNLOGGED since it is disposable)
+CREATE UNLOGGED TABLE IF NOT EXISTS llm_cache (
+    cache_key CHAR(64) PRIMARY KEY,
+    call_type VARCHAR(50) NOT NULL,
+    content TEXT NOT NULL,
+    latency FLOAT DEFAULT 0,
+    expires_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    created_at TIMESTAMP DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_llm_cache_expires_at ON llm_cache(expires_at);
+
+-- Notify running bots when a twin changes so their in-memory registries refresh
+CREATE OR REPLACE FUNCTION notify_digital_twins_changed()
+RETURNS TRIGGER AS $$
+DECLARE
+    changed_twin_id VARCHAR(255);
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        changed_twin_id := OLD.twin_id;
+    ELSE
+        changed_twin_id := NEW.twin_id;
+    END IF;
+    PERFORM pg_notify(
+        'digital_twins_changed',
+        json_build_object('op', TG_OP, 'twin_id', changed_twin_id)::text
+    );
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS notify_digital_twins_changed ON digital_twins;
+CREATE TRIGGER notify_digital_twins_changed 
+    AFTER INSERT OR UPDATE OR DELETE ON digital_twins 
+    FOR EACH ROW EXECUTE FUNCTION notify_digital_twins_changed();
+
+-- Notify running bots when a story or its segments change so their story catalogues refresh
+CREATE OR REPLACE FUNCTION notify_stories_changed()
+RETURNS TRIGGER AS $$
+DECLARE
+    changed_story_id VARCHAR(255);
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        changed_story_id := OLD.story_id;
+    ELSE
+        changed_story_id := NEW.story_id;
+    END IF;
+    PERFORM pg_notify(
+        'stories_changed',
+        json_build_object('op', TG_OP, 'table', TG_TABLE_NAME, 'story_id', changed_story_id)::text
+    );
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS notify_stories_changed ON stories;
+CREATE TRIGGER notify_stories_changed 
+    AFTER INSERT OR UPDATE OR DELETE ON stories 
+    FOR EACH ROW EXECUTE FUNCTION notify_stories_changed();
+
+DROP TRIGGER IF EXISTS notify_story_segments_changed ON story_segments;
+CREATE TRIGGER notify_story_segments_changed 
+    AFTER INSERT OR UPDATE OR DELETE ON story_segments 
+    FOR EACH ROW EXECUTE FUNCTION notify_stories_changed();
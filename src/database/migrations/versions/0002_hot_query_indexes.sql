@@ -0,0 +1,28 @@
+-- migrate:no-transaction
+-- Indexes shaped for the hot queries.
+-- Built CONCURRENTLY so startup migrations don't block writes to these tables. A build that is interrupted
+-- leaves an INVALID index that IF NOT EXISTS would skip; drop it before re-running.
+
+-- Active session lookup: WHERE chat_id AND twin_id AND session_state = 'active' ORDER BY started_at DESC LIMIT 1,
+-- plus the session story updates. Partial, so inactive sessions don't bloat it.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_conversation_sessions_active 
+    ON conversation_sessions(chat_id, twin_id, started_at DESC) 
+    WHERE session_state = 'active';
+
+-- Recently told stories: WHERE chat_id AND twin_id AND created_at >= cutoff, reading story_id.
+-- Covering, so the history read and the untold-stories anti-join are index-only.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_user_story_progress_recent 
+    ON user_story_progress(chat_id, twin_id, created_at) 
+    INCLUDE (story_id);
+
+-- A twin's stories in catalogue order: WHERE twin_id ORDER BY created_at
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_stories_twin_created ON stories(twin_id, created_at);
+
+-- Segment by order: WHERE story_id AND segment_order (and the next-segment join)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_story_segments_story_order ON story_segments(story_id, segment_order);
+
+-- Superseded by the indexes above (same leading columns)
+DROP INDEX CONCURRENTLY IF EXISTS idx_story_segments_story_id;
+DROP INDEX CONCURRENTLY IF EXISTS idx_stories_twin_id;
+DROP INDEX CONCURRENTLY IF EXISTS idx_user_story_progress_chat_twin;
+DROP INDEX CONCURRENTLY IF EXISTS idx_conversation_sessions_chat_twin;
@@ -0,0 +1,47 @@
+-- Replace the per-row story_segments notify trigger with statement-level ones.
+
+DROP TRIGGER IF EXISTS notify_story_segments_changed ON story_segments;
+
+-- Segment changes notify once per changed story per statement, so a bulk import doesn't send one NOTIFY per row
+CREATE OR REPLACE FUNCTION notify_story_segments_changed()
+RETURNS TRIGGER AS $$
+DECLARE
+    changed_story_ids VARCHAR(255)[];
+    changed_story_id VARCHAR(255);
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        SELECT array_agg(DISTINCT story_id) INTO changed_story_ids FROM new_segments;
+    ELSIF TG_OP = 'UPDATE' THEN
+        SELECT array_agg(DISTINCT story_id) INTO changed_story_ids
+        FROM (SELECT story_id FROM new_segments UNION SELECT story_id FROM old_segments) changed;
+    ELSE
+        SELECT array_agg(DISTINCT story_id) INTO changed_story_ids FROM old_segments;
+    END IF;
+    FOREACH changed_story_id IN ARRAY COALESCE(changed_story_ids, '{}') LOOP
+        PERFORM pg_notify(
+            'stories_changed',
+            json_build_object('op', TG_OP, 'table', TG_TABLE_NAME, 'story_id', changed_story_id)::text
+        );
+    END LOOP;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+-- Transition tables allow only one event per trigger
+DROP TRIGGER IF EXISTS notify_story_segments_inserted ON story_segments;
+CREATE TRIGGER notify_story_segments_inserted 
+    AFTER INSERT ON story_segments 
+    REFERENCING NEW TABLE AS new_segments 
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_story_segments_changed();
+
+DROP TRIGGER IF EXISTS notify_story_segments_updated ON story_segments;
+CREATE TRIGGER notify_story_segments_updated 
+    AFTER UPDATE ON story_segments 
+    REFERENCING OLD TABLE AS old_segments NEW TABLE AS new_segments 
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_story_segments_changed();
+
+DROP TRIGGER IF EXISTS notify_story_segments_deleted ON story_segments;
+CREATE TRIGGER notify_story_segments_deleted 
+    AFTER DELETE ON story_segments 
+    REFERENCING OLD TABLE AS old_segments 
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_story_segments_changed();
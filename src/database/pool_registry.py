@@ -0,0 +1,104 @@
+import asyncio
+import asyncpg
+from typing import Optional, Dict, Any
+from urllib.parse import urlparse
+from ..utils.config import Config
+from ..utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+class PoolRegistry:
+    """Process-wide registry of asyncpg pools, one per database URL"""
+
+    _pools: Dict[str, asyncpg.Pool] = {}
+    _locks: Dict[str, asyncio.Lock] = {}
+
+    @classmethod
+    async def get_pool(cls, database_url: str, is_supabase: bool = False) -> asyncpg.Pool:
+        """Get the shared pool for a database URL, creating it on first use"""
+        pool = cls._pools.get(database_url)
+        if pool is not None:
+            return pool
+
+        lock = cls._locks.setdefault(database_url, asyncio.Lock())
+        async with lock:
+            # Another coroutine may have created the pool while we waited
+            pool = cls._pools.get(database_url)
+            if pool is None:
+                pool = await cls._create_pool(database_url, is_supabase)
+                cls._pools[database_url] = pool
+            return pool
+
+    @classmethod
+    async def _create_pool(cls, database_url: str, is_supabase: bool) -> asyncpg.Pool:
+        """Create a new connection pool sized from configuration"""
+        parsed_url = urlparse(database_url)
+
+        # Connection parameters
+        connection_kwargs = {
+            'host': parsed_url.hostname,
+            'port': parsed_url.port or 5432,
+            'user': parsed_url.username,
+            'password': parsed_url.password,
+            'database': parsed_url.path[1:] if parsed_url.path else 'postgres',
+            'min_size': Config.DB_POOL_MIN_SIZE,
+            'max_size': Config.DB_POOL_MAX_SIZE,
+            'max_inactive_connection_lifetime': Config.DB_POOL_MAX_INACTIVE_LIFETIME,
+            'command_timeout': Config.DB_COMMAND_TIMEOUT
+        }
+
+        # Supabase-specific SSL configuration
+        if is_supabase:
+            connection_kwargs.update({
+                'ssl': 'require',
+                'server_settings': {
+                    'application_name': 'digital_twin_bot'
+                }
+            })
+
+        pool = await asyncpg.create_pool(**connection_kwargs)
+
+        env_type = "Supabase" if is_supabase else "Local PostgreSQL"
+        logger.info(
+            f"{env_type} connection pool initialized "
+            f"(min_size={Config.DB_POOL_MIN_SIZE}, max_size={Config.DB_POOL_MAX_SIZE})"
+        )
+        return pool
+
+    @classmethod
+    def get_existing_pool(cls, database_url: str) -> Optional[asyncpg.Pool]:
+        """Get the shared pool for a database URL without creating it"""
+        return cls._pools.get(database_url)
+
+    @classmethod
+    def get_stats(cls) -> Dict[str, Dict[str, Any]]:
+        """Get size and idle counts for every registered pool"""
+        stats = {}
+        for database_url, pool in cls._pools.items():
+            parsed_url = urlparse(database_url)
+            key = f"{parsed_url.hostname}:{parsed_url.port or 5432}{parsed_url.path}"
+            stats[key] = {
+                'size': pool.get_size(),
+                'idle': pool.get_idle_size(),
+                'in_use': pool.get_size() - pool.get_idle_size(),
+                'min_size': pool.get_min_size(),
+                'max_size': pool.get_max_size()
+            }
+        return stats
+
+    @classmethod
+    async def close_pool(cls, database_url: str):
+        """Close and forget the shared pool for a database URL"""
+        pool = cls._pools.pop(database_url, None)
+        if pool is not None:
+            await pool.close()
+
+    @classmethod
+    async def close_all(cls):
+        """Close every registered pool (call once on shutdown)"""
+        for database_url in list(cls._pools.keys()):
+            try:
+                await cls.close_pool(database_url)
+            except Exception as e:
+                logger.error(f"Error closing connection pool: {e}")
+        logger.info("All database connection pools closed")
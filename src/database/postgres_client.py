@@ -1,9 +1,10 @@
 import asyncio
 import asyncpg
 import json
-from typing import Optional, List, Dict, Any
-from urllib.parse import urlparse
+from contextlib import asynccontextmanager
+from typing import Optional, List, Dict, Any, AsyncIterator, Callable
 from ..utils.config import Config
+from .pool_registry import PoolRegistry
 from ..utils.logger import setup_logger
 
 logger = setup_logger(__name__)
@@ -12,10 +13,14 @@ class PostgreSQLClient:
     """Unified PostgreSQL client for both local development and Supabase production"""
     
     def __init__(self):
-        self.pool: Optional[asyncpg.Pool] = None
         self.database_url = self._get_database_url()
         self._is_supabase = self._detect_supabase()
     
+    @property
+    def pool(self) -> Optional[asyncpg.Pool]:
+        """The process-wide pool for this database, None until initialized or after close_all()"""
+        return PoolRegistry.get_existing_pool(self.database_url)
+    
     def _get_database_url(self) -> str:
         """Get database URL based on environment"""
         if Config.DATABASE_URL:
@@ -42,44 +47,26 @@ class PostgreSQLClient:
         return 'supabase' in self.database_url.lower()
     
     async def initialize(self):
-        """Initialize connection pool"""
+        """Attach to the shared process-wide connection pool"""
         try:
-            parsed_url = urlparse(self.database_url)
-            
-            # Connection parameters
-            connection_kwargs = {
-                'host': parsed_url.hostname,
-                'port': parsed_url.port or 5432,
-                'user': parsed_url.username,
-                'password': parsed_url.password,
-                'database': parsed_url.path[1:] if parsed_url.path else 'postgres',
-                'min_size': 2,
-                'max_size': 10,
-                'command_timeout': 60
-            }
-            
-            # Supabase-specific SSL configuration
-            if self._is_supabase:
-                connection_kwargs.update({
-                    'ssl': 'require',
-                    'server_settings': {
-                        'application_name': 'digital_twin_bot'
-                    }
-                })
-            
-            self.pool = await asyncpg.create_pool(**connection_kwargs)
-            
-            env_type = "Supabase" if self._is_supabase else "Local PostgreSQL"
-            logger.info(f"{env_type} connection pool initialized")
-            
+            await PoolRegistry.get_pool(self.database_url, self._is_supabase)
         except Exception as e:
             logger.error(f"Failed to initialize PostgreSQL pool: {e}")
             raise
     
     async def close(self):
-        """Close connection pool"""
-        if self.pool:
-            await self.pool.close()
+        """Detach this client; the shared pool stays open for other clients until close_all()"""
+        logger.debug("PostgreSQL client closed, shared pool left open")
+    
+    @staticmethod
+    async def close_all():
+        """Close every shared connection pool in this process"""
+        await PoolRegistry.close_all()
+    
+    @staticmethod
+    def get_pool_stats() -> Dict[str, Dict[str, Any]]:
+        """Get connection pool statistics for this process"""
+        return PoolRegistry.get_stats()
     
     async def execute_query(self, query: str, *args) -> List[Dict[str, Any]]:
         """Execute SELECT query and return results"""
@@ -120,6 +107,41 @@ class PostgreSQLClient:
             logger.error(f"Fetch one failed: {e}")
             raise
     
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[asyncpg.Connection]:
+        """Hold one pooled connection inside a transaction; commits on exit, rolls back on error"""
+        if not self.pool:
+            await self.initialize()
+        
+        async with self.pool.acquire() as connection:
+            async with connection.transaction():
+                yield connection
+    
+    async def listen(self, channel: str, callback: Callable) -> asyncpg.Connection:
+        """Hold a dedicated pooled connection subscribed to a NOTIFY channel"""
+        if not self.pool:
+            await self.initialize()
+        
+        connection = await self.pool.acquire()
+        try:
+            await connection.add_listener(channel, callback)
+        except Exception as e:
+            await self.pool.release(connection)
+            logger.error(f"Failed to listen on channel {channel}: {e}")
+            raise
+        return connection
+    
+    async def unlisten(self, connection: asyncpg.Connection, channel: str, callback: Callable):
+        """Unsubscribe and return a listening connection to the pool"""
+        try:
+            if not connection.is_closed():
+                await connection.remove_listener(channel, callback)
+        except Exception as e:
+            logger.error(f"Failed to stop listening on channel {channel}: {e}")
+        finally:
+            if self.pool:
+                await self.pool.release(connection)
+    
     def test_connection(self) -> bool:
         """Test database connection"""
         try:
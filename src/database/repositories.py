@@ -1,8 +1,10 @@
 import json
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, AsyncIterator, Tuple
 from ..models import DigitalTwin, Story, StorySegment, UserMemory, ConversationSession
 from .postgres_client import PostgreSQLClient
+from .write_behind import WriteBehindBuffer
 from ..utils.config import Config
 from ..utils.logger import setup_logger
 
@@ -13,6 +15,7 @@ class BaseRepository:
     
     def __init__(self):
         self.db = PostgreSQLClient()
+        self.writes = WriteBehindBuffer.shared()
 
 class DigitalTwinRepository(BaseRepository):
     """Repository for digital twin operations"""
@@ -39,6 +42,86 @@ class DigitalTwinRepository(BaseRepository):
             logger.error(f"Error fetching twin {twin_id}: {e}")
             return None
 
+# Advance progress to the next segment and return it; with no next segment, complete the story
+# and clear it from the session. The current_segment recheck makes concurrent advances tell a segment once.
+STORY_ADVANCE = """
+    WITH progress AS (
+        SELECT current_segment FROM user_story_progress 
+        WHERE chat_id = $1 AND story_id = $2 AND twin_id = $3
+    ), next_segment AS (
+        SELECT s.id, s.story_id, s.segment_order, s.segment_type, s.content, 
+               s.transition_hook, s.interaction_points, s.created_at
+        FROM progress p 
+        JOIN story_segments s ON s.story_id = $2 AND s.segment_order = COALESCE(p.current_segment, 1) + 1
+    ), advanced AS (
+        UPDATE user_story_progress usp SET 
+            current_segment = n.segment_order,
+            segments_completed = CASE 
+                WHEN n.segment_order = ANY(COALESCE(usp.segments_completed, '{}')) THEN usp.segments_completed
+                ELSE array_append(COALESCE(usp.segments_completed, '{}'), n.segment_order)
+            END,
+            last_interaction = NOW()
+        FROM next_segment n
+        WHERE usp.chat_id = $1 AND usp.story_id = $2 AND usp.twin_id = $3 
+          AND COALESCE(usp.current_segment, 1) = n.segment_order - 1
+        RETURNING usp.current_segment
+    ), completed AS (
+        UPDATE user_story_progress 
+        SET completion_status = 'completed', last_interaction = NOW()
+        WHERE chat_id = $1 AND story_id = $2 AND twin_id = $3 
+          AND EXISTS (SELECT 1 FROM progress) AND NOT EXISTS (SELECT 1 FROM next_segment)
+        RETURNING story_id
+    ), cleared AS (
+        UPDATE conversation_sessions 
+        SET current_story_id = NULL, last_activity = NOW()
+        WHERE chat_id = $1 AND twin_id = $3 AND session_state = 'active' 
+          AND EXISTS (SELECT 1 FROM completed)
+    )
+    SELECT n.*, 
+           (SELECT current_segment FROM advanced) AS advanced_to, 
+           EXISTS (SELECT 1 FROM completed) AS completed
+    FROM progress p 
+    LEFT JOIN next_segment n ON TRUE
+"""
+
+def _advance_result(row: Optional[Dict[str, Any]]) -> Tuple[str, Optional[StorySegment]]:
+    """Turn a STORY_ADVANCE row into (status, segment): missing, completed, advanced or conflict"""
+    if row is None:
+        return 'missing', None
+    if row['completed']:
+        return 'completed', None
+    if row['advanced_to'] is None:
+        # Another turn advanced the same progress row first
+        return 'conflict', None
+    return 'advanced', StorySegment.from_dict(row)
+
+class StoryUnitOfWork:
+    """Story progress and session changes for one chat and twin, on one connection in one transaction"""
+    
+    def __init__(self, connection, chat_id: int, twin_id: str):
+        self.connection = connection
+        self.chat_id = chat_id
+        self.twin_id = twin_id
+    
+    async def start_story(self, story_id: str):
+        """Reset progress to the first segment and make it the session's current story"""
+        query = """
+            WITH progress AS (
+                INSERT INTO user_story_progress (chat_id, story_id, twin_id, current_segment, segments_completed, completion_status)
+                VALUES ($1, $2, $3, 1, ARRAY[1], 'in_progress')
+                ON CONFLICT (chat_id, story_id, twin_id) DO UPDATE SET
+                    current_segment = 1,
+                    segments_completed = ARRAY[1],
+                    completion_status = 'in_progress',
+                    last_interaction = NOW()
+                RETURNING story_id
+            )
+            UPDATE conversation_sessions 
+            SET current_story_id = (SELECT story_id FROM progress), last_activity = NOW()
+            WHERE chat_id = $1 AND twin_id = $3 AND session_state = 'active'
+        """
+        await self.connection.execute(query, self.chat_id, story_id, self.twin_id)
+
 class StoryRepository(BaseRepository):
     """Repository for story operations with twin-specific tracking"""
     
@@ -52,6 +135,42 @@ class StoryRepository(BaseRepository):
             logger.error(f"Error fetching stories for twin {twin_id}: {e}")
             return []
     
+    async def get_story_catalogue(
+        self, 
+        twin_ids: Optional[List[str]] = None, 
+        story_ids: Optional[List[str]] = None
+    ) -> Optional[List[Tuple[Story, List[StorySegment]]]]:
+        """Get stories with their ordered segments in one query; None on error so callers keep what they have"""
+        try:
+            query = """
+                SELECT s.*, COALESCE(
+                    json_agg(seg.* ORDER BY seg.segment_order) FILTER (WHERE seg.id IS NOT NULL), 
+                    '[]'
+                ) AS segments
+                FROM stories s
+                LEFT JOIN story_segments seg ON seg.story_id = s.story_id
+            """
+            args = []
+            if story_ids is not None:
+                query += " WHERE s.story_id = ANY($1::varchar[])"
+                args.append(story_ids)
+            elif twin_ids is not None:
+                query += " WHERE s.twin_id = ANY($1::varchar[])"
+                args.append(twin_ids)
+            query += " GROUP BY s.story_id ORDER BY s.twin_id, s.created_at"
+            
+            results = await self.db.execute_query(query, *args)
+            catalogue = []
+            for row in results:
+                segments = row.pop('segments')
+                if isinstance(segments, str):
+                    segments = json.loads(segments)
+                catalogue.append((Story.from_dict(row), [StorySegment.from_dict(seg) for seg in segments]))
+            return catalogue
+        except Exception as e:
+            logger.error(f"Error fetching story catalogue: {e}")
+            return None
+    
     async def get_story_by_id(self, story_id: str) -> Optional[Story]:
         """Get story by ID"""
         try:
@@ -103,6 +222,35 @@ class StoryRepository(BaseRepository):
             logger.error(f"Error getting story history for chat {chat_id}, twin {twin_id}: {e}")
             return []
     
+    @asynccontextmanager
+    async def unit_of_work(self, chat_id: int, twin_id: str) -> AsyncIterator[StoryUnitOfWork]:
+        """Run a story step's reads and writes atomically on a single connection"""
+        # Buffered session writes for this chat must land first or they'd overwrite this step
+        await self.writes.barrier(chat_id)
+        async with self.db.transaction() as connection:
+            yield StoryUnitOfWork(connection, chat_id, twin_id)
+    
+    async def get_untold_story_ids(self, chat_id: int, twin_id: str, days: int = None) -> Optional[List[str]]:
+        """Ids of stories this twin hasn't told the user recently, via an indexed anti-join; None on error"""
+        try:
+            days = days or Config.STORY_HISTORY_DAYS
+            cutoff_date = datetime.now() - timedelta(days=days)
+            
+            query = """
+                SELECT s.story_id FROM stories s 
+                WHERE s.twin_id = $1 
+                  AND NOT EXISTS (
+                      SELECT 1 FROM user_story_progress p 
+                      WHERE p.chat_id = $2 AND p.twin_id = $1 AND p.story_id = s.story_id 
+                        AND p.created_at >= $3
+                  )
+            """
+            results = await self.db.execute_query(query, twin_id, chat_id, cutoff_date)
+            return [row['story_id'] for row in results]
+        except Exception as e:
+            logger.error(f"Error getting untold stories for chat {chat_id}, twin {twin_id}: {e}")
+            return None
+    
     async def create_story_progress(self, chat_id: int, story_id: str, twin_id: str) -> bool:
         """Create story progress record for specific twin"""
         try:
@@ -134,46 +282,16 @@ class StoryRepository(BaseRepository):
             logger.error(f"Error getting story progress: {e}")
             return None
     
-    async def update_story_progress(self, chat_id: int, story_id: str, segment: int, twin_id: str) -> bool:
-        """Update story progress for specific twin"""
+    async def advance_story(self, chat_id: int, story_id: str, twin_id: str) -> Tuple[str, Optional[StorySegment]]:
+        """Advance to the next segment and return it, or complete the story, in one statement"""
         try:
-            # Get current progress
-            select_query = """
-                SELECT segments_completed FROM user_story_progress 
-                WHERE chat_id = $1 AND story_id = $2 AND twin_id = $3
-            """
-            result = await self.db.fetch_one(select_query, chat_id, story_id, twin_id)
-            
-            if result:
-                completed = result.get('segments_completed', [])
-                if segment not in completed:
-                    completed.append(segment)
-                
-                update_query = """
-                    UPDATE user_story_progress 
-                    SET current_segment = $1, segments_completed = $2, last_interaction = NOW()
-                    WHERE chat_id = $3 AND story_id = $4 AND twin_id = $5
-                """
-                await self.db.execute_command(update_query, segment, completed, chat_id, story_id, twin_id)
-            
-            return True
+            # Buffered session writes for this chat must land first or they'd overwrite a completion
+            await self.writes.barrier(chat_id)
+            row = await self.db.fetch_one(STORY_ADVANCE, chat_id, story_id, twin_id)
+            return _advance_result(row)
         except Exception as e:
-            logger.error(f"Error updating story progress: {e}")
-            return False
-    
-    async def complete_story(self, chat_id: int, story_id: str, twin_id: str) -> bool:
-        """Mark story as completed for specific twin"""
-        try:
-            query = """
-                UPDATE user_story_progress 
-                SET completion_status = 'completed' 
-                WHERE chat_id = $1 AND story_id = $2 AND twin_id = $3
-            """
-            await self.db.execute_command(query, chat_id, story_id, twin_id)
-            return True
-        except Exception as e:
-            logger.error(f"Error completing story: {e}")
-            return False
+            logger.error(f"Error advancing story {story_id}: {e}")
+            return 'error', None
 
 class UserMemoryRepository(BaseRepository):
     """Repository for user memory operations with twin-specific conversation tracking"""
@@ -181,7 +299,11 @@ class UserMemoryRepository(BaseRepository):
     async def get_or_create_user_memory(self, chat_id: int) -> UserMemory:
         """Get or create user memory"""
         try:
-            query = "SELECT * FROM user_memory WHERE chat_id = $1"
+            # Conversation history lives in conversation_turns; skip the legacy blob
+            query = """
+                SELECT chat_id, profile, shared_topics, emotional_reactions, last_interaction, created_at 
+                FROM user_memory WHERE chat_id = $1
+            """
             result = await self.db.fetch_one(query, chat_id)
             
             if result:
@@ -191,7 +313,7 @@ class UserMemoryRepository(BaseRepository):
                 insert_query = """
                     INSERT INTO user_memory (chat_id, profile, conversation_history, shared_topics, emotional_reactions)
                     VALUES ($1, $2, $3, $4, $5)
-                    RETURNING *
+                    RETURNING chat_id, profile, shared_topics, emotional_reactions, last_interaction, created_at
                 """
                 new_memory = await self.db.fetch_one(
                     insert_query, 
@@ -211,21 +333,7 @@ class UserMemoryRepository(BaseRepository):
         """Update user profile with extracted information (shared across twins)"""
         try:
             current_memory = await self.get_or_create_user_memory(chat_id)
-            profile = current_memory.profile.copy()
-            
-            # Merge extracted info intelligently
-            for key, value in extracted_info.items():
-                if key in ['interests', 'life_events'] and isinstance(value, list):
-                    # For lists, merge and deduplicate
-                    existing = set(profile.get(key, []))
-                    new_items = set(value)
-                    profile[key] = list(existing.union(new_items))
-                elif key == 'name' and not profile.get('name'):
-                    # Only update name if not already set
-                    profile[key] = value
-                elif key not in ['name']:
-                    # Update other fields normally
-                    profile[key] = value
+            profile = self.merge_profile(current_memory.profile, extracted_info)
             
             query = """
                 UPDATE user_memory 
@@ -242,30 +350,8 @@ class UserMemoryRepository(BaseRepository):
     async def add_conversation_entry(self, chat_id: int, user_message: str, extracted_info: Dict[str, Any] = None, twin_id: str = None) -> bool:
         """Add conversation entry with twin-specific tracking"""
         try:
-            current_memory = await self.get_or_create_user_memory(chat_id)
-            conversation_history = current_memory.conversation_history.copy()
-            
-            # Add new entry with twin context
-            conversation_history.append({
-                'timestamp': datetime.now().isoformat(),
-                'user_message': user_message,
-                'extracted_info': extracted_info or {},
-                'twin_id': twin_id  # Track which twin this conversation is with
-            })
-            
-            # Keep only recent history
-            max_history = Config.MAX_CONVERSATION_HISTORY
-            if len(conversation_history) > max_history:
-                conversation_history = conversation_history[-max_history:]
-            
-            query = """
-                UPDATE user_memory 
-                SET conversation_history = $1
-                WHERE chat_id = $2
-            """
-            await self.db.execute_command(query, json.dumps(conversation_history), chat_id)
-            
-            return True
+            turn_seq = await ConversationTurnRepository().append_turn(chat_id, twin_id, user_message, extracted_info)
+            return turn_seq is not None
         except Exception as e:
             logger.error(f"Error adding conversation entry: {e}")
             return False
@@ -273,28 +359,106 @@ class UserMemoryRepository(BaseRepository):
     async def add_twin_response(self, chat_id: int, twin_response: str, twin_id: str) -> bool:
         """Add twin response to last conversation entry for this twin"""
         try:
-            current_memory = await self.get_or_create_user_memory(chat_id)
-            conversation_history = current_memory.conversation_history.copy()
-            
-            # Find the last entry for this twin and add response
-            for i in reversed(range(len(conversation_history))):
-                if conversation_history[i].get('twin_id') == twin_id and not conversation_history[i].get('twin_response'):
-                    conversation_history[i]['twin_response'] = twin_response
-                    conversation_history[i]['response_timestamp'] = datetime.now().isoformat()
-                    break
-            
-            query = """
-                UPDATE user_memory 
-                SET conversation_history = $1
-                WHERE chat_id = $2
-            """
-            await self.db.execute_command(query, json.dumps(conversation_history), chat_id)
-            
-            return True
+            return await ConversationTurnRepository().set_twin_response(chat_id, twin_id, twin_response)
         except Exception as e:
             logger.error(f"Error adding twin response: {e}")
             return False
     
+    async def save_user_memory(self, memory: UserMemory, include_profile: bool = True) -> bool:
+        """Write the profile (optionally) and last interaction time back in a single statement"""
+        try:
+            if include_profile:
+                query = """
+                    UPDATE user_memory 
+                    SET profile = $1, last_interaction = NOW()
+                    WHERE chat_id = $2
+                """
+                await self.writes.write(
+                    query, json.dumps(memory.profile), memory.chat_id, 
+                    chat_id=memory.chat_id, key=('user_memory_profile', memory.chat_id)
+                )
+            else:
+                # Leave profile alone so background extraction updates aren't overwritten
+                query = """
+                    UPDATE user_memory 
+                    SET last_interaction = NOW()
+                    WHERE chat_id = $1
+                """
+                await self.writes.write(
+                    query, memory.chat_id, 
+                    chat_id=memory.chat_id, key=('user_memory_interaction', memory.chat_id)
+                )
+            return True
+        except Exception as e:
+            logger.error(f"Error saving user memory for chat {memory.chat_id}: {e}")
+            return False
+    
+    @staticmethod
+    def merge_profile(profile: Dict[str, Any], extracted_info: Dict[str, Any]) -> Dict[str, Any]:
+        """Merge extracted info into a copy of the profile"""
+        profile = profile.copy()
+        
+        for key, value in extracted_info.items():
+            if key in ['interests', 'life_events'] and isinstance(value, list):
+                # For lists, merge and deduplicate
+                existing = set(profile.get(key, []))
+                new_items = set(value)
+                profile[key] = list(existing.union(new_items))
+            elif key == 'name' and not profile.get('name'):
+                # Only update name if not already set
+                profile[key] = value
+            elif key not in ['name']:
+                # Update other fields normally
+                profile[key] = value
+        
+        return profile
+    
+    @staticmethod
+    def append_conversation_entry(
+        conversation_history: List[Dict[str, Any]], 
+        user_message: str, 
+        extracted_info: Dict[str, Any] = None, 
+        twin_id: str = None
+    ) -> List[Dict[str, Any]]:
+        """Return a copy of the history with a new user entry appended and trimmed"""
+        conversation_history = conversation_history.copy()
+        
+        # Add new entry with twin context
+        conversation_history.append({
+            'timestamp': datetime.now().isoformat(),
+            'user_message': user_message,
+            'extracted_info': extracted_info or {},
+            'twin_id': twin_id  # Track which twin this conversation is with
+        })
+        
+        # Keep only recent history (the snapshot holds a single twin's turns)
+        max_history = Config.get_history_limit(twin_id)
+        if len(conversation_history) > max_history:
+            conversation_history = conversation_history[-max_history:]
+        
+        return conversation_history
+    
+    @staticmethod
+    def attach_twin_response(
+        conversation_history: List[Dict[str, Any]], 
+        twin_response: str, 
+        twin_id: str
+    ) -> List[Dict[str, Any]]:
+        """Return a copy of the history with the response set on the last open entry for this twin"""
+        conversation_history = conversation_history.copy()
+        
+        # Find the last entry for this twin and add response
+        for i in reversed(range(len(conversation_history))):
+            if conversation_history[i].get('twin_id') == twin_id and not conversation_history[i].get('twin_response'):
+                conversation_history[i] = {
+                    **conversation_history[i],
+                    'twin_response': twin_response,
+                    'response_timestamp': datetime.now().isoformat()
+                }
+                break
+        
+        return conversation_history
+    
     async def get_current_story(self, chat_id: int, twin_id: str) -> Optional[str]:
         """Get current active story for specific twin"""
         try:
@@ -312,21 +476,8 @@ class UserMemoryRepository(BaseRepository):
     async def clear_twin_conversation_history(self, chat_id: int, twin_id: str) -> bool:
         """Clear conversation history for specific twin only"""
         try:
-            current_memory = await self.get_or_create_user_memory(chat_id)
-            conversation_history = current_memory.conversation_history.copy()
-            
             # Remove conversations with this specific twin
-            filtered_history = [
-                interaction for interaction in conversation_history
-                if interaction.get('twin_id') != twin_id
-            ]
-            
-            query = """
-                UPDATE user_memory 
-                SET conversation_history = $1
-                WHERE chat_id = $2
-            """
-            await self.db.execute_command(query, json.dumps(filtered_history), chat_id)
+            await ConversationTurnRepository().clear_turns(chat_id, twin_id)
             
             # Also clear any active story session for this twin
             await self.clear_twin_session(chat_id, twin_id)
@@ -350,6 +501,215 @@ class UserMemoryRepository(BaseRepository):
             logger.error(f"Error clearing twin session: {e}")
             return False
 
+class ConversationTurnRepository(BaseRepository):
+    """Repository for the append-only per-twin conversation turns"""
+    
+    async def append_turn(
+        self, 
+        chat_id: int, 
+        twin_id: str, 
+        user_message: str, 
+        extracted_info: Dict[str, Any] = None, 
+        twin_response: Optional[str] = None,
+        keep: Optional[int] = None
+    ) -> Optional[int]:
+        """Append a turn and drop turns older than the last `keep` in one statement; returns its turn_seq"""
+        try:
+            keep = Config.get_history_limit(twin_id) if keep is None else keep
+            query = """
+                WITH inserted AS (
+                    INSERT INTO conversation_turns 
+                        (chat_id, twin_id, turn_seq, user_message, extracted_info, twin_response, responded_at)
+                    SELECT $1, $2, COALESCE(MAX(turn_seq), 0) + 1, $3, $4, $5::text, 
+                           CASE WHEN $5::text IS NULL THEN NULL ELSE NOW() END
+                    FROM conversation_turns 
+                    WHERE chat_id = $1 AND twin_id = $2
+                    ON CONFLICT (chat_id, twin_id, turn_seq) DO NOTHING
+                    RETURNING turn_seq
+                ), trimmed AS (
+                    DELETE FROM conversation_turns ct USING inserted 
+                    WHERE ct.chat_id = $1 AND ct.twin_id = $2 
+                      AND $6::int > 0 AND ct.turn_seq <= inserted.turn_seq - $6::int
+                )
+                SELECT turn_seq FROM inserted
+            """
+            # A concurrent append can take the same turn_seq; retry with the next one
+            for _ in range(3):
+                result = await self.db.fetch_one(
+                    query, chat_id, twin_id, user_message, json.dumps(extracted_info or {}), twin_response, keep
+                )
+                if result:
+                    return result['turn_seq']
+            logger.error(f"Could not allocate turn_seq for chat {chat_id}, twin {twin_id}")
+            return None
+        except Exception as e:
+            logger.error(f"Error appending conversation turn: {e}")
+            return None
+    
+    async def queue_turn(
+        self, 
+        chat_id: int, 
+        twin_id: str, 
+        turn_seq: int, 
+        user_message: str, 
+        extracted_info: Dict[str, Any] = None, 
+        twin_response: Optional[str] = None, 
+        keep: Optional[int] = None
+    ) -> bool:
+        """Buffer a turn whose turn_seq the caller allocated, plus the trim of turns past the cap"""
+        try:
+            keep = Config.get_history_limit(twin_id) if keep is None else keep
+            query = """
+                INSERT INTO conversation_turns 
+                    (chat_id, twin_id, turn_seq, user_message, extracted_info, twin_response, responded_at)
+                VALUES ($1, $2, $3, $4, $5, $6::text, CASE WHEN $6::text IS NULL THEN NULL ELSE NOW() END)
+                ON CONFLICT (chat_id, twin_id, turn_seq) DO NOTHING
+            """
+            await self.writes.write(
+                query, chat_id, twin_id, turn_seq, user_message, json.dumps(extracted_info or {}), twin_response, 
+                chat_id=chat_id
+            )
+            if keep > 0 and turn_seq > keep:
+                trim_query = """
+                    DELETE FROM conversation_turns 
+                    WHERE chat_id = $1 AND twin_id = $2 AND turn_seq <= $3
+                """
+                await self.writes.write(
+                    trim_query, chat_id, twin_id, turn_seq - keep, 
+                    chat_id=chat_id, key=('conversation_turns_trim', chat_id, twin_id)
+                )
+            return True
+        except Exception as e:
+            logger.error(f"Error queueing conversation turn: {e}")
+            return False
+    
+    async def set_twin_response(self, chat_id: int, twin_id: str, twin_response: str, turn_seq: Optional[int] = None) -> bool:
+        """Set the reply on a turn, or on the latest unanswered turn when turn_seq is None"""
+        try:
+            if turn_seq is not None:
+                query = """
+                    UPDATE conversation_turns 
+                    SET twin_response = $1, responded_at = NOW()
+                    WHERE chat_id = $2 AND twin_id = $3 AND turn_seq = $4
+                """
+                await self.writes.write(
+                    query, twin_response, chat_id, twin_id, turn_seq, 
+                    chat_id=chat_id, key=('conversation_turns_response', chat_id, twin_id, turn_seq)
+                )
+            else:
+                query = """
+                    UPDATE conversation_turns 
+                    SET twin_response = $1, responded_at = NOW()
+                    WHERE chat_id = $2 AND twin_id = $3 AND turn_seq = (
+                        SELECT turn_seq FROM conversation_turns 
+                        WHERE chat_id = $2 AND twin_id = $3 AND twin_response IS NULL
+                        ORDER BY turn_seq DESC LIMIT 1
+                    )
+                """
+                await self.db.execute_command(query, twin_response, chat_id, twin_id)
+            return True
+        except Exception as e:
+            logger.error(f"Error setting twin response: {e}")
+            return False
+    
+    async def get_recent_turns(self, chat_id: int, twin_id: str, limit: int) -> List[Dict[str, Any]]:
+        """Get the last `limit` turns with this twin, oldest first, as history entries"""
+        try:
+            query = """
+                SELECT turn_seq, user_message, twin_response, created_at FROM conversation_turns 
+                WHERE chat_id = $1 AND twin_id = $2 
+                ORDER BY turn_seq DESC LIMIT $3
+            """
+            results = await self.db.execute_query(query, chat_id, twin_id, limit)
+            return [
+                {
+                    'turn_seq': row['turn_seq'],
+                    'timestamp': row['created_at'].isoformat() if row['created_at'] else None,
+                    'user_message': row['user_message'],
+                    'twin_response': row['twin_response'],
+                    'twin_id': twin_id
+                }
+                for row in reversed(results)
+            ]
+        except Exception as e:
+            logger.error(f"Error getting recent turns for chat {chat_id}, twin {twin_id}: {e}")
+            return []
+    
+    async def get_history_stats(self) -> Dict[str, Any]:
+        """Get per-twin turn counts and row sizes, plus the table's total size on disk"""
+        try:
+            query = """
+                SELECT twin_id, COUNT(*) AS turns, COUNT(DISTINCT chat_id) AS chats,
+                       AVG(pg_column_size(ct.*))::int AS avg_row_bytes, 
+                       MAX(pg_column_size(ct.*)) AS max_row_bytes
+                FROM conversation_turns ct 
+                GROUP BY twin_id
+            """
+            results = await self.db.execute_query(query)
+            size = await self.db.fetch_one("SELECT pg_total_relation_size('conversation_turns') AS total_bytes")
+            return {
+                'total_bytes': size['total_bytes'] if size else None,
+                'twins': {row['twin_id']: {k: v for k, v in row.items() if k != 'twin_id'} for row in results}
+            }
+        except Exception as e:
+            logger.error(f"Error getting conversation history stats: {e}")
+            return {}
+    
+    async def clear_turns(self, chat_id: int, twin_id: str) -> bool:
+        """Delete every turn with this twin"""
+        try:
+            # Buffered inserts for this chat would otherwise land after the delete
+            await self.writes.barrier(chat_id)
+            query = "DELETE FROM conversation_turns WHERE chat_id = $1 AND twin_id = $2"
+            await self.db.execute_command(query, chat_id, twin_id)
+            return True
+        except Exception as e:
+            logger.error(f"Error clearing conversation turns: {e}")
+            return False
+    
+    async def migrate_history(self, clear_history: bool = False) -> Optional[str]:
+        """Copy user_memory.conversation_history into conversation_turns (chats/twins with no turns yet)"""
+        try:
+            query = """
+                INSERT INTO conversation_turns 
+                    (chat_id, twin_id, turn_seq, user_message, twin_response, extracted_info, created_at, responded_at)
+                SELECT 
+                    um.chat_id,
+                    h.entry->>'twin_id',
+                    ROW_NUMBER() OVER (PARTITION BY um.chat_id, h.entry->>'twin_id' ORDER BY h.ordinal),
+                    h.entry->>'user_message',
+                    h.entry->>'twin_response',
+                    COALESCE(h.entry->'extracted_info', '{}'::jsonb),
+                    COALESCE((h.entry->>'timestamp')::timestamp, um.last_interaction),
+                    (h.entry->>'response_timestamp')::timestamp
+                FROM user_memory um
+                CROSS JOIN LATERAL jsonb_array_elements(
+                    CASE WHEN jsonb_typeof(um.conversation_history) = 'array' 
+                         THEN um.conversation_history ELSE '[]'::jsonb END
+                ) WITH ORDINALITY AS h(entry, ordinal)
+                WHERE h.entry->>'twin_id' IS NOT NULL
+                  AND EXISTS (SELECT 1 FROM digital_twins dt WHERE dt.twin_id = h.entry->>'twin_id')
+                  AND NOT EXISTS (
+                      SELECT 1 FROM conversation_turns ct 
+                      WHERE ct.chat_id = um.chat_id AND ct.twin_id = h.entry->>'twin_id'
+                  )
+            """
+            result = await self.db.execute_command(query)
+            if clear_history:
+                await self.db.execute_command(
+                    "UPDATE user_memory SET conversation_history = '[]' WHERE conversation_history <> '[]'"
+                )
+            return result
+        except Exception as e:
+            logger.error(f"Error migrating conversation history: {e}")
+            return None
+
+SESSION_STORY_UPDATE = """
+    UPDATE conversation_sessions 
+    SET current_story_id = $1, last_activity = NOW()
+    WHERE chat_id = $2 AND twin_id = $3 AND session_state = 'active'
+"""
+
 class ConversationRepository(BaseRepository):
     """Repository for conversation session operations with twin isolation"""
     
@@ -382,12 +742,10 @@ class ConversationRepository(BaseRepository):
     async def update_session_story(self, chat_id: int, story_id: str, twin_id: str) -> bool:
         """Update current story in session for specific twin"""
         try:
-            query = """
-                UPDATE conversation_sessions 
-                SET current_story_id = $1, last_activity = NOW()
-                WHERE chat_id = $2 AND twin_id = $3 AND session_state = 'active'
-            """
-            await self.db.execute_command(query, story_id, chat_id, twin_id)
+            await self.writes.write(
+                SESSION_STORY_UPDATE, story_id, chat_id, twin_id, 
+                chat_id=chat_id, key=('session_story', chat_id, twin_id)
+            )
             return True
         except Exception as e:
             logger.error(f"Error updating session story for twin {twin_id}: {e}")
@@ -395,14 +753,130 @@ class ConversationRepository(BaseRepository):
     
     async def clear_session_story(self, chat_id: int, twin_id: str) -> bool:
         """Clear current story from session for specific twin"""
+        try:
+            # Same statement as setting a story so the two coalesce in the write buffer
+            await self.writes.write(
+                SESSION_STORY_UPDATE, None, chat_id, twin_id, 
+                chat_id=chat_id, key=('session_story', chat_id, twin_id)
+            )
+            return True
+        except Exception as e:
+            logger.error(f"Error clearing session story for twin {twin_id}: {e}")
+            return False
+    
+    async def get_active_session(self, chat_id: int) -> Optional[ConversationSession]:
+        """Get the chat's most recently selected session, whichever twin it is with"""
         try:
             query = """
-                UPDATE conversation_sessions 
-                SET current_story_id = NULL, last_activity = NOW()
-                WHERE chat_id = $1 AND twin_id = $2 AND session_state = 'active'
+                SELECT * FROM conversation_sessions
+                WHERE chat_id = $1 AND session_state = 'active'
+                ORDER BY last_activity DESC LIMIT 1
             """
-            await self.db.execute_command(query, chat_id, twin_id)
+            result = await self.db.fetch_one(query, chat_id)
+            return ConversationSession.from_dict(result) if result else None
+        except Exception as e:
+            logger.error(f"Error getting active session for chat {chat_id}: {e}")
+            return None
+    
+    async def set_active_twin(self, chat_id: int, twin_id: str) -> bool:
+        """Make the twin's session the chat's most recent one, keeping other twins' sessions"""
+        try:
+            # Buffered session updates touch last_activity too; they must not land after this
+            await self.writes.barrier(chat_id)
+            async with self.db.transaction() as connection:
+                # Sessions reference user_memory, and a twin can be picked before the first message
+                await connection.execute(
+                    "INSERT INTO user_memory (chat_id) VALUES ($1) ON CONFLICT (chat_id) DO NOTHING", chat_id
+                )
+                touched = await connection.execute("""
+                    UPDATE conversation_sessions
+                    SET last_activity = NOW()
+                    WHERE chat_id = $1 AND twin_id = $2 AND session_state = 'active'
+                """, chat_id, twin_id)
+                if touched == 'UPDATE 0':
+                    await connection.execute("""
+                        INSERT INTO conversation_sessions (chat_id, twin_id, session_state, started_at, last_activity)
+                        VALUES ($1, $2, 'active', NOW(), NOW())
+                    """, chat_id, twin_id)
             return True
         except Exception as e:
-            logger.error(f"Error clearing session story for twin {twin_id}: {e}")
-            return False
\ No newline at end of file
+            logger.error(f"Error setting active twin {twin_id} for chat {chat_id}: {e}")
+            return False
+
+class JudgeDecisionRepository(BaseRepository):
+    """Repository for logged conversation judge decisions"""
+    
+    async def log_decision(
+        self, 
+        chat_id: Optional[int], 
+        twin_id: Optional[str], 
+        user_message: str, 
+        action: Dict[str, Any], 
+        source: str = 'llm'
+    ) -> bool:
+        """Store a judge decision for later classifier training"""
+        try:
+            query = """
+                INSERT INTO judge_decisions (chat_id, twin_id, user_message, action_type, confidence, source)
+                VALUES ($1, $2, $3, $4, $5, $6)
+            """
+            await self.db.execute_command(
+                query, chat_id, twin_id, user_message, 
+                action.get('type'), float(action.get('confidence', 0.0)), source
+            )
+            return True
+        except Exception as e:
+            logger.error(f"Error logging judge decision: {e}")
+            return False
+    
+    async def get_decisions(self, source: str = 'llm', limit: int = 50000) -> List[Dict[str, Any]]:
+        """Get the most recent logged decisions from a source"""
+        try:
+            query = """
+                SELECT user_message, action_type, confidence FROM judge_decisions 
+                WHERE source = $1 
+                ORDER BY created_at DESC LIMIT $2
+            """
+            return await self.db.execute_query(query, source, limit)
+        except Exception as e:
+            logger.error(f"Error fetching judge decisions: {e}")
+            return []
+
+class LLMCacheRepository(BaseRepository):
+    """Repository for the shared LLM response cache tier"""
+    
+    async def get_entry(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """Get an unexpired cached response"""
+        try:
+            query = """
+                SELECT content, latency FROM llm_cache 
+                WHERE cache_key = $1 AND expires_at > NOW()
+            """
+            return await self.db.fetch_one(query, cache_key)
+        except Exception as e:
+            logger.error(f"Error reading LLM cache entry: {e}")
+            return None
+    
+    async def put_entry(self, cache_key: str, call_type: str, content: str, latency: float, ttl_seconds: float) -> bool:
+        """Store or refresh a cached response"""
+        try:
+            query = """
+                INSERT INTO llm_cache (cache_key, call_type, content, latency, expires_at)
+                VALUES ($1, $2, $3, $4, NOW() + make_interval(secs => $5))
+                ON CONFLICT (cache_key) DO UPDATE 
+                SET content = EXCLUDED.content, latency = EXCLUDED.latency, expires_at = EXCLUDED.expires_at
+            """
+            await self.db.execute_command(query, cache_key, call_type, content, latency, float(ttl_seconds))
+            return True
+        except Exception as e:
+            logger.error(f"Error writing LLM cache entry: {e}")
+            return False
+    
+    async def purge_expired(self) -> bool:
+        """Delete expired cache entries"""
+        try:
+            await self.db.execute_command("DELETE FROM llm_cache WHERE expires_at <= NOW()")
+            return True
+        except Exception as e:
+            logger.error(f"Error purging LLM cache: {e}")
+            return False
@@ -0,0 +1,205 @@
+import asyncio
+import itertools
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Hashable, List, Optional, Any, Set, Tuple
+from .postgres_client import PostgreSQLClient
+from ..utils.config import Config
+from ..utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+@dataclass
+class PendingWrite:
+    """One buffered statement and its arguments"""
+    statement: str
+    args: Tuple[Any, ...]
+    chat_id: Optional[int] = None
+    attempts: int = 0
+
+class WriteBehindBuffer:
+    """Collects turn writes in memory and flushes them in ordered executemany batches"""
+    
+    _shared: Optional['WriteBehindBuffer'] = None
+    
+    def __init__(self, interval: float = None, max_pending: int = None, enabled: bool = None):
+        self.db = PostgreSQLClient()
+        self.enabled = Config.WRITE_BEHIND_ENABLED if enabled is None else enabled
+        self.interval = Config.WRITE_BEHIND_INTERVAL if interval is None else interval
+        self.max_pending = max_pending or Config.WRITE_BEHIND_MAX_PENDING
+        self.max_attempts = 3
+        self._pending: 'OrderedDict[Hashable, PendingWrite]' = OrderedDict()
+        self._flushing_chats: Set[int] = set()
+        self._keys = itertools.count()
+        self._flush_lock = asyncio.Lock()
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {
+            'enqueued': 0,
+            'coalesced': 0,
+            'flushes': 0,
+            'rows_written': 0,
+            'failed_flushes': 0,
+            'failed_writes': 0,
+            'dropped': 0,
+            'barrier_flushes': 0
+        }
+    
+    @classmethod
+    def shared(cls) -> 'WriteBehindBuffer':
+        """Process-wide buffer shared by every repository"""
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
+    
+    @property
+    def active(self) -> bool:
+        """Whether writes are currently being buffered"""
+        return self.enabled and self._task is not None
+    
+    def start(self):
+        """Start the periodic flusher (call at startup)"""
+        if self.enabled and self._task is None:
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Write-behind buffer flushing every {self.interval}s or {self.max_pending} writes")
+    
+    async def stop(self):
+        """Stop the flusher and write out everything still buffered"""
+        if self._task is not None:
+            task, self._task = self._task, None
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        await self.flush()
+        if self._pending:
+            logger.error(f"Write-behind buffer stopped with {len(self._pending)} unwritten statements")
+    
+    async def write(self, statement: str, *args, chat_id: Optional[int] = None, key: Hashable = None):
+        """Buffer a statement; a later write with the same key replaces it. Writes directly when inactive."""
+        if not self.active:
+            await self.db.execute_command(statement, *args)
+            return
+        
+        self.stats['enqueued'] += 1
+        if key is None:
+            key = next(self._keys)
+        elif key in self._pending:
+            # Re-queue at the end so it still runs after everything enqueued before it
+            del self._pending[key]
+            self.stats['coalesced'] += 1
+        self._pending[key] = PendingWrite(statement, args, chat_id)
+        
+        if len(self._pending) >= self.max_pending:
+            self._wake.set()
+    
+    def has_pending(self, chat_id: int) -> bool:
+        """Whether writes for this chat are buffered or being flushed"""
+        return chat_id in self._flushing_chats or any(
+            write.chat_id == chat_id for write in self._pending.values()
+        )
+    
+    async def barrier(self, chat_id: int):
+        """Make this chat's buffered writes durable before reading its rows back"""
+        if self.has_pending(chat_id):
+            self.stats['barrier_flushes'] += 1
+            await self.flush()
+    
+    async def _run(self):
+        """Flush on the interval, or sooner when the size threshold is hit"""
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+    
+    @staticmethod
+    def _batches(writes: List[PendingWrite]) -> List[Tuple[str, List[Tuple[Any, ...]]]]:
+        """Group consecutive writes of the same statement, keeping overall order"""
+        batches: List[Tuple[str, List[Tuple[Any, ...]]]] = []
+        for write in writes:
+            if batches and batches[-1][0] == write.statement:
+                batches[-1][1].append(write.args)
+            else:
+                batches.append((write.statement, [write.args]))
+        return batches
+    
+    @staticmethod
+    def _split(writes: List[Tuple[Hashable, PendingWrite]]) -> List[List[Tuple[Hashable, PendingWrite]]]:
+        """Split a failed group per chat, or per statement once it holds a single chat"""
+        chats: 'OrderedDict[Any, List[Tuple[Hashable, PendingWrite]]]' = OrderedDict()
+        for key, write in writes:
+            # Writes without a chat are independent of each other
+            chat = write.chat_id if write.chat_id is not None else ('unscoped', key)
+            chats.setdefault(chat, []).append((key, write))
+        if len(chats) > 1:
+            return list(chats.values())
+        return [[item] for item in writes]
+    
+    async def _execute(self, connection, writes: List[Tuple[Hashable, PendingWrite]]) -> List[Tuple[Hashable, PendingWrite]]:
+        """Run writes under a savepoint; on failure narrow down to the failing writes and return them"""
+        try:
+            async with connection.transaction():
+                for statement, rows in self._batches([write for _, write in writes]):
+                    await connection.executemany(statement, rows)
+            return []
+        except Exception as e:
+            if len(writes) == 1:
+                write = writes[0][1]
+                logger.error(f"Write-behind statement failed for chat {write.chat_id}: {e}")
+                return writes
+        
+        failed = []
+        for group in self._split(writes):
+            failed.extend(await self._execute(connection, group))
+        return failed
+    
+    async def flush(self):
+        """Write everything buffered in one transaction; a failing write only rolls back its own savepoint"""
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, OrderedDict()
+            writes = list(pending.items())
+            self._flushing_chats = {write.chat_id for _, write in writes if write.chat_id is not None}
+            
+            try:
+                if not self.db.pool:
+                    await self.db.initialize()
+                async with self.db.pool.acquire() as connection:
+                    async with connection.transaction():
+                        failed = await self._execute(connection, writes)
+                self.stats['flushes'] += 1
+                self.stats['rows_written'] += len(writes) - len(failed)
+                if failed:
+                    self.stats['failed_writes'] += len(failed)
+                    self._requeue(OrderedDict(failed))
+            except Exception as e:
+                self.stats['failed_flushes'] += 1
+                logger.error(f"Write-behind flush of {len(writes)} statements failed: {e}")
+                self._requeue(pending)
+            finally:
+                self._flushing_chats = set()
+    
+    def _requeue(self, failed: 'OrderedDict[Hashable, PendingWrite]'):
+        """Put failed writes back in front of newer ones, unless a newer write replaced them"""
+        requeued: 'OrderedDict[Hashable, PendingWrite]' = OrderedDict()
+        for key, write in failed.items():
+            if key in self._pending:
+                continue
+            write.attempts += 1
+            if write.attempts >= self.max_attempts:
+                self.stats['dropped'] += 1
+                logger.error(f"Dropping write after {write.attempts} attempts: {' '.join(write.statement.split()[:3])}")
+                continue
+            requeued[key] = write
+        requeued.update(self._pending)
+        self._pending = requeued
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get buffer depth, batching and coalescing counters"""
+        stats = dict(self.stats)
+        stats['pending'] = len(self._pending)
+        stats['active'] = self.active
+        return stats
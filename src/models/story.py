@@ -1,6 +1,16 @@
+import json
 from dataclasses import dataclass
 from typing import Dict, List, Optional, Any
 
+def _json_list(value: Any) -> List[Any]:
+    """JSONB list columns arrive as JSON text since no codec is registered on the pool"""
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return []
+    return value if isinstance(value, list) else []
+
 @dataclass
 class Story:
     """Story model"""
@@ -32,7 +42,7 @@ class Story:
             themes=data.get('themes', []),
             emotional_tone=data.get('emotional_tone', 'neutral'),
             adaptability_level=data.get('adaptability_level', 0.5),
-            key_facts=data.get('key_facts', []),
+            key_facts=_json_list(data.get('key_facts')),
             conversation_triggers=data.get('conversation_triggers', []),
             created_at=data.get('created_at')
         )
@@ -63,6 +73,6 @@ class StorySegment:
             segment_type=data['segment_type'],
             content=data['content'],
             transition_hook=data.get('transition_hook'),
-            interaction_points=data.get('interaction_points', []),
+            interaction_points=_json_list(data.get('interaction_points')),
             created_at=data.get('created_at')
         )
\ No newline at end of file
@@ -1,4 +1,5 @@
 import os
+import json
 from typing import Optional
 from dotenv import load_dotenv
 
@@ -12,6 +13,7 @@ class Config:
     
     # Telegram
     TELEGRAM_BOT_TOKEN: str = os.getenv("TELEGRAM_BOT_TOKEN", "")
+    DEFAULT_TWIN_ID: str = os.getenv("DEFAULT_TWIN_ID", "")
     
     # Database Configuration - Two ways to connect to PostgreSQL:
     # 1. Direct PostgreSQL URL (local development or custom)
@@ -21,16 +23,138 @@ class Config:
     SUPABASE_URL: str = os.getenv("SUPABASE_URL", "")
     SUPABASE_DB_PASSWORD: str = os.getenv("SUPABASE_DB_PASSWORD", "")
     
+    # Connection pool (one shared pool per process)
+    DB_POOL_MIN_SIZE: int = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+    DB_POOL_MAX_SIZE: int = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+    DB_POOL_MAX_INACTIVE_LIFETIME: float = float(os.getenv("DB_POOL_MAX_INACTIVE_LIFETIME", "300"))
+    DB_COMMAND_TIMEOUT: float = float(os.getenv("DB_COMMAND_TIMEOUT", "60"))
+    
     # OpenAI
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
     OPENAI_MODEL: str = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
+    OPENAI_EMBEDDING_MODEL: str = os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-3-small")
+    
+    # LLM client - one shared keep-alive connection pool per process
+    LLM_MAX_CONCURRENCY: int = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+    LLM_TIMEOUT: float = float(os.getenv("LLM_TIMEOUT", "30"))
+    LLM_CONNECT_TIMEOUT: float = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+    LLM_KEEPALIVE_EXPIRY: float = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))
+    
+    # LLM scheduler - provider rate limits (0 disables) and per-class concurrency caps
+    LLM_RPM_LIMIT: int = int(os.getenv("LLM_RPM_LIMIT", "3500"))
+    LLM_TPM_LIMIT: int = int(os.getenv("LLM_TPM_LIMIT", "90000"))
+    LLM_CONCURRENCY_REPLY: int = int(os.getenv("LLM_CONCURRENCY_REPLY", "16"))
+    LLM_CONCURRENCY_JUDGE: int = int(os.getenv("LLM_CONCURRENCY_JUDGE", "8"))
+    LLM_CONCURRENCY_SCORING: int = int(os.getenv("LLM_CONCURRENCY_SCORING", "4"))
+    LLM_CONCURRENCY_EXTRACTION: int = int(os.getenv("LLM_CONCURRENCY_EXTRACTION", "2"))
+    
+    # LLM resilience - retries, latency hedging for replies, circuit breaker
+    LLM_MAX_RETRIES: int = int(os.getenv("LLM_MAX_RETRIES", "3"))
+    LLM_BACKOFF_BASE: float = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+    LLM_BACKOFF_MAX: float = float(os.getenv("LLM_BACKOFF_MAX", "8"))
+    LLM_HEDGING_ENABLED: bool = os.getenv("LLM_HEDGING_ENABLED", "false").lower() == "true"
+    LLM_HEDGE_MIN_SAMPLES: int = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "50"))
+    LLM_BREAKER_FAILURES: int = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+    LLM_BREAKER_RESET_SECONDS: float = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+    
+    # LLM response cache - comma-separated call types to cache; empty disables it
+    LLM_CACHE_CALL_TYPES: list = [
+        call_type.strip() for call_type in 
+        os.getenv("LLM_CACHE_CALL_TYPES", "story_relevance,story_scoring,extraction,judge").split(",") 
+        if call_type.strip()
+    ]
+    LLM_CACHE_MAX_ENTRIES: int = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000"))
+    LLM_CACHE_TTL_SECONDS: float = float(os.getenv("LLM_CACHE_TTL_SECONDS", "86400"))
+    LLM_CACHE_SHARED_TIER: bool = os.getenv("LLM_CACHE_SHARED_TIER", "false").lower() == "true"
+    # Seconds between deletes of expired shared-tier rows
+    LLM_CACHE_PURGE_INTERVAL: float = float(os.getenv("LLM_CACHE_PURGE_INTERVAL", "3600"))
     
     # Logging
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
     
+    # User info extraction - "background" runs it off the reply path, "inline" awaits it per message
+    EXTRACTION_MODE: str = os.getenv("EXTRACTION_MODE", "background").lower()
+    EXTRACTION_WORKERS: int = int(os.getenv("EXTRACTION_WORKERS", "2"))
+    EXTRACTION_MAX_PENDING: int = int(os.getenv("EXTRACTION_MAX_PENDING", "500"))
+    EXTRACTION_BATCH_WINDOW: float = float(os.getenv("EXTRACTION_BATCH_WINDOW", "2.0"))
+    EXTRACTION_MAX_BATCH: int = int(os.getenv("EXTRACTION_MAX_BATCH", "5"))
+    EXTRACTION_DRAIN_TIMEOUT: float = float(os.getenv("EXTRACTION_DRAIN_TIMEOUT", "10"))
+    
+    # Local intent classifier in front of the LLM judge
+    INTENT_CLASSIFIER_ENABLED: bool = os.getenv("INTENT_CLASSIFIER_ENABLED", "true").lower() == "true"
+    INTENT_MODEL_PATH: str = os.getenv("INTENT_MODEL_PATH", "models/intent_classifier.joblib")
+    INTENT_CONFIDENCE_THRESHOLD: float = float(os.getenv("INTENT_CONFIDENCE_THRESHOLD", "0.85"))
+    # Fraction of confident local decisions still sent to the judge to measure disagreement
+    INTENT_SHADOW_RATE: float = float(os.getenv("INTENT_SHADOW_RATE", "0.05"))
+    
+    # Response generation - "pipeline" (judge, then generate) or "combined" (one structured call)
+    RESPONSE_MODE: str = os.getenv("RESPONSE_MODE", "pipeline").lower()
+    # Per-twin overrides as JSON, e.g. {"alice_chen": "combined"}
+    RESPONSE_MODE_OVERRIDES: dict = json.loads(os.getenv("RESPONSE_MODE_OVERRIDES", "{}") or "{}")
+    # Per-twin turn pipeline changes as JSON, e.g. {"alice_chen": {"disabled": ["extract"], "variants": {"respond": "combined"}}}
+    TURN_STAGE_OVERRIDES: dict = json.loads(os.getenv("TURN_STAGE_OVERRIDES", "{}") or "{}")
+    
+    # Streaming replies - edit the Telegram message at most once per interval (seconds)
+    STREAMING_ENABLED: bool = os.getenv("STREAMING_ENABLED", "true").lower() == "true"
+    STREAM_EDIT_INTERVAL: float = float(os.getenv("STREAM_EDIT_INTERVAL", "1.0"))
+    
+    # Per-chat mailbox - messages arriving within the debounce window are merged into one turn
+    CHAT_DEBOUNCE_SECONDS: float = float(os.getenv("CHAT_DEBOUNCE_SECONDS", "1.5"))
+    CHAT_DEBOUNCE_MAX_SECONDS: float = float(os.getenv("CHAT_DEBOUNCE_MAX_SECONDS", "4.0"))
+    # Cancel a generation the user hasn't seen yet when new messages arrive
+    CHAT_SUPERSEDE_ENABLED: bool = os.getenv("CHAT_SUPERSEDE_ENABLED", "true").lower() == "true"
+    
+    # Twin registry - full reload interval in case a change notification is missed
+    TWIN_REGISTRY_TTL: float = float(os.getenv("TWIN_REGISTRY_TTL", "300"))
+    
+    # Story catalogue - full reload interval in case a change notification is missed
+    STORY_CATALOGUE_TTL: float = float(os.getenv("STORY_CATALOGUE_TTL", "600"))
+    # Change notifications arriving within this window are applied as one refresh
+    STORY_REFRESH_DEBOUNCE: float = float(os.getenv("STORY_REFRESH_DEBOUNCE", "0.5"))
+    
+    # Semantic response cache - comma-separated twin ids to enable it for ("*" for all)
+    RESPONSE_CACHE_TWINS: list = [
+        twin_id.strip() for twin_id in os.getenv("RESPONSE_CACHE_TWINS", "").split(",") if twin_id.strip()
+    ]
+    RESPONSE_CACHE_EMBEDDER: str = os.getenv("RESPONSE_CACHE_EMBEDDER", "hashing").lower()
+    RESPONSE_CACHE_THRESHOLD: float = float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.85"))
+    RESPONSE_CACHE_MAX_ENTRIES: int = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "200"))
+    RESPONSE_CACHE_VARIANTS: int = int(os.getenv("RESPONSE_CACHE_VARIANTS", "3"))
+    RESPONSE_CACHE_MIN_WORDS: int = int(os.getenv("RESPONSE_CACHE_MIN_WORDS", "3"))
+    RESPONSE_CACHE_MAX_WORDS: int = int(os.getenv("RESPONSE_CACHE_MAX_WORDS", "12"))
+    
     # Story settings
     STORY_HISTORY_DAYS: int = int(os.getenv("STORY_HISTORY_DAYS", "7"))
+    # Turns kept per chat and twin; overrides are a JSON map of twin_id -> limit
     MAX_CONVERSATION_HISTORY: int = int(os.getenv("MAX_CONVERSATION_HISTORY", "20"))
+    CONVERSATION_HISTORY_LIMITS: dict = json.loads(os.getenv("CONVERSATION_HISTORY_LIMITS", "{}") or "{}")
+    # Chat/twin history rings kept in memory
+    CONVERSATION_HISTORY_CACHE_SIZE: int = int(os.getenv("CONVERSATION_HISTORY_CACHE_SIZE", "5000"))
+    
+    # Write-behind buffer for turn writes - flushed every interval (seconds) or at the size threshold
+    WRITE_BEHIND_ENABLED: bool = os.getenv("WRITE_BEHIND_ENABLED", "true").lower() == "true"
+    WRITE_BEHIND_INTERVAL: float = float(os.getenv("WRITE_BEHIND_INTERVAL", "0.5"))
+    WRITE_BEHIND_MAX_PENDING: int = int(os.getenv("WRITE_BEHIND_MAX_PENDING", "200"))
+    
+    # Apply pending schema migrations at startup, then warn about hot queries that need a sequential scan
+    MIGRATE_ON_STARTUP: bool = os.getenv("MIGRATE_ON_STARTUP", "true").lower() == "true"
+    QUERY_PLAN_CHECK: bool = os.getenv("QUERY_PLAN_CHECK", "true").lower() == "true"
+    # Turns read from conversation_turns per reply
+    CONVERSATION_CONTEXT_TURNS: int = int(os.getenv("CONVERSATION_CONTEXT_TURNS", "6"))
+    # "batch" scores all candidate stories in one LLM call, "sequential" scores one at a time
+    STORY_SCORING_MODE: str = os.getenv("STORY_SCORING_MODE", "batch").lower()
+    
+    # "llm" scores shortlisted stories with the LLM, "lexical" picks the best BM25 match (no LLM calls)
+    STORY_SELECTION_MODE: str = os.getenv("STORY_SELECTION_MODE", "llm").lower()
+    STORY_LEXICAL_TOP_K: int = int(os.getenv("STORY_LEXICAL_TOP_K", "10"))
+    
+    # Story retrieval - embedding shortlist in front of the LLM scorer
+    # STORY_EMBEDDER: "none" (disabled), "hashing" (offline) or "openai"
+    STORY_EMBEDDER: str = os.getenv("STORY_EMBEDDER", "hashing").lower()
+    STORY_RETRIEVAL_TOP_K: int = int(os.getenv("STORY_RETRIEVAL_TOP_K", "5"))
+    # Skip the LLM scorer when the best story leads the runner-up by this much
+    STORY_RETRIEVAL_MARGIN: float = float(os.getenv("STORY_RETRIEVAL_MARGIN", "0.15"))
+    STORY_RETRIEVAL_MIN_SIMILARITY: float = float(os.getenv("STORY_RETRIEVAL_MIN_SIMILARITY", "0.2"))
     
     @classmethod
     def validate(cls) -> bool:
@@ -46,6 +170,25 @@ class Config:
         
         return all(required)
     
+    @classmethod
+    def get_response_mode(cls, twin_id: str) -> str:
+        """Get the response generation mode for a twin"""
+        return str(cls.RESPONSE_MODE_OVERRIDES.get(twin_id, cls.RESPONSE_MODE)).lower()
+    
+    @classmethod
+    def get_stage_overrides(cls, twin_id: str) -> dict:
+        """Get the turn pipeline stages disabled and variants chosen for a twin"""
+        overrides = cls.TURN_STAGE_OVERRIDES.get(twin_id, {})
+        return {
+            'disabled': list(overrides.get('disabled', [])),
+            'variants': dict(overrides.get('variants', {}))
+        }
+    
+    @classmethod
+    def get_history_limit(cls, twin_id: str) -> int:
+        """Get how many conversation turns are kept per chat for a twin"""
+        return int(cls.CONVERSATION_HISTORY_LIMITS.get(twin_id, cls.MAX_CONVERSATION_HISTORY))
+    
     @classmethod
     def is_development(cls) -> bool:
         """Check if running in development mode"""
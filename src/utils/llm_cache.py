@@ -0,0 +1,136 @@
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Any, Tuple
+from .config import Config
+from .logger import setup_logger
+
+logger = setup_logger(__name__)
+
+class LLMCache:
+    """Content-addressed cache for deterministic LLM calls: in-process LRU plus optional Postgres tier"""
+    
+    _shared: Optional['LLMCache'] = None
+    
+    def __init__(
+        self,
+        call_types: List[str] = None,
+        max_entries: int = None,
+        ttl_seconds: float = None,
+        shared_tier: bool = None
+    ):
+        self.call_types = set(Config.LLM_CACHE_CALL_TYPES if call_types is None else call_types)
+        self.max_entries = max_entries or Config.LLM_CACHE_MAX_ENTRIES
+        self.ttl_seconds = ttl_seconds or Config.LLM_CACHE_TTL_SECONDS
+        self.entries: 'OrderedDict[str, Tuple[str, float, float]]' = OrderedDict()
+        self.repository = None
+        if Config.LLM_CACHE_SHARED_TIER if shared_tier is None else shared_tier:
+            from ..database.repositories import LLMCacheRepository
+            self.repository = LLMCacheRepository()
+        self.purge_interval = Config.LLM_CACHE_PURGE_INTERVAL
+        self._purge_task: Optional[asyncio.Task] = None
+        self.stats: Dict[str, Dict[str, float]] = {}
+    
+    @classmethod
+    def shared(cls) -> 'LLMCache':
+        """Process-wide cache shared by every LLMClient"""
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
+    
+    async def start(self):
+        """Purge expired shared-tier rows now and then periodically (call at startup)"""
+        if self.repository and self._purge_task is None:
+            await self.repository.purge_expired()
+            self._purge_task = asyncio.create_task(self._purge_periodically())
+    
+    async def stop(self):
+        """Stop the periodic purge"""
+        if self._purge_task is not None:
+            task, self._purge_task = self._purge_task, None
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+    
+    async def _purge_periodically(self):
+        """Delete expired rows from the UNLOGGED llm_cache table every purge interval"""
+        while True:
+            await asyncio.sleep(self.purge_interval)
+            await self.repository.purge_expired()
+    
+    def enabled_for(self, call_type: Optional[str]) -> bool:
+        """Whether responses of this call type may be cached"""
+        return bool(call_type) and call_type in self.call_types
+    
+    @staticmethod
+    def make_key(
+        model: str,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: Optional[int],
+        json_response: bool
+    ) -> str:
+        """Hash everything that determines the response"""
+        payload = json.dumps(
+            [model, messages, temperature, max_tokens, json_response],
+            sort_keys=True, ensure_ascii=False, separators=(',', ':')
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    async def get(self, call_type: str, key: str) -> Optional[str]:
+        """Look up a response, local tier first, then the shared tier"""
+        stats = self._stats(call_type)
+        entry = self.entries.get(key)
+        if entry is not None:
+            content, latency, expires_at = entry
+            if expires_at > time.monotonic():
+                self.entries.move_to_end(key)
+                self._record_hit(stats, latency, 'local_hits')
+                return content
+            del self.entries[key]
+        
+        if self.repository:
+            row = await self.repository.get_entry(key)
+            if row:
+                latency = row.get('latency') or 0.0
+                self._store_local(key, row['content'], latency)
+                self._record_hit(stats, latency, 'shared_hits')
+                return row['content']
+        
+        stats['misses'] += 1
+        return None
+    
+    async def set(self, call_type: str, key: str, content: str, latency: float):
+        """Store a successful response in both tiers"""
+        self._store_local(key, content, latency)
+        if self.repository:
+            await self.repository.put_entry(key, call_type, content, latency, self.ttl_seconds)
+    
+    def _store_local(self, key: str, content: str, latency: float):
+        """Insert into the LRU, evicting the least recently used entries past the size limit"""
+        self.entries[key] = (content, latency, time.monotonic() + self.ttl_seconds)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+    
+    def _stats(self, call_type: str) -> Dict[str, float]:
+        """Counters for one call type"""
+        if call_type not in self.stats:
+            self.stats[call_type] = {'local_hits': 0, 'shared_hits': 0, 'misses': 0, 'latency_saved_seconds': 0.0}
+        return self.stats[call_type]
+    
+    @staticmethod
+    def _record_hit(stats: Dict[str, float], latency: float, tier: str):
+        """Count a hit and the provider latency it avoided"""
+        stats[tier] += 1
+        stats['latency_saved_seconds'] += latency
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit rate and latency saved per call type"""
+        call_types = {}
+        for call_type, stats in self.stats.items():
+            hits = stats['local_hits'] + stats['shared_hits']
+            lookups = hits + stats['misses']
+            call_types[call_type] = dict(stats, hit_rate=hits / lookups if lookups else 0.0)
+        return {'entries': len(self.entries), 'call_types': call_types}
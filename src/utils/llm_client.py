@@ -1,66 +1,296 @@
 import json
-import asyncio
-from typing import Dict, List, Optional, Any
-import openai
+import time
+from contextlib import AsyncExitStack
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Any, AsyncIterator, Awaitable, Callable, Tuple
+import httpx
+from openai import AsyncOpenAI
 from .config import Config
+from .llm_cache import LLMCache
+from .llm_resilience import LLMResilience, LLMUnavailableError
+from .llm_scheduler import LLMScheduler, Priority
 from .logger import setup_logger
 
 logger = setup_logger(__name__)
 
+@dataclass
+class LLMResponse:
+    """Chat completion content with token usage"""
+    content: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    total_tokens: int = 0
+    latency: float = 0.0
+
 class LLMClient:
-    """Wrapper for OpenAI API calls"""
+    """Wrapper for OpenAI API calls over one process-wide pooled async client"""
+    
+    _client: Optional[AsyncOpenAI] = None
     
-    def __init__(self):
-        openai.api_key = Config.OPENAI_API_KEY
+    def __init__(self, priority: Priority = Priority.REPLY):
         self.model = Config.OPENAI_MODEL
+        self.priority = priority
+        self.scheduler = LLMScheduler.shared()
+        self.resilience = LLMResilience.shared()
+        self.cache = LLMCache.shared()
+    
+    @classmethod
+    def get_client(cls) -> AsyncOpenAI:
+        """Get the shared async client, creating its keep-alive connection pool on first use"""
+        if cls._client is None:
+            http_client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=Config.LLM_MAX_CONCURRENCY,
+                    max_keepalive_connections=Config.LLM_MAX_CONCURRENCY,
+                    keepalive_expiry=Config.LLM_KEEPALIVE_EXPIRY
+                ),
+                timeout=httpx.Timeout(Config.LLM_TIMEOUT, connect=Config.LLM_CONNECT_TIMEOUT)
+            )
+            # Retries are handled by LLMResilience so backoff and the breaker see every failure
+            cls._client = AsyncOpenAI(
+                api_key=Config.OPENAI_API_KEY,
+                http_client=http_client,
+                max_retries=0
+            )
+            logger.info(f"OpenAI client initialized (max {Config.LLM_MAX_CONCURRENCY} concurrent requests)")
+        return cls._client
+    
+    @classmethod
+    async def close(cls):
+        """Close the shared client and its connection pool"""
+        if cls._client is not None:
+            await cls._client.close()
+            cls._client = None
+    
+    @staticmethod
+    def is_available() -> bool:
+        """False while the circuit breaker would turn calls away and callers should use local fallbacks"""
+        return LLMResilience.shared().breaker.can_request()
+    
+    @staticmethod
+    def estimate_tokens(messages: List[Dict[str, str]], max_tokens: Optional[int] = None) -> int:
+        """Rough token estimate (~4 chars per token) used to charge the rate limiter up front"""
+        prompt_chars = sum(len(message.get("content") or "") for message in messages)
+        return prompt_chars // 4 + (max_tokens or 256)
+    
+    async def create_completion(
+        self, 
+        messages: List[Dict[str, str]], 
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+        timeout: Optional[float] = None
+    ) -> LLMResponse:
+        """Make a chat completion request and return content with usage; raises on failure"""
+        kwargs = {
+            "model": self.model,
+            "messages": messages,
+            "temperature": temperature,
+            "timeout": timeout or Config.LLM_TIMEOUT
+        }
+        
+        if max_tokens:
+            kwargs["max_tokens"] = max_tokens
+        
+        started = time.perf_counter()
+        estimated = self.estimate_tokens(messages, max_tokens)
+        
+        async def request():
+            async with self.scheduler.slot(self.priority, estimated):
+                return await self.get_client().chat.completions.create(**kwargs)
+        
+        # Only user-facing replies are worth the cost of a hedged duplicate
+        response = await self.resilience.call(
+            request, key=self.priority.name.lower(), hedge=self.priority == Priority.REPLY
+        )
+        
+        usage = response.usage
+        self.scheduler.record_usage(estimated, usage.total_tokens if usage else 0)
+        return LLMResponse(
+            content=response.choices[0].message.content or "",
+            prompt_tokens=usage.prompt_tokens if usage else 0,
+            completion_tokens=usage.completion_tokens if usage else 0,
+            total_tokens=usage.total_tokens if usage else 0,
+            latency=time.perf_counter() - started
+        )
     
     async def chat_completion(
         self, 
         messages: List[Dict[str, str]], 
         temperature: float = 0.7,
         max_tokens: Optional[int] = None,
-        json_response: bool = False
+        json_response: bool = False,
+        timeout: Optional[float] = None,
+        cache_as: Optional[str] = None
     ) -> str:
-        """Make chat completion request"""
+        """Chat completion; cache_as names the cache call type. Text calls raise on failure, JSON calls return {}"""
+        result, _ = await self._chat_completion(messages, temperature, max_tokens, json_response, timeout, cache_as)
+        return result
+    
+    async def _chat_completion(
+        self, 
+        messages: List[Dict[str, str]], 
+        temperature: float,
+        max_tokens: Optional[int],
+        json_response: bool,
+        timeout: Optional[float],
+        cache_as: Optional[str]
+    ) -> Tuple[Any, bool]:
+        """Chat completion and whether it was served from the response cache"""
+        cache_hit = False
         try:
-            kwargs = {
-                "model": self.model,
-                "messages": messages,
-                "temperature": temperature
-            }
+            cache_key = None
+            content = None
+            if self.cache.enabled_for(cache_as):
+                cache_key = self.cache.make_key(self.model, messages, temperature, max_tokens, json_response)
+                content = await self.cache.get(cache_as, cache_key)
+                cache_hit = content is not None
             
-            if max_tokens:
-                kwargs["max_tokens"] = max_tokens
-            
-            response = await openai.ChatCompletion.acreate(**kwargs)
-            content = response.choices[0].message.content
+            latency = 0.0
+            if content is None:
+                response = await self.create_completion(messages, temperature, max_tokens, timeout)
+                content = response.content
+                latency = response.latency
             
             if json_response:
                 try:
-                    return json.loads(content)
+                    result = json.loads(content)
                 except json.JSONDecodeError as e:
                     logger.error(f"Failed to parse JSON response: {e}")
-                    return {}
+                    return {}, False
+            else:
+                result = content
+            
+            # Only well-formed responses fresh from the provider are cached
+            if cache_key and latency:
+                await self.cache.set(cache_as, cache_key, content, latency)
             
-            return content
+            return result, cache_hit
             
+        except LLMUnavailableError:
+            logger.warning("LLM unavailable (circuit open)")
+            if json_response:
+                return {}, False
+            # Text callers have their own local fallbacks; an apology here would be sent as the reply
+            raise
         except Exception as e:
             logger.error(f"LLM API error: {e}")
             if json_response:
-                return {}
-            return "I'm having trouble thinking right now. Could you try again?"
+                return {}, False
+            raise
+    
+    async def stream_chat_completion(
+        self, 
+        messages: List[Dict[str, str]], 
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+        timeout: Optional[float] = None
+    ) -> AsyncIterator[str]:
+        """Stream a chat completion as an async iterator of token chunks"""
+        kwargs = {
+            "model": self.model,
+            "messages": messages,
+            "temperature": temperature,
+            "stream": True,
+            "timeout": timeout or Config.LLM_TIMEOUT
+        }
+        
+        if max_tokens:
+            kwargs["max_tokens"] = max_tokens
+        
+        estimated = self.estimate_tokens(messages, max_tokens)
+        
+        async def open_stream():
+            # The slot is taken per attempt so backoff between retries doesn't hold it
+            slot = AsyncExitStack()
+            await slot.enter_async_context(self.scheduler.slot(self.priority, estimated))
+            try:
+                return slot, await self.get_client().chat.completions.create(**kwargs)
+            except BaseException:
+                await slot.aclose()
+                raise
+        
+        # Retry only opening the stream; tokens already shown can't be replayed
+        slot, stream = await self.resilience.call(open_stream, key=f"{self.priority.name.lower()}_stream")
+        async with slot:
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                token = chunk.choices[0].delta.content
+                if token:
+                    yield token
+    
+    async def stream_simple_prompt(
+        self, 
+        prompt: str, 
+        on_text: Callable[[str], Awaitable[None]],
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None
+    ) -> str:
+        """Stream a simple prompt, passing the accumulated text to on_text; raises if nothing was streamed"""
+        messages = [{"role": "user", "content": prompt}]
+        text = ""
+        showing = True
+        try:
+            async for token in self.stream_chat_completion(messages, temperature, max_tokens):
+                text += token
+                if not showing:
+                    continue
+                try:
+                    await on_text(text)
+                except Exception as e:
+                    # A failed partial update mustn't cut the reply short; the caller sends the final text
+                    logger.warning(f"Streaming display failed, finishing the reply without updates: {e}")
+                    showing = False
+            return text
+        except Exception as e:
+            logger.error(f"LLM streaming error: {e}")
+            if text:
+                return text
+            raise
+    
+    async def embed_texts(self, texts: List[str], model: Optional[str] = None) -> List[List[float]]:
+        """Embed texts with the embeddings API"""
+        estimated = sum(len(text) for text in texts) // 4
+        
+        async def request():
+            async with self.scheduler.slot(self.priority, estimated):
+                return await self.get_client().embeddings.create(
+                    model=model or Config.OPENAI_EMBEDDING_MODEL,
+                    input=texts,
+                    timeout=Config.LLM_TIMEOUT
+                )
+        
+        response = await self.resilience.call(request, key='embedding')
+        return [item.embedding for item in response.data]
     
     async def simple_prompt(
         self, 
         prompt: str, 
         temperature: float = 0.7,
         max_tokens: Optional[int] = None,
-        json_response: bool = False
+        json_response: bool = False,
+        timeout: Optional[float] = None,
+        cache_as: Optional[str] = None
     ) -> str:
         """Simple prompt completion"""
         messages = [{"role": "user", "content": prompt}]
         return await self.chat_completion(
-            messages, temperature, max_tokens, json_response
+            messages, temperature, max_tokens, json_response, timeout, cache_as
+        )
+    
+    async def simple_prompt_with_cache_hit(
+        self, 
+        prompt: str, 
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+        json_response: bool = False,
+        timeout: Optional[float] = None,
+        cache_as: Optional[str] = None
+    ) -> Tuple[Any, bool]:
+        """Simple prompt completion and whether it was served from the response cache"""
+        messages = [{"role": "user", "content": prompt}]
+        return await self._chat_completion(
+            messages, temperature, max_tokens, json_response, timeout, cache_as
         )
     
     async def extract_user_info(self, user_message: str) -> Dict[str, Any]:
@@ -82,4 +312,31 @@ class LLMClient:
         Only include fields that are explicitly mentioned. Return empty object if nothing personal is shared.
         """
         
-        return await self.simple_prompt(prompt, temperature=0.1, json_response=True)
\ No newline at end of file
+        return await self.simple_prompt(prompt, temperature=0.1, json_response=True, cache_as='extraction')
+    
+    async def extract_user_info_batch(self, user_messages: List[str]) -> Dict[str, Any]:
+        """Extract personal information from several messages in one call"""
+        if len(user_messages) == 1:
+            return await self.extract_user_info(user_messages[0])
+        
+        numbered = "\n".join(f'{i}. "{message}"' for i, message in enumerate(user_messages, 1))
+        prompt = f"""
+        Extract personal information from these messages sent by the same user, oldest first:
+        {numbered}
+        
+        Return a single JSON object combining any of these fields that are mentioned:
+        {{
+            "name": "user's name if mentioned",
+            "age": "age if mentioned", 
+            "location": "city/country if mentioned",
+            "occupation": "job/profession if mentioned",
+            "interests": ["list", "of", "interests", "mentioned"],
+            "life_events": ["recent events or experiences shared"],
+            "current_situation": "what they're currently doing/feeling"
+        }}
+        
+        If messages conflict, prefer the most recent one.
+        Only include fields that are explicitly mentioned. Return empty object if nothing personal is shared.
+        """
+        
+        return await self.simple_prompt(prompt, temperature=0.1, json_response=True, cache_as='extraction')
\ No newline at end of file
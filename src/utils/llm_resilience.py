@@ -0,0 +1,224 @@
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional, Any, TypeVar
+import httpx
+import openai
+from .config import Config
+from .logger import setup_logger
+
+logger = setup_logger(__name__)
+
+T = TypeVar('T')
+
+# Transient provider errors worth retrying; anything else (bad request, auth) fails fast
+RETRYABLE_ERRORS = (
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+    httpx.TransportError,
+    asyncio.TimeoutError
+)
+
+class LLMUnavailableError(Exception):
+    """Raised instead of calling the provider while the circuit breaker is open"""
+
+class CircuitBreaker:
+    """Trips after consecutive failed calls and lets a single probe through once the cooldown ends"""
+    
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+    
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.trips = 0
+        self.opened_at: Optional[float] = None
+        self.probe_started: Optional[float] = None
+    
+    @property
+    def state(self) -> str:
+        """Current breaker state"""
+        if self.opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+    
+    def is_open(self) -> bool:
+        """Whether callers should go straight to their local fallbacks"""
+        return self.state == self.OPEN
+    
+    def can_request(self) -> bool:
+        """Whether a call would be admitted right now, without taking the probe"""
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN:
+            # A probe that never reported back (e.g. cancelled) expires after another cooldown
+            return self.probe_started is None or time.monotonic() - self.probe_started >= self.reset_timeout
+        return False
+    
+    def allow_request(self) -> bool:
+        """Admit a call; while half-open only one probe at a time goes through"""
+        if not self.can_request():
+            return False
+        if self.state == self.HALF_OPEN:
+            self.probe_started = time.monotonic()
+        return True
+    
+    def record_success(self):
+        """Close the breaker after a successful call"""
+        if self.opened_at is not None:
+            logger.info("LLM circuit breaker closed, provider recovered")
+        self.failures = 0
+        self.opened_at = None
+        self.probe_started = None
+    
+    def record_inconclusive(self):
+        """A call that says nothing about provider health; frees the probe for the next caller"""
+        self.probe_started = None
+    
+    def record_failure(self):
+        """Count a failed call, tripping the breaker at the threshold or on a failed probe"""
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state == self.CLOSED:
+                self.trips += 1
+                logger.warning(f"LLM circuit breaker opened after {self.failures} consecutive failures")
+            self.opened_at = time.monotonic()
+            self.probe_started = None
+
+class LLMResilience:
+    """Retries with jittered exponential backoff, latency hedging and a circuit breaker for LLM calls"""
+    
+    _shared: Optional['LLMResilience'] = None
+    
+    def __init__(self):
+        self.max_retries = Config.LLM_MAX_RETRIES
+        self.backoff_base = Config.LLM_BACKOFF_BASE
+        self.backoff_max = Config.LLM_BACKOFF_MAX
+        self.hedging_enabled = Config.LLM_HEDGING_ENABLED
+        self.hedge_min_samples = Config.LLM_HEDGE_MIN_SAMPLES
+        self.breaker = CircuitBreaker(Config.LLM_BREAKER_FAILURES, Config.LLM_BREAKER_RESET_SECONDS)
+        self.latencies: Dict[str, deque] = {}
+        self.stats = {
+            'calls': 0,
+            'retries': 0,
+            'retries_exhausted': 0,
+            'short_circuited': 0,
+            'hedges': 0,
+            'hedge_wins': 0
+        }
+    
+    @classmethod
+    def shared(cls) -> 'LLMResilience':
+        """Process-wide resilience state shared by every LLMClient"""
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
+    
+    async def call(
+        self,
+        request: Callable[[], Awaitable[T]],
+        key: str = 'default',
+        hedge: bool = False
+    ) -> T:
+        """Run a request with breaker, retries and optional hedging; raises LLMUnavailableError when open"""
+        if not self.breaker.allow_request():
+            self.stats['short_circuited'] += 1
+            raise LLMUnavailableError("LLM circuit breaker is open")
+        
+        self.stats['calls'] += 1
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                result = await (self._hedged(request, key) if hedge else request())
+            except RETRYABLE_ERRORS as e:
+                if attempt >= self.max_retries:
+                    self.stats['retries_exhausted'] += 1
+                    self.breaker.record_failure()
+                    raise
+                delay = self._backoff_delay(attempt, e)
+                attempt += 1
+                self.stats['retries'] += 1
+                logger.warning(f"Retryable LLM error ({type(e).__name__}), retry {attempt} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                continue
+            except Exception:
+                # Bad request, auth or parse errors say nothing about whether the provider recovered
+                self.breaker.record_inconclusive()
+                raise
+            
+            self.latencies.setdefault(key, deque(maxlen=500)).append(time.perf_counter() - started)
+            self.breaker.record_success()
+            return result
+    
+    def _backoff_delay(self, attempt: int, error: Exception) -> float:
+        """Full-jitter exponential backoff, honouring Retry-After on rate limits"""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        response = getattr(error, 'response', None)
+        retry_after = response.headers.get('retry-after') if response is not None else None
+        if retry_after:
+            try:
+                delay = max(delay, min(float(retry_after), self.backoff_max))
+            except ValueError:
+                pass
+        return delay
+    
+    def hedge_delay(self, key: str) -> Optional[float]:
+        """p95 latency for this call type, once enough samples exist"""
+        samples = self.latencies.get(key)
+        if not self.hedging_enabled or not samples or len(samples) < self.hedge_min_samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    
+    async def _hedged(self, request: Callable[[], Awaitable[T]], key: str) -> T:
+        """Send a duplicate request if the first passes p95 latency; first success wins"""
+        delay = self.hedge_delay(key)
+        if delay is None:
+            return await request()
+        
+        primary = asyncio.ensure_future(request())
+        tasks = [primary]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done:
+                return primary.result()
+            
+            self.stats['hedges'] += 1
+            backup = asyncio.ensure_future(request())
+            tasks.append(backup)
+            
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is backup:
+                            self.stats['hedge_wins'] += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get breaker state, retry and hedging counters and per-key p95 latency"""
+        stats = dict(self.stats)
+        stats['breaker_state'] = self.breaker.state
+        stats['breaker_trips'] = self.breaker.trips
+        stats['consecutive_failures'] = self.breaker.failures
+        stats['p95_seconds'] = {
+            key: sorted(samples)[min(len(samples) - 1, int(len(samples) * 0.95))]
+            for key, samples in self.latencies.items() if samples
+        }
+        return stats
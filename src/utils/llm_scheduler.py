@@ -0,0 +1,199 @@
+import asyncio
+import heapq
+import itertools
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import Dict, List, Optional, Any, Tuple
+from .config import Config
+from .logger import setup_logger
+
+logger = setup_logger(__name__)
+
+class Priority(IntEnum):
+    """LLM request classes, most urgent first"""
+    REPLY = 0
+    JUDGE = 1
+    SCORING = 2
+    EXTRACTION = 3
+
+class TokenBucket:
+    """Per-minute token bucket; a limit of 0 disables it"""
+    
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+    
+    def _refill(self):
+        """Add tokens for the time elapsed since the last refill"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` tokens are available"""
+        if not self.capacity:
+            return 0.0
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+    
+    def consume(self, amount: float):
+        """Take tokens (may go into debt)"""
+        if self.capacity:
+            self._refill()
+            self.tokens -= amount
+    
+    def refund(self, amount: float):
+        """Return over-estimated tokens, or charge under-estimated ones when negative"""
+        if self.capacity:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+class LLMScheduler:
+    """Central admission control for LLM requests with priorities, rate limits and per-class caps"""
+    
+    _shared: Optional['LLMScheduler'] = None
+    
+    def __init__(
+        self,
+        requests_per_minute: int = None,
+        tokens_per_minute: int = None,
+        max_concurrency: int = None,
+        class_concurrency: Dict[Priority, int] = None
+    ):
+        self.rpm = TokenBucket(Config.LLM_RPM_LIMIT if requests_per_minute is None else requests_per_minute)
+        self.tpm = TokenBucket(Config.LLM_TPM_LIMIT if tokens_per_minute is None else tokens_per_minute)
+        self.max_concurrency = max_concurrency or Config.LLM_MAX_CONCURRENCY
+        self.class_concurrency = class_concurrency or {
+            Priority.REPLY: Config.LLM_CONCURRENCY_REPLY,
+            Priority.JUDGE: Config.LLM_CONCURRENCY_JUDGE,
+            Priority.SCORING: Config.LLM_CONCURRENCY_SCORING,
+            Priority.EXTRACTION: Config.LLM_CONCURRENCY_EXTRACTION
+        }
+        
+        self.waiters: List[Tuple[int, int, asyncio.Future, float]] = []
+        self.active: Dict[Priority, int] = {priority: 0 for priority in Priority}
+        self.total_active = 0
+        self._sequence = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.stats: Dict[Priority, Dict[str, Any]] = {
+            priority: {'requests': 0, 'wait_total': 0.0, 'wait_max': 0.0, 'waits': deque(maxlen=1000)}
+            for priority in Priority
+        }
+    
+    @classmethod
+    def shared(cls) -> 'LLMScheduler':
+        """Process-wide scheduler shared by every LLMClient"""
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
+    
+    @asynccontextmanager
+    async def slot(self, priority: Priority, estimated_tokens: float = 0):
+        """Wait for admission, then hold a concurrency slot for the duration of the block"""
+        enqueued = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.waiters, (int(priority), next(self._sequence), future, estimated_tokens))
+        self._dispatch()
+        
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted just as we were cancelled - give the slot back
+                self._release(priority)
+            else:
+                future.cancel()
+                self._dispatch()
+            raise
+        
+        self._record_wait(priority, time.monotonic() - enqueued)
+        try:
+            yield
+        finally:
+            self._release(priority)
+    
+    def record_usage(self, estimated_tokens: float, actual_tokens: float):
+        """Correct the token bucket once real usage is known"""
+        if actual_tokens:
+            self.tpm.refund(estimated_tokens - actual_tokens)
+    
+    def _dispatch(self):
+        """Grant waiting requests in priority order while capacity and rate limits allow"""
+        while True:
+            # Drop waiters that were cancelled while queued
+            if any(entry[2].done() for entry in self.waiters):
+                self.waiters = [entry for entry in self.waiters if not entry[2].done()]
+                heapq.heapify(self.waiters)
+            
+            if not self.waiters or self.total_active >= self.max_concurrency:
+                return
+            
+            # Highest-priority waiter whose class is under its concurrency cap
+            candidate = next(
+                (entry for entry in sorted(self.waiters)
+                 if self.active[Priority(entry[0])] < self.class_concurrency[Priority(entry[0])]),
+                None
+            )
+            if candidate is None:
+                return
+            
+            priority, _, future, tokens = candidate
+            wait = max(self.rpm.wait_time(1), self.tpm.wait_time(tokens))
+            if wait > 0:
+                # Hold the queue so lower classes can't drain the buckets ahead of it
+                self._schedule_retry(wait)
+                return
+            
+            self.waiters.remove(candidate)
+            heapq.heapify(self.waiters)
+            self.rpm.consume(1)
+            self.tpm.consume(tokens)
+            self.active[Priority(priority)] += 1
+            self.total_active += 1
+            future.set_result(True)
+    
+    def _schedule_retry(self, delay: float):
+        """Re-run dispatch once the rate limit buckets have refilled"""
+        if self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(delay, self._on_timer)
+    
+    def _on_timer(self):
+        """Timer callback for rate-limited dispatch"""
+        self._timer = None
+        self._dispatch()
+    
+    def _release(self, priority: Priority):
+        """Free a concurrency slot and admit the next waiter"""
+        self.active[priority] -= 1
+        self.total_active -= 1
+        self._dispatch()
+    
+    def _record_wait(self, priority: Priority, waited: float):
+        """Track queue-wait time per class"""
+        stats = self.stats[priority]
+        stats['requests'] += 1
+        stats['wait_total'] += waited
+        stats['wait_max'] = max(stats['wait_max'], waited)
+        stats['waits'].append(waited)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get queue depth, in-flight counts and queue-wait times per class"""
+        classes = {}
+        for priority, stats in self.stats.items():
+            waits = sorted(stats['waits'])
+            classes[priority.name.lower()] = {
+                'requests': stats['requests'],
+                'in_flight': self.active[priority],
+                'queued': sum(1 for entry in self.waiters if entry[0] == priority and not entry[2].done()),
+                'wait_mean_seconds': stats['wait_total'] / stats['requests'] if stats['requests'] else 0.0,
+                'wait_p95_seconds': waits[min(len(waits) - 1, int(len(waits) * 0.95))] if waits else 0.0,
+                'wait_max_seconds': stats['wait_max']
+            }
+        return {'in_flight': self.total_active, 'classes': classes}